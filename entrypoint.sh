@@ -18,6 +18,21 @@ python manage.py migrate
 echo "Loading initial data..."
 python manage.py loaddata data/users.json
 
+# Read SERVER_MODE the same way mysite/settings.py does (environment, then .env)
+SERVER_MODE=$(python -c "from decouple import config; print(config('SERVER_MODE', default='development'))")
+
+if [ "$SERVER_MODE" = "production" ]; then
+  # Collect, compress and fingerprint static files for WhiteNoise
+  echo "Collecting static files..."
+  python manage.py collectstatic --noinput
+
+  # Run the daily logrotate job, since the workers leave the log file to it
+  crond
+
+  # Start gunicorn with a pool of workers (see gunicorn.conf.py)
+  echo "Starting production server..."
+  exec gunicorn -c gunicorn.conf.py
+fi
 
 # Start the Django development server
 echo "Starting server..."
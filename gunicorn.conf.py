@@ -0,0 +1,58 @@
+"""
+Gunicorn configuration for running mysite in production.
+
+Start the server with ``gunicorn -c gunicorn.conf.py``. With ASYNC_VIEWS
+enabled the ASGI application is served by uvicorn workers, otherwise the
+WSGI application is served by threaded sync workers. Every module-level
+name that matches a gunicorn setting is used as that setting, which is why
+decouple's ``config`` is not imported by name.
+"""
+
+import glob
+import multiprocessing
+import os
+import decouple
+
+ASYNC_VIEWS = decouple.config('ASYNC_VIEWS', default=False, cast=bool)
+
+bind = decouple.config('BIND', default='0.0.0.0:8000')
+
+if ASYNC_VIEWS:
+    wsgi_app = 'mysite.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+    # Each event loop already handles many connections; one worker per CPU
+    default_workers = multiprocessing.cpu_count()
+else:
+    wsgi_app = 'mysite.wsgi:application'
+    worker_class = 'gthread'
+    threads = decouple.config('WEB_THREADS', default=4, cast=int)
+    default_workers = multiprocessing.cpu_count() * 2 + 1
+
+workers = decouple.config('WEB_CONCURRENCY', default=default_workers, cast=int)
+
+# Restart workers now and then so slow memory growth cannot accumulate
+max_requests = decouple.config('WEB_MAX_REQUESTS', default=1000, cast=int)
+max_requests_jitter = max_requests // 10
+timeout = decouple.config('WEB_TIMEOUT', default=30, cast=int)
+graceful_timeout = timeout
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    """Clear the metrics files of the previous run, so counters start from zero."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
+    from django.conf import settings
+
+    if settings.POLLS_METRICS_DIR:
+        for path in glob.glob(os.path.join(settings.POLLS_METRICS_DIR, 'metrics-*.json')):
+            os.remove(path)
+
+
+def worker_exit(server, worker):
+    """Write the exiting worker's last metrics, without relying on its atexit handlers."""
+    from polls import metrics
+
+    metrics.stop_flusher()
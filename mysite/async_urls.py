@@ -0,0 +1,13 @@
+"""
+URL configuration for mysite served with the async poll views.
+
+Used as ROOT_URLCONF when ASYNC_VIEWS is enabled. It is mysite.urls with
+the polls URLs taken from polls.async_urls instead of polls.urls.
+"""
+from django.urls import include, path
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('polls/', include('polls.async_urls')) if getattr(pattern, 'namespace', None) == 'polls' else pattern
+    for pattern in sync_urlpatterns
+]
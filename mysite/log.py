@@ -0,0 +1,154 @@
+"""
+Logging helpers for mysite/settings.py.
+
+Log records are handed to a queue and written to disk by a background
+thread, so a request never waits for a log file. Records are written as
+one JSON object per line.
+
+Classes:
+- JsonFormatter: Format a log record as a line of JSON.
+- QueueHandler: Queue records for the background writer thread.
+
+Functions:
+- parse_levels: Parse per-logger levels such as ``django.db.backends=DEBUG,myapp=INFO``.
+"""
+
+import atexit
+import copy
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+
+# Attributes every LogRecord has; anything else was passed in ``extra``.
+RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Format a log record as a line of JSON with its ``extra`` fields."""
+
+    def format(self, record):
+        """
+        Format a record.
+
+        Args:
+            record (logging.LogRecord): The record.
+
+        Returns:
+            str: A JSON object on one line.
+        """
+        entry = {
+            'time': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'line': record.lineno,
+            'process': record.process,
+            'thread': record.threadName,
+        }
+        for name, value in vars(record).items():
+            if name not in RECORD_ATTRIBUTES and not name.startswith('_'):
+                entry[name] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = record.stack_info
+        return json.dumps(entry, default=str)
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue records for a background thread that writes them to a rotating file.
+
+    The file rotates by size (``rotation='size'``, after ``max_bytes``) or by
+    time (``rotation='time'``, every ``when``), keeping ``backup_count`` old
+    files. These rotations are not coordinated between processes, so when
+    several processes write the same file use ``rotation='external'``: the
+    file is rotated by an external tool such as logrotate and reopened once
+    it has been moved. The writer thread is stopped, after draining the
+    queue, when the process exits.
+    """
+
+    def __init__(self, filename, rotation='size', max_bytes=10 * 1024 * 1024, backup_count=5, when='midnight'):
+        """Start the writer thread for a log file."""
+        super().__init__(queue.SimpleQueue())
+        if rotation == 'time':
+            target = logging.handlers.TimedRotatingFileHandler(
+                filename, when=when, backupCount=backup_count, encoding='utf-8', delay=True,
+            )
+        elif rotation == 'size':
+            target = logging.handlers.RotatingFileHandler(
+                filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True,
+            )
+        elif rotation == 'external':
+            target = logging.handlers.WatchedFileHandler(filename, encoding='utf-8', delay=True)
+        else:
+            raise ValueError(f"Unknown log rotation {rotation!r}; use 'size', 'time' or 'external'.")
+        target.setFormatter(JsonFormatter())
+        self.listener = logging.handlers.QueueListener(self.queue, target)
+        self.listener.start()
+        self.running = True
+        atexit.register(self.stop)
+
+    def prepare(self, record):
+        """
+        Resolve the message of a record before it leaves the logging thread.
+
+        Unlike the default, the record is not formatted here: the writer
+        thread formats it as JSON. The message arguments are merged now,
+        since they may change once the call returns.
+
+        Args:
+            record (logging.LogRecord): The record.
+
+        Returns:
+            logging.LogRecord: A copy safe to hand to the writer thread.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def stop(self):
+        """Stop the writer thread once it has written the queued records."""
+        if self.running:
+            self.running = False
+            self.listener.stop()
+            for handler in self.listener.handlers:
+                handler.close()
+
+    def close(self):
+        """Stop the writer thread and close the handler."""
+        self.stop()
+        super().close()
+
+
+def parse_levels(value):
+    """
+    Parse per-logger levels.
+
+    Args:
+        value (str): Comma-separated ``logger=LEVEL`` pairs, such as
+            ``django.db.backends=DEBUG,myapp=INFO``.
+
+    Returns:
+        dict: Maps each logger name to its level name.
+
+    Raises:
+        ValueError: If a pair has no ``=`` or the level is unknown.
+    """
+    levels = {}
+    for pair in filter(None, (item.strip() for item in value.split(','))):
+        name, separator, level = pair.partition('=')
+        level = level.strip().upper()
+        if not separator or not isinstance(logging.getLevelName(level), int):
+            raise ValueError(f"Invalid log level setting {pair!r}; expected logger=LEVEL.")
+        levels[name.strip()] = level
+    return levels
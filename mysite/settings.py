@@ -11,6 +11,8 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 from decouple import config, Csv
+from .database import parse_database_url
+from .log import parse_levels
 from pathlib import Path
 import os
 
@@ -31,6 +33,11 @@ ALLOWED_HOSTS = config('ALLOWED_HOSTS',
                        default='localhost,127.0.0.1',
                        cast=Csv())
 
+# 'development' runs Django's runserver; 'production' runs gunicorn with a
+# worker per CPU (see gunicorn.conf.py) and serves static files with WhiteNoise.
+SERVER_MODE = config('SERVER_MODE', default='development')
+PRODUCTION = SERVER_MODE == 'production'
+
 
 # Application definition
 
@@ -46,16 +53,20 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    *(['whitenoise.middleware.WhiteNoiseMiddleware'] if PRODUCTION else []),
+    'polls.middleware.InstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'polls.middleware.RateLimitMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'polls.middleware.FailedLoginLoggerMiddleware',
 ]
 
-ROOT_URLCONF = 'mysite.urls'
+# Serve the polls with the async views of polls/async_views.py (for ASGI servers)
+ROOT_URLCONF = 'mysite.async_urls' if config('ASYNC_VIEWS', default=False, cast=bool) else 'mysite.urls'
 
 TEMPLATES = [
     {
@@ -73,19 +84,188 @@ TEMPLATES = [
     },
 ]
 
+# 'cached' loads templates through the cached loader and compiles them all at
+# startup; 'minified' also strips the indentation of the poll pages before
+# compiling them (see polls.templating); 'default' keeps Django's loaders.
+POLLS_TEMPLATE_MODE = config('TEMPLATE_MODE', default='cached' if PRODUCTION else 'default')
+if POLLS_TEMPLATE_MODE in ('cached', 'minified'):
+    template_loaders = ['django.template.loaders.filesystem.Loader', 'django.template.loaders.app_directories.Loader']
+    if POLLS_TEMPLATE_MODE == 'minified':
+        template_loaders = ['polls.templating.FilesystemLoader', 'polls.templating.AppDirectoriesLoader']
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [('django.template.loaders.cached.Loader', template_loaders)]
+# Compile every template when the app starts, so no request pays for it
+POLLS_WARM_TEMPLATES = config('WARM_TEMPLATES', default=POLLS_TEMPLATE_MODE != 'default', cast=bool)
+
 WSGI_APPLICATION = 'mysite.wsgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+def database_from_env(url_var):
+    """Return the database named by a URL variable, the POSTGRES_* variables or the SQLite file."""
+    url = config(url_var, default='')
+    if url:
+        database = parse_database_url(url)
+    elif config('POSTGRES_DB', default=''):
+        database = {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config('POSTGRES_DB'),
+            'USER': config('POSTGRES_USER', default=''),
+            'PASSWORD': config('POSTGRES_PASSWORD', default=''),
+            'HOST': config('POSTGRES_HOST', default='db'),
+            'PORT': config('POSTGRES_PORT', default='5432'),
+        }
+    else:
+        database = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / 'db.sqlite3'}
+
+    # Keep connections open between requests in production, checking them before reuse
+    database['CONN_MAX_AGE'] = config('CONN_MAX_AGE', default=600 if PRODUCTION else 0, cast=int)
+    database['CONN_HEALTH_CHECKS'] = True
+    if database['ENGINE'] == 'django.db.backends.postgresql' and config('DB_POOL', default=False, cast=bool):
+        # psycopg's pool shares connections between the threads of a worker;
+        # Django requires persistent connections to be off when it is used.
+        database['OPTIONS'] = {
+            **database.get('OPTIONS', {}),
+            'pool': {
+                'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+                'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+                'timeout': config('DB_POOL_TIMEOUT', default=10, cast=int),
+            },
+        }
+        database['CONN_MAX_AGE'] = 0
+    return database
+
+
+# DATABASE_URL, e.g. postgres://admin:adminpassword@db:5432/pollsdb, wins over
+# the POSTGRES_* variables of docker.env; without either, SQLite is used.
 DATABASES = {
+    'default': database_from_env('DATABASE_URL'),
+}
+
+# Optional read replica for the index and results pages (see polls.routers)
+if config('DATABASE_REPLICA_URL', default=''):
+    DATABASES['replica'] = database_from_env('DATABASE_REPLICA_URL')
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['polls.routers.ReplicaRouter']
+
+# SQLite tuning for concurrent voters, applied to every new connection
+# (see polls.apps). WAL lets readers run alongside the writer, NORMAL
+# synchronisation is safe in WAL mode, and writers wait up to busy_timeout
+# milliseconds for the lock instead of failing with "database is locked".
+if config('SQLITE_TUNING', default=True, cast=bool):
+    POLLS_SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': config('SQLITE_BUSY_TIMEOUT', default=5000, cast=int),
+        'cache_size': -config('SQLITE_CACHE_SIZE_KB', default=20000, cast=int),
+        'mmap_size': config('SQLITE_MMAP_SIZE', default=128 * 1024 * 1024, cast=int),
+        'temp_store': 'MEMORY',
+    }
+else:
+    POLLS_SQLITE_PRAGMAS = {}
+# Start vote transactions with BEGIN IMMEDIATE on SQLite (see polls.voting)
+POLLS_SQLITE_IMMEDIATE_WRITES = config('SQLITE_IMMEDIATE_WRITES', default=True, cast=bool)
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Local memory by default; point CACHE_BACKEND at e.g.
+# django.core.cache.backends.filebased.FileBasedCache or
+# django.core.cache.backends.redis.RedisCache in production.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='ku-polls'),
+        'TIMEOUT': config('CACHE_TIMEOUT', default=300, cast=int),
     }
 }
 
+# Cache used by the polls app for results snapshots
+POLLS_CACHE_ALIAS = 'default'
+# How long a results snapshot is kept, in seconds
+POLLS_RESULTS_CACHE_TIMEOUT = config('RESULTS_CACHE_TIMEOUT', default=300, cast=int)
+# How long a snapshot may still be served after a vote changes it, in seconds
+POLLS_RESULTS_MAX_STALENESS = config('RESULTS_MAX_STALENESS', default=0, cast=int)
+# How long pages rendered for anonymous visitors are cached, in seconds (0 disables)
+POLLS_PAGE_CACHE_TIMEOUT = config('PAGE_CACHE_TIMEOUT', default=60, cast=int)
+# How long a user's map of votes is kept, in seconds (it is dropped when they vote)
+POLLS_VOTE_MAP_CACHE_TIMEOUT = config('VOTE_MAP_CACHE_TIMEOUT', default=3600, cast=int)
+
+
+# Sessions
+# 'db' stores sessions in the database; 'cached_db' reads them from the cache
+# first (see polls.sessions); 'cache' and 'signed_cookies' keep them out of
+# the database. With several workers, 'cache' and 'cached_db' need a cache
+# shared by all of them, such as Redis, or a logout may not reach every worker.
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'polls.sessions',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}[config('SESSION_BACKEND', default='db')]
+# With 'cached_db', write a changed session to the database at most once per
+# this many seconds, keeping the changes in between in the cache (0 writes every change)
+POLLS_SESSION_WRITE_INTERVAL = config('SESSION_WRITE_INTERVAL', default=0, cast=int)
+
+
+# Voting
+# 'sync' writes each vote in its request; 'write_behind' appends votes to a
+# durable local queue that `python manage.py flush_votes` writes in batches.
+POLLS_VOTE_MODE = config('VOTE_MODE', default='sync')
+POLLS_VOTE_QUEUE_PATH = config('VOTE_QUEUE_PATH', default=str(BASE_DIR / 'vote_queue.sqlite3'))
+
+# The number of reverse proxies in front of the server that append to
+# X-Forwarded-For. Client IPs (see polls.utils.get_client_ip) are read from
+# the entry the outermost one appended; with 0 they are REMOTE_ADDR.
+POLLS_TRUSTED_PROXIES = config('TRUSTED_PROXIES', default=0, cast=int)
+
+# Rate limits (see polls.ratelimit), per scope and key: a client IP or a
+# user, who for logins is the submitted username. Rates are a count per
+# s, m, h or d, e.g. '10/m'; an empty rate disables the limit.
+POLLS_RATE_LIMITS = {
+    'vote': {
+        'ip': config('RATE_LIMIT_VOTE_IP', default='300/m'),
+        'user': config('RATE_LIMIT_VOTE_USER', default='30/m'),
+    },
+    'login': {
+        'ip': config('RATE_LIMIT_LOGIN_IP', default='30/m'),
+        'user': config('RATE_LIMIT_LOGIN_USER', default='10/m'),
+    },
+    'signup': {
+        'ip': config('RATE_LIMIT_SIGNUP_IP', default='20/h'),
+    },
+}
+# 'cache' counts in POLLS_RATE_LIMIT_CACHE, shared by the workers that share
+# the cache; 'memory' keeps token buckets in each process.
+POLLS_RATE_LIMIT_STORE = config('RATE_LIMIT_STORE', default='cache')
+POLLS_RATE_LIMIT_CACHE = 'default'
+
+# Poll lifecycle (see polls.lifecycle)
+# 'thread' opens and closes polls at their dates from a thread of each server
+# process; 'off' leaves it to a single `python manage.py run_lifecycle` process.
+POLLS_LIFECYCLE_SCHEDULER = config('LIFECYCLE_SCHEDULER', default='thread')
+# Longest time between two looks for due polls, in seconds
+POLLS_LIFECYCLE_INTERVAL = config('LIFECYCLE_INTERVAL', default=60, cast=float)
+
+
+# Instrumentation (see polls.middleware.InstrumentationMiddleware)
+# Share of requests measured, from 0 (off) to 1 (every request)
+POLLS_INSTRUMENTATION_SAMPLE_RATE = config('INSTRUMENTATION_SAMPLE_RATE', default=1.0, cast=float)
+# Send the measurements back in a Server-Timing header
+POLLS_SERVER_TIMING = config('SERVER_TIMING', default=True, cast=bool)
+
+# Metrics served at /metrics (see polls.metrics). Worker processes share
+# their counts through files in METRICS_DIR; leave it empty for a single process.
+POLLS_METRICS_DIR = config('METRICS_DIR', default=str(BASE_DIR / 'metrics') if PRODUCTION else '')
+# Seconds between writes of a process's counts to its file
+POLLS_METRICS_FLUSH_INTERVAL = config('METRICS_FLUSH_INTERVAL', default=5, cast=float)
+# If set, /metrics requires the header "Authorization: Bearer <token>"
+POLLS_METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -129,6 +309,19 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'polls/static')]
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+if PRODUCTION:
+    # collectstatic writes compressed copies and content-hashed names, which
+    # WhiteNoise serves with far-future cache headers.
+    STORAGES = {
+        'default': {
+            'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        },
+        'staticfiles': {
+            'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+        },
+    }
 
 
 # Default primary key field type
@@ -150,21 +343,37 @@ LOG_DIR = os.path.join(BASE_DIR, 'logs')
 if not os.path.exists(LOG_DIR):
     os.makedirs(LOG_DIR)
 
+# Records are written as JSON lines by a background thread (see mysite/log.py),
+# to a file rotated by size or, with LOG_ROTATION=time, every LOG_ROTATE_WHEN.
+# The gunicorn workers of production share the file, so there it is left to
+# logrotate (LOG_ROTATION=external, see logrotate.conf) instead of each
+# worker rotating it.
+LOG_LEVEL = config('LOG_LEVEL', default='INFO')
+
+# Per-logger levels; LOG_LEVELS overrides them, e.g. "django.db.backends=DEBUG,myapp=WARNING"
+LOG_LEVELS = {
+    'django': config('DJANGO_LOG_LEVEL', default='INFO'),
+    'django.db.backends': 'WARNING',
+    'myapp': LOG_LEVEL,
+    **parse_levels(config('LOG_LEVELS', default='')),
+}
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
     'handlers': {
         'file': {
-            'level': 'DEBUG',
-            'class': 'logging.FileHandler',
+            'class': 'mysite.log.QueueHandler',
             'filename': os.path.join(LOG_DIR, 'django.log'),
+            'rotation': config('LOG_ROTATION', default='external' if PRODUCTION else 'size'),
+            'max_bytes': config('LOG_MAX_BYTES', default=10 * 1024 * 1024, cast=int),
+            'backup_count': config('LOG_BACKUP_COUNT', default=5, cast=int),
+            'when': config('LOG_ROTATE_WHEN', default='midnight'),
         },
     },
-    'loggers': {
-        'django': {
-            'handlers': ['file'],
-            'level': 'DEBUG',
-            'propagate': True,
-        },
+    'root': {
+        'handlers': ['file'],
+        'level': LOG_LEVEL,
     },
+    'loggers': {name: {'level': level} for name, level in LOG_LEVELS.items()},
 }
@@ -18,6 +18,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.views.generic.base import RedirectView
 from . import views
+from polls.views import MetricsView
 from django.contrib.auth import views as auth_views
 
 
@@ -29,4 +30,5 @@ urlpatterns = [
     path('polls/', include('polls.urls')),  # Include polls app URLs
     path('login/', auth_views.LoginView.as_view(), name='login'),
     path('logout/', auth_views.LogoutView.as_view(), name='logout'),
+    path('metrics', MetricsView.as_view(), name='metrics'),  # Prometheus metrics of all workers
 ]
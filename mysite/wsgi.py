@@ -14,3 +14,13 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
 
 application = get_wsgi_application()
+
+# Open and close polls at their dates (see polls.lifecycle).
+from polls.lifecycle import start_scheduler  # noqa: E402
+
+start_scheduler()
+
+# Share this worker's metrics with the others (see polls.metrics).
+from polls.metrics import start_flusher  # noqa: E402
+
+start_flusher()
@@ -1,6 +1,24 @@
 """Used for logging and configuring the 'polls' application."""
 
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """
+    Apply the POLLS_SQLITE_PRAGMAS setting to each new SQLite connection.
+
+    Args:
+        sender: The database wrapper class.
+        connection: The new database connection.
+        **kwargs: Additional keyword arguments.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, 'POLLS_SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {name} = {value}')
 
 
 class PollsConfig(AppConfig):
@@ -10,5 +28,11 @@ class PollsConfig(AppConfig):
     name = 'polls'
 
     def ready(self):
-        """Import signal handlers when the app is ready."""
+        """Import signal handlers, tune SQLite connections, time queries and compile templates when the app is ready."""
         import polls.signals
+        from polls.instrumentation import install_query_timer
+        from polls.templating import warm_templates
+        connection_created.connect(apply_sqlite_pragmas, dispatch_uid='polls_sqlite_pragmas')
+        connection_created.connect(install_query_timer, dispatch_uid='polls_query_timer')
+        if getattr(settings, 'POLLS_WARM_TEMPLATES', False):
+            warm_templates()
@@ -0,0 +1,21 @@
+"""
+polls/async_urls.py.
+
+This module defines the URL patterns for the polls application when it is
+served by the async views in polls/async_views.py. The paths and names are
+the same as in polls/urls.py.
+"""
+
+from django.urls import path
+from . import async_views, views
+
+app_name = 'polls'  # Namespace for this app's URLs
+
+urlpatterns = [
+    path('', async_views.AsyncIndexView.as_view(), name='index'),
+    path('<int:pk>/', async_views.AsyncDetailView.as_view(), name='detail'),
+    path('<int:pk>/results/', async_views.AsyncResultsView.as_view(), name='results'),
+    path('<int:pk>/results.json', views.ResultsJsonView.as_view(), name='results_json'),
+    path('<int:pk>/results/stream/', views.ResultsStreamView.as_view(), name='results_stream'),
+    path('<int:question_id>/vote/', async_views.AsyncVoteView.as_view(), name='vote'),
+]
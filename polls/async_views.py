@@ -0,0 +1,216 @@
+"""
+polls/async_views.py.
+
+This module contains async versions of the poll views for ASGI deployments.
+
+They render the same templates as the views in polls/views.py, but read
+through Django's async ORM API so slow clients and long-lived connections do
+not hold a worker thread while waiting on the database. Vote writes still
+run in a thread, because casting a vote needs a transaction and Django's
+async ORM does not support transactions yet. Select these views with
+``ASYNC_VIEWS=True``, which routes /polls/ through polls/async_urls.py.
+
+Classes:
+- AsyncPollsPageMixin: Conditional GET and anonymous page caching for async views.
+- AsyncIndexView: Displays a list of the latest questions.
+- AsyncDetailView: Shows details of a specific question and allows voting.
+- AsyncResultsView: Displays the results of a specific question.
+- AsyncVoteView: Handles voting for a specific choice in a question.
+"""
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404, HttpResponseRedirect
+from django.shortcuts import redirect
+from django.urls import reverse
+from django.utils.decorators import method_decorator
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views import View
+from .cache import get_cached_results, get_request_votes
+from .conditional import index_etag, index_last_modified, question_etag, question_last_modified
+from .models import Choice, Question
+from .routers import reads_from_replica
+from .views import DetailView, IndexView, ResultsView, VoteView
+
+
+class AsyncPollsPageMixin:
+    """
+    Conditional GET and anonymous page caching for async views.
+
+    The sync views get these from the ``condition`` decorator and
+    AnonymousPageCacheMixin; this mixin runs the same checks without
+    blocking the event loop.
+
+    Attributes:
+        etag_func (callable): Computes the ETag of the page.
+        last_modified_func (callable): Computes the Last-Modified time of the page.
+    """
+
+    etag_func = None
+    last_modified_func = None
+
+    def _validators(self, request, *args, **kwargs):
+        """Return the quoted ETag and the Last-Modified timestamp of the page."""
+        etag = type(self).etag_func(request, *args, **kwargs)
+        last_modified = type(self).last_modified_func(request, *args, **kwargs)
+        return (
+            quote_etag(etag) if etag is not None else None,
+            int(last_modified.timestamp()) if last_modified is not None else None,
+        )
+
+    async def dispatch(self, request, *args, **kwargs):
+        """Answer with 304, a cached page or the rendered page, without blocking the event loop."""
+        etag, last_modified = await sync_to_async(self._validators)(request, *args, **kwargs)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            key = await sync_to_async(self.get_page_cache_key)(request)
+            if key is not None:
+                response = await sync_to_async(self.get_cached_page)(request, key)
+            if response is None:
+                # Skip the sync dispatch of the parent views, whose work is done here.
+                response = await View.dispatch(self, request, *args, **kwargs)
+                if key is not None:
+                    await sync_to_async(self.cache_page)(request, key, response)
+
+        if request.method in ('GET', 'HEAD'):
+            if last_modified and not response.has_header('Last-Modified'):
+                response.headers['Last-Modified'] = http_date(last_modified)
+            if etag:
+                response.headers.setdefault('ETag', etag)
+        return response
+
+
+@method_decorator(reads_from_replica, name='dispatch')
+class AsyncIndexView(AsyncPollsPageMixin, IndexView):
+    """Display the latest questions, one page at a time, reading them with async iteration."""
+
+    etag_func = index_etag
+    last_modified_func = index_last_modified
+
+    async def get(self, request, *args, **kwargs):
+        """
+        Fetch one page of questions and render the index.
+
+        Args:
+            request: The HTTP request object.
+            *args: Additional positional arguments.
+            **kwargs: Additional keyword arguments.
+
+        Returns:
+            TemplateResponse: The index page.
+        """
+        self.object_list = self.get_queryset()
+        rows = [question async for question in self.object_list[:self.page_size + 1]]
+        await sync_to_async(get_request_votes)(request)
+        return self.render_to_response(self.get_context_data(page_rows=rows))
+
+
+class AsyncDetailView(AsyncPollsPageMixin, DetailView):
+    """Display details for a specific question and allow voting, using the async ORM."""
+
+    etag_func = question_etag
+    last_modified_func = question_last_modified
+
+    async def get(self, request, *args, **kwargs):
+        """
+        Retrieve the question and the user's previous vote and render the template.
+
+        Args:
+            request: The HTTP request object.
+            *args: Additional positional arguments.
+            **kwargs: Additional keyword arguments.
+
+        Returns:
+            HttpResponseRedirect: Redirects to the index page if the poll is closed.
+            TemplateResponse: The detail page for the question.
+        """
+        try:
+            self.object = await self.get_queryset().aget(pk=kwargs['pk'])
+        except Question.DoesNotExist:
+            raise Http404("No question found.")
+
+        if not self.object.can_vote():
+            await sync_to_async(messages.error)(request, "This poll is closed.")
+            return redirect('polls:index')
+
+        # Load the user's vote map now, so get_context_data() finds it without blocking.
+        await sync_to_async(get_request_votes)(request)
+        return self.render_to_response(self.get_context_data(object=self.object))
+
+
+@method_decorator(reads_from_replica, name='dispatch')
+class AsyncResultsView(AsyncPollsPageMixin, ResultsView):
+    """Display the results for a specific question, using the async ORM."""
+
+    etag_func = question_etag
+    last_modified_func = question_last_modified
+
+    async def get(self, request, *args, **kwargs):
+        """
+        Retrieve the question and its results and render the template.
+
+        Args:
+            request: The HTTP request object.
+            *args: Additional positional arguments.
+            **kwargs: Additional keyword arguments.
+
+        Returns:
+            HttpResponseRedirect: Redirects to the index page if the question is not published.
+            TemplateResponse: The results page for the question.
+        """
+        try:
+            self.object = await Question.objects.aget(pk=kwargs['pk'])
+        except Question.DoesNotExist:
+            raise Http404("No question found.")
+
+        if not self.object.is_published():
+            return HttpResponseRedirect(reverse('polls:index'))
+
+        results = await sync_to_async(get_cached_results)(self.object)
+        await sync_to_async(get_request_votes)(request)
+        return self.render_to_response(self.get_context_data(object=self.object, results=results))
+
+
+class AsyncVoteView(View):
+    """Handle voting for a specific choice in a question, validating it with the async ORM."""
+
+    async def post(self, request, question_id):
+        """
+        Handle the voting process.
+
+        Args:
+            request: The HTTP request object.
+            question_id: The ID of the question being voted on.
+
+        Returns:
+            HttpResponseRedirect: Redirects to the login page, to the results page or back to the
+            detail page with an error message.
+        """
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path(), settings.LOGIN_URL)
+
+        try:
+            question = await Question.objects.aget(pk=question_id)
+        except Question.DoesNotExist:
+            raise Http404("No question found.")
+
+        if not question.can_vote():
+            await sync_to_async(messages.error)(request, "Voting is not allowed for this poll.")
+            return HttpResponseRedirect(reverse('polls:detail', args=(question.id,)))
+
+        choice_id = request.POST.get("choice")
+        if not choice_id:
+            await sync_to_async(messages.error)(request, "You didn't select a choice.")
+            return HttpResponseRedirect(reverse('polls:detail', args=(question.id,)))
+
+        try:
+            selected_choice = await question.choice_set.aget(pk=choice_id)
+        except Choice.DoesNotExist:
+            await sync_to_async(messages.error)(request, "Invalid choice.")
+            return HttpResponseRedirect(reverse('polls:detail', args=(question.id,)))
+
+        return await sync_to_async(VoteView.record_vote)(request, question, selected_choice)
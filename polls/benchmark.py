@@ -0,0 +1,455 @@
+"""
+polls/benchmark.py.
+
+This module seeds synthetic polls and measures how fast the poll pages are
+served. It backs the ``seed_polls`` and ``benchmark_polls`` management
+commands.
+
+Synthetic rows look like the ones in data/polls-v4.json and
+data/votes-v4.json: questions with a mix of open, closed and endless polls,
+four choices each, and at most one vote per user and question. Usernames and
+question texts start with ``bench-``, so the rows can be found and removed
+again.
+
+Functions:
+- seed_synthetic_data: Create synthetic users, questions, choices and votes.
+- delete_synthetic_data: Remove everything seed_synthetic_data created.
+- percentile: Return a percentile of a list of numbers.
+- summarize: Summarize latency and query samples of one scenario.
+- client_scenarios: Return the requests to benchmark with the test client.
+- run_client_benchmark: Measure the scenarios in-process with Django's test client.
+- run_http_benchmark: Measure the scenarios against a running server.
+- template_pages: Return the poll pages to render and their contexts.
+- run_render_benchmark: Measure the render time of the poll pages per template mode.
+- compare_reports: Compare a report with an earlier one.
+"""
+
+import datetime
+import math
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.template.backends.django import DjangoTemplates
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from .cache import invalidate_pages
+from .models import Choice, Question, Vote
+from .results import get_results
+from .utils import encode_cursor
+
+SYNTHETIC_PREFIX = 'bench-'
+CHOICES_PER_QUESTION = 4
+PERCENTILES = (50, 90, 95, 99)
+
+FILE_LOADERS = ['django.template.loaders.filesystem.Loader', 'django.template.loaders.app_directories.Loader']
+# The template loaders of each TEMPLATE_MODE, plus loading without any cache
+TEMPLATE_MODES = {
+    'uncached': FILE_LOADERS,
+    'cached': [('django.template.loaders.cached.Loader', FILE_LOADERS)],
+    'minified': [(
+        'django.template.loaders.cached.Loader',
+        ['polls.templating.FilesystemLoader', 'polls.templating.AppDirectoriesLoader'],
+    )],
+}
+
+
+def _vote_shares(rng, questions, votes, users):
+    """Give each question a share of the votes drawn from a skewed distribution."""
+    weights = [rng.paretovariate(1.5) for _ in range(questions)]
+    scale = votes / sum(weights)
+    shares = [min(users, int(weight * scale)) for weight in weights]
+    for index in rng.sample(range(len(shares)), len(shares)):
+        if sum(shares) >= votes:
+            break
+        shares[index] = min(users, shares[index] + votes - sum(shares))
+    return shares
+
+
+def seed_synthetic_data(questions=1000, users=1000, votes=100000, batch_size=5000, seed=0, log=None):
+    """
+    Create synthetic users, questions, choices and votes.
+
+    Votes are spread unevenly over the questions, as in real traffic, and
+    the choice counters are set to match them. Rows are written with
+    bulk_create in batches, so millions of votes take minutes, not hours.
+
+    Args:
+        questions (int): Number of questions to create.
+        users (int): Number of users to create. Each votes at most once per question.
+        votes (int): Number of votes to create, at most questions * users.
+        batch_size (int): Number of rows written per INSERT.
+        seed (int): Seed of the random generator, so runs are repeatable.
+        log (callable): Called with a progress message after each step, if given.
+
+    Returns:
+        dict: The number of users, questions, choices and votes created.
+    """
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    votes = min(votes, questions * users)
+    now = timezone.now()
+
+    # Tag this run's rows so they can be told apart from earlier runs.
+    prefix = f'{SYNTHETIC_PREFIX}{time.time_ns()}-'
+
+    # Hashing is slow; every synthetic user shares one password.
+    password = make_password('bench-password')
+    User.objects.bulk_create(
+        (User(username=f'{prefix}{n}', password=password) for n in range(users)),
+        batch_size=batch_size,
+    )
+    user_ids = list(User.objects.filter(username__startswith=prefix).values_list('pk', flat=True))
+    log(f"Created {users} users.")
+
+    new_questions = []
+    for n in range(questions):
+        pub_date = now - datetime.timedelta(seconds=rng.randrange(365 * 24 * 3600))
+        kind = rng.random()
+        if kind < 0.3:
+            end_date = None
+        elif kind < 0.6:
+            end_date = pub_date + datetime.timedelta(days=rng.randrange(1, 30))
+        else:
+            end_date = now + datetime.timedelta(days=rng.randrange(1, 60))
+        question = Question(
+            question_text=f'{prefix}{n}: Which option do you prefer?',
+            pub_date=pub_date,
+            end_date=end_date,
+        )
+        question.status = question.compute_status(now)
+        new_questions.append(question)
+    with transaction.atomic():
+        Question.objects.bulk_create(new_questions, batch_size=batch_size)
+        question_ids = list(Question.objects.filter(question_text__startswith=prefix).values_list('pk', flat=True))
+        Choice.objects.bulk_create(
+            (Choice(question_id=question_id, choice_text=f'Option {n + 1}')
+             for question_id in question_ids for n in range(CHOICES_PER_QUESTION)),
+            batch_size=batch_size,
+        )
+    choice_ids = {}
+    for choice_id, question_id in (
+        Choice.objects.filter(question__question_text__startswith=prefix).values_list('pk', 'question_id')
+    ):
+        choice_ids.setdefault(question_id, []).append(choice_id)
+    log(f"Created {questions} questions with {CHOICES_PER_QUESTION} choices each.")
+
+    shares = _vote_shares(rng, len(question_ids), votes, users)
+    tallies = {}
+    batch = []
+    written = 0
+    with transaction.atomic():
+        for question_id, share in zip(question_ids, shares):
+            choices = choice_ids[question_id]
+            favourites = [rng.random() for _ in choices]
+            for user_id in rng.sample(user_ids, share):
+                choice_id = rng.choices(choices, favourites)[0]
+                tallies[choice_id] = tallies.get(choice_id, 0) + 1
+                batch.append(Vote(user_id=user_id, question_id=question_id, choice_id=choice_id))
+                if len(batch) >= batch_size:
+                    Vote.objects.bulk_create(batch)
+                    written += len(batch)
+                    batch = []
+                    if written % (batch_size * 20) == 0:
+                        log(f"Created {written} votes.")
+        Vote.objects.bulk_create(batch)
+        written += len(batch)
+
+        counted = [Choice(pk=choice_id, votes=count) for choice_id, count in tallies.items()]
+        Choice.objects.bulk_update(counted, ['votes'], batch_size=batch_size)
+    log(f"Created {written} votes.")
+
+    invalidate_pages()
+    return {
+        'users': users,
+        'questions': questions,
+        'choices': questions * CHOICES_PER_QUESTION,
+        'votes': written,
+    }
+
+
+def delete_synthetic_data():
+    """
+    Remove everything seed_synthetic_data created.
+
+    Returns:
+        int: The number of rows deleted, including cascades.
+    """
+    deleted, _ = Question.objects.filter(question_text__startswith=SYNTHETIC_PREFIX).delete()
+    users, _ = User.objects.filter(username__startswith=SYNTHETIC_PREFIX).delete()
+    invalidate_pages()
+    return deleted + users
+
+
+def percentile(values, pct):
+    """
+    Return a percentile of a list of numbers, using the nearest-rank method.
+
+    Args:
+        values (list): The samples.
+        pct (float): The percentile, between 0 and 100.
+
+    Returns:
+        float or None: The percentile, or None if there are no samples.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies, queries=None, statuses=None):
+    """
+    Summarize the samples of one scenario.
+
+    Args:
+        latencies (list): Request latencies in seconds.
+        queries (list): Number of SQL queries of each request, if known.
+        statuses (dict): Number of responses per status code.
+
+    Returns:
+        dict: Request count, latency percentiles in milliseconds, query counts and statuses.
+    """
+    summary = {
+        'requests': len(latencies),
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies) * 1000, 3) if latencies else None,
+            **{f'p{pct}': round(percentile(latencies, pct) * 1000, 3) if latencies else None for pct in PERCENTILES},
+            'max': round(max(latencies) * 1000, 3) if latencies else None,
+        },
+        'status': {str(status): count for status, count in sorted((statuses or {}).items())},
+    }
+    if queries is not None:
+        summary['queries'] = {
+            'p50': percentile(queries, 50),
+            'max': max(queries, default=None),
+        }
+    return summary
+
+
+def _sample_question():
+    """Return an open question with choices, preferring synthetic ones."""
+    questions = Question.objects.open().filter(
+        pk__in=Choice.objects.values('question_id'),
+    ).order_by('-pub_date', '-pk')
+    return questions.filter(question_text__startswith=SYNTHETIC_PREFIX).first() or questions.first()
+
+
+def client_scenarios():
+    """
+    Return the requests to benchmark.
+
+    Returns:
+        list: (name, method, path, data, login) tuples. ``login`` is True for
+        requests made by a logged-in user.
+
+    Raises:
+        ValueError: If there is no open question with choices to benchmark.
+    """
+    question = _sample_question()
+    if question is None:
+        raise ValueError("No open question with choices; run `manage.py seed_polls` first.")
+    choices = list(question.choice_set.values_list('pk', flat=True))
+    deep = Question.objects.published().order_by('-pub_date', '-pk').only('pk', 'pub_date')
+    deep_row = deep[min(deep.count(), 1000) - 1]
+    return [
+        ('index', 'get', reverse('polls:index'), None, False),
+        ('index_deep_page', 'get',
+         f"{reverse('polls:index')}?cursor={encode_cursor(deep_row.pub_date, deep_row.pk)}", None, False),
+        ('detail', 'get', reverse('polls:detail', args=[question.pk]), None, False),
+        ('detail_logged_in', 'get', reverse('polls:detail', args=[question.pk]), None, True),
+        ('results', 'get', reverse('polls:results', args=[question.pk]), None, False),
+        ('results_json', 'get', reverse('polls:results_json', args=[question.pk]), None, False),
+        ('vote', 'post', reverse('polls:vote', args=[question.pk]), [{'choice': pk} for pk in choices], True),
+    ]
+
+
+def _benchmark_user():
+    """Return a user to log in as, preferring a synthetic one."""
+    user = User.objects.filter(username__startswith=SYNTHETIC_PREFIX).order_by('pk').first()
+    return user or User.objects.get_or_create(username=f'{SYNTHETIC_PREFIX}voter')[0]
+
+
+def run_client_benchmark(iterations=200, warmup=5):
+    """
+    Measure every scenario in-process with Django's test client.
+
+    Args:
+        iterations (int): Number of measured requests per scenario.
+        warmup (int): Number of unmeasured requests sent first.
+
+    Returns:
+        dict: Maps each scenario name to its summary.
+    """
+    anonymous = Client()
+    logged_in = Client()
+    logged_in.force_login(_benchmark_user())
+
+    report = {}
+    for name, method, path, data, login in client_scenarios():
+        client = logged_in if login else anonymous
+        send = getattr(client, method)
+        latencies, queries, statuses = [], [], {}
+        for n in range(warmup + iterations):
+            payload = data[n % len(data)] if data else None
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = send(path, payload)
+                elapsed = time.perf_counter() - start
+            if n < warmup:
+                continue
+            latencies.append(elapsed)
+            queries.append(len(captured))
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        report[name] = summarize(latencies, queries, statuses)
+    return report
+
+
+def template_pages():
+    """
+    Return the poll pages to render and their contexts.
+
+    Returns:
+        list: (name, template_name, path, context) tuples for the index, detail and results pages.
+
+    Raises:
+        ValueError: If there is no open question with choices to render.
+    """
+    question = _sample_question()
+    if question is None:
+        raise ValueError("No open question with choices; run `manage.py seed_polls` first.")
+    question = Question.objects.prefetch_related('choice_set').get(pk=question.pk)
+    latest = list(
+        Question.objects.published().only('id', 'question_text', 'pub_date', 'end_date').order_by('-pub_date', '-id')[:20]
+    )
+    return [
+        ('index', 'polls/index.html', reverse('polls:index'),
+         {'latest_question_list': latest, 'next_cursor': None, 'is_first_page': True, 'user_votes': {}}),
+        ('detail', 'polls/detail.html', reverse('polls:detail', args=[question.pk]),
+         {'question': question, 'previous_choice_id': None, 'previous_choice': None}),
+        ('results', 'polls/results.html', reverse('polls:results', args=[question.pk]),
+         {'question': question, 'results': get_results(question.pk), 'user_choice': None}),
+    ]
+
+
+def run_render_benchmark(iterations=200, warmup=5):
+    """
+    Measure the render time of the poll pages with the loaders of each template mode.
+
+    Pages are rendered for an anonymous visitor with the context processors
+    of the project, outside of any view, so only template work is measured.
+    Fragment caches are kept per mode.
+
+    Args:
+        iterations (int): Number of measured renders per page and mode.
+        warmup (int): Number of unmeasured renders done first.
+
+    Returns:
+        dict: Maps each page to a summary per mode, with the size of the rendered page in bytes.
+    """
+    options = settings.TEMPLATES[0].get('OPTIONS', {})
+    factory = RequestFactory()
+    pages = template_pages()
+    report = {name: {} for name, _, _, _ in pages}
+    for mode, loaders in TEMPLATE_MODES.items():
+        backend = DjangoTemplates({
+            'NAME': f'benchmark-{mode}',
+            'DIRS': settings.TEMPLATES[0].get('DIRS', []),
+            'APP_DIRS': False,
+            'OPTIONS': {**options, 'loaders': loaders},
+        })
+        for name, template_name, path, context in pages:
+            request = factory.get(path)
+            request.user = AnonymousUser()
+            context = {**context, 'page_cache_generation': f'benchmark-{mode}'}
+            latencies = []
+            for n in range(warmup + iterations):
+                start = time.perf_counter()
+                html = backend.get_template(template_name).render(context, request)
+                elapsed = time.perf_counter() - start
+                if n >= warmup:
+                    latencies.append(elapsed)
+            report[name][mode] = {'latency_ms': summarize(latencies)['latency_ms'], 'bytes': len(html.encode())}
+    return report
+
+
+def run_http_benchmark(base_url, requests=200, concurrency=10, timeout=30):
+    """
+    Measure the anonymous GET scenarios against a running server.
+
+    Args:
+        base_url (str): The server's address, e.g. ``http://127.0.0.1:8000``.
+        requests (int): Number of requests per scenario.
+        concurrency (int): Number of requests in flight at once.
+        timeout (float): Seconds to wait for each response.
+
+    Returns:
+        dict: Maps each scenario name to its summary, with the requests per second.
+    """
+    base_url = base_url.rstrip('/')
+    report = {}
+    for name, method, path, _, login in client_scenarios():
+        if method != 'get' or login:
+            continue
+        latencies, statuses = [], {}
+        lock = threading.Lock()
+
+        def fetch(_):
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(base_url + path, timeout=timeout) as response:
+                    response.read()
+                    status = response.status
+            except urllib.error.HTTPError as error:
+                status = error.code
+            except OSError:
+                status = 'error'
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(fetch, range(requests)))
+        wall = time.perf_counter() - start
+        report[name] = summarize(latencies, statuses=statuses)
+        report[name]['requests_per_second'] = round(requests / wall, 1)
+    return report
+
+
+def compare_reports(current, baseline):
+    """
+    Compare the scenarios of a report with an earlier one.
+
+    Args:
+        current (dict): The scenarios of the new report.
+        baseline (dict): The scenarios of the earlier report.
+
+    Returns:
+        dict: Maps each scenario in both reports to the relative change of its
+        p50 and p95 latency and the change of its p50 query count.
+    """
+    changes = {}
+    for name, summary in current.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        change = {}
+        for pct in ('p50', 'p95'):
+            old, new = before['latency_ms'].get(pct), summary['latency_ms'].get(pct)
+            if old and new is not None:
+                change[f'{pct}_latency'] = round((new - old) / old, 3)
+        if 'queries' in summary and 'queries' in before:
+            change['p50_queries'] = summary['queries']['p50'] - before['queries']['p50']
+        changes[name] = change
+    return changes
@@ -0,0 +1,414 @@
+"""
+polls/cache.py.
+
+This module caches the aggregated results of poll questions and the pages
+served to anonymous visitors.
+
+Snapshots are stored per question id in the cache named by the
+``POLLS_CACHE_ALIAS`` setting. Changes to votes and choices mark the snapshot
+as dirty instead of deleting it, so a question can keep serving its snapshot
+for up to ``POLLS_RESULTS_MAX_STALENESS`` seconds after a change. With the
+default staleness of 0 a dirty snapshot is always recomputed.
+
+Anonymous pages are stored under keys that include a generation number per
+question and one for the index. Changing a question, its choices or its
+votes moves to a new generation, which orphans every page built from the
+old one. A page also expires at the next pub_date or end_date it depends on,
+so polls open and close on time. Like Django's cache middleware, the key
+also holds the request's values of the headers named in the response's
+Vary header, which are learned from the first response for each URL.
+
+Each user's votes are cached as a map of question id to choice id, so pages
+can show the user's choice without a query per question. Voting moves the
+user to a new generation of the map.
+
+Values cached until the next change are computed from the primary database
+even in views that read from a replica (see polls.routers).
+
+Classes:
+- AnonymousPageCacheMixin: Cache a view's responses to anonymous visitors.
+
+Functions:
+- get_cached_results: Return the results of a question from the cache.
+- invalidate_results: Mark the cached results of a question as out of date.
+- invalidate_results_on_commit: Invalidate once the current transaction commits.
+- invalidate_pages: Drop the cached pages of a question and the index.
+- invalidate_pages_on_commit: Drop the pages once the current transaction commits.
+- get_generation_cached: Return a value cached for the current generation of some scopes.
+- get_user_votes: Return the choice a user voted for in each question.
+- get_request_votes: Return the vote map of the request's user, loaded once per request.
+- invalidate_user_votes: Drop the cached vote maps of some users.
+- invalidate_user_votes_on_commit: Drop the vote maps once the current transaction commits.
+"""
+
+import hashlib
+import time
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from .instrumentation import record_cache, timer
+from .models import Vote
+from .results import get_results
+from .routers import read_from_primary
+
+INDEX_SCOPE = 'index'
+
+
+def _cache():
+    """Return the cache backend used by the polls app."""
+    return caches[getattr(settings, 'POLLS_CACHE_ALIAS', 'default')]
+
+
+def results_cache_key(question_id):
+    """Return the cache key of the results snapshot of a question."""
+    return f'polls:results:{question_id}'
+
+
+def results_dirty_key(question_id):
+    """Return the cache key that marks the results of a question as out of date."""
+    return f'polls:results:{question_id}:dirty'
+
+
+def get_cached_results(question):
+    """
+    Return the results of a question, computing and caching them on a miss.
+
+    Args:
+        question: The Question instance or its primary key.
+
+    Returns:
+        QuestionResults: The tallies, turnout and percentages of the question.
+    """
+    question_id = getattr(question, 'pk', question)
+    cache = _cache()
+    key = results_cache_key(question_id)
+    dirty_key = results_dirty_key(question_id)
+    max_staleness = getattr(settings, 'POLLS_RESULTS_MAX_STALENESS', 0)
+
+    entries = cache.get_many([key, dirty_key])
+    snapshot = entries.get(key)
+    if snapshot is not None:
+        computed_at, results = snapshot
+        if dirty_key not in entries or time.time() - computed_at < max_staleness:
+            record_cache('results', True)
+            return results
+    record_cache('results', False)
+
+    # Clear the mark before computing so a change made meanwhile marks the new snapshot dirty.
+    cache.delete(dirty_key)
+    # Read from the primary: a lagging replica would pin old results in the cache.
+    with read_from_primary():
+        results = get_results(question_id)
+    cache.set(key, (time.time(), results), getattr(settings, 'POLLS_RESULTS_CACHE_TIMEOUT', 300))
+    return results
+
+
+def invalidate_results(question_id):
+    """
+    Mark the cached results of a question as out of date.
+
+    The question's cached pages, which show the results, are dropped too.
+
+    Args:
+        question_id: The primary key of the question.
+    """
+    _cache().set(results_dirty_key(question_id), True, getattr(settings, 'POLLS_RESULTS_CACHE_TIMEOUT', 300))
+    _bump_generations([question_scope(question_id)])
+
+
+def invalidate_results_on_commit(question_id):
+    """
+    Invalidate the cached results of a question once the current transaction commits.
+
+    Args:
+        question_id: The primary key of the question.
+    """
+    transaction.on_commit(lambda: invalidate_results(question_id))
+
+
+def question_scope(question_id):
+    """Return the page cache scope of a question's detail and results pages."""
+    return f'question:{question_id}'
+
+
+def _generation_key(scope):
+    """Return the cache key holding the current page generation of a scope."""
+    return f'polls:pages:{scope}:generation'
+
+
+def _bump_generations(scopes):
+    """Move each scope to a new page generation, orphaning its cached pages."""
+    generation = time.time_ns()
+    _cache().set_many({_generation_key(scope): generation for scope in scopes}, None)
+
+
+def page_generation(scopes):
+    """
+    Return a string identifying the current page generation of the given scopes.
+
+    Args:
+        scopes (list): The page cache scopes a page depends on.
+
+    Returns:
+        str: The generations of the scopes joined by '.'.
+    """
+    cache = _cache()
+    keys = [_generation_key(scope) for scope in scopes]
+    generations = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in generations}
+    if missing:
+        # Start evicted or new scopes at a fresh generation so old pages are never reused.
+        cache.set_many(missing, None)
+        generations.update(missing)
+    return '.'.join(str(generations[key]) for key in keys)
+
+
+def invalidate_pages(question_id=None):
+    """
+    Drop the cached pages of a question and of the index.
+
+    Args:
+        question_id: The primary key of the question, or None for the index only.
+    """
+    scopes = [INDEX_SCOPE]
+    if question_id is not None:
+        scopes.append(question_scope(question_id))
+    _bump_generations(scopes)
+
+
+def invalidate_pages_on_commit(question_id=None):
+    """
+    Drop the cached pages of a question and of the index once the current transaction commits.
+
+    Args:
+        question_id: The primary key of the question, or None for the index only.
+    """
+    transaction.on_commit(lambda: invalidate_pages(question_id))
+
+
+def get_generation_cached(name, scopes, compute):
+    """
+    Return a value cached until the given scopes move to a new generation.
+
+    Args:
+        name (str): A name for the value, unique within the scopes.
+        scopes (list): The page cache scopes the value depends on.
+        compute (callable): Returns the value and the number of seconds it
+            stays valid, or None for the default page cache timeout.
+
+    Returns:
+        The cached or freshly computed value.
+    """
+    cache = _cache()
+    key = f'polls:{name}:{":".join(scopes)}:{page_generation(scopes)}'
+    entry = cache.get(key)
+    record_cache(name, entry is not None)
+    if entry is None:
+        # Read from the primary: a lagging replica would pin an old value to the new generation.
+        with read_from_primary():
+            value, timeout = compute()
+        if timeout is None:
+            timeout = getattr(settings, 'POLLS_PAGE_CACHE_TIMEOUT', 60)
+        entry = (value,)
+        if timeout > 0:
+            cache.set(key, entry, timeout)
+    return entry[0]
+
+
+def user_scope(user_id):
+    """Return the cache scope of a user's votes."""
+    return f'user:{user_id}'
+
+
+def get_user_votes(user_id):
+    """
+    Return the choice a user voted for in each question.
+
+    The map is loaded with one query and cached until the user votes again.
+
+    Args:
+        user_id: The primary key of the user.
+
+    Returns:
+        dict: Maps question ids to the ids of the chosen choices.
+    """
+    return get_generation_cached('votes', [user_scope(user_id)], lambda: (
+        dict(Vote.objects.filter(user_id=user_id).values_list('question_id', 'choice_id')),
+        getattr(settings, 'POLLS_VOTE_MAP_CACHE_TIMEOUT', 3600),
+    ))
+
+
+def get_request_votes(request):
+    """
+    Return the vote map of the request's user, loaded at most once per request.
+
+    Args:
+        request: The HTTP request object.
+
+    Returns:
+        dict: Maps question ids to the ids of the chosen choices, empty for anonymous visitors.
+    """
+    if not hasattr(request, '_polls_votes'):
+        user = request.user
+        request._polls_votes = get_user_votes(user.pk) if user.is_authenticated else {}
+    return request._polls_votes
+
+
+def invalidate_user_votes(user_ids):
+    """
+    Drop the cached vote maps of some users.
+
+    Args:
+        user_ids: The primary keys of the users.
+    """
+    _bump_generations([user_scope(user_id) for user_id in user_ids])
+
+
+def invalidate_user_votes_on_commit(user_ids):
+    """
+    Drop the cached vote maps of some users once the current transaction commits.
+
+    Args:
+        user_ids: The primary keys of the users.
+    """
+    user_ids = set(user_ids)
+    transaction.on_commit(lambda: invalidate_user_votes(user_ids))
+
+
+class AnonymousPageCacheMixin:
+    """
+    Cache the rendered responses a view sends to anonymous visitors.
+
+    Only successful GET responses are stored, and only when the visitor has
+    no pending messages and the page neither sets a cookie nor embeds a CSRF
+    token, so one visitor's state never leaks into another's page. Views
+    declare the scopes their pages depend on and may give the next moment
+    at which their content changes by itself.
+
+    A page is cached per value of the request headers it varies on: the
+    ones named in ``page_cache_vary_headers``, which are added to its Vary
+    header, and any others the view names there.
+
+    Attributes:
+        page_cache_vary_headers (tuple): Request headers every page varies on.
+    """
+
+    # Pages read the session, whose cookie SessionMiddleware only adds to
+    # Vary once the view has returned.
+    page_cache_vary_headers = ('Cookie',)
+
+    def get_page_cache_scopes(self):
+        """
+        Return the page cache scopes this view's pages depend on.
+
+        Returns:
+            list: Scope names, such as INDEX_SCOPE or question_scope(pk).
+        """
+        raise NotImplementedError
+
+    def get_page_cache_expiry(self):
+        """
+        Return when the rendered page will change without any data changing.
+
+        Returns:
+            datetime or None: The next pub_date or end_date the page depends on.
+        """
+        return None
+
+    def get_page_cache_timeout(self):
+        """
+        Return how many seconds the rendered page may be cached.
+
+        Returns:
+            int: The timeout, capped at the page's expiry. 0 means do not cache.
+        """
+        timeout = getattr(settings, 'POLLS_PAGE_CACHE_TIMEOUT', 60)
+        expiry = self.get_page_cache_expiry()
+        if expiry is not None:
+            timeout = min(timeout, int((expiry - timezone.now()).total_seconds()))
+        return max(timeout, 0)
+
+    def get_context_data(self, **kwargs):
+        """Add the page generation so templates can key fragment caches on it."""
+        context = super().get_context_data(**kwargs)
+        if not hasattr(self, 'page_cache_generation'):
+            self.page_cache_generation = page_generation(self.get_page_cache_scopes())
+        context['page_cache_generation'] = self.page_cache_generation
+        return context
+
+    def get_page_cache_key(self, request):
+        """
+        Return the prefix of the keys this request's page is cached under, or None if it must not be cached.
+
+        Args:
+            request: The HTTP request object.
+
+        Returns:
+            str or None: The key of the page's URL in the current generation.
+        """
+        timeout = getattr(settings, 'POLLS_PAGE_CACHE_TIMEOUT', 60)
+        if request.method != 'GET' or request.user.is_authenticated or len(get_messages(request)) or timeout <= 0:
+            return None
+        self.page_cache_generation = page_generation(self.get_page_cache_scopes())
+        url_hash = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+        return f'polls:pages:{self.__class__.__name__}:{self.page_cache_generation}:{url_hash}'
+
+    @staticmethod
+    def get_vary_key(key, request, headers):
+        """
+        Return the key of a page for the request's values of the headers it varies on.
+
+        Args:
+            key (str): The key returned by get_page_cache_key().
+            request: The HTTP request object.
+            headers (list): The names of the headers in the page's Vary header.
+
+        Returns:
+            str: The cache key of the page.
+        """
+        values = hashlib.md5()
+        for header in headers:
+            values.update(request.META.get('HTTP_' + header.upper().replace('-', '_'), '').encode())
+            values.update(b'\0')
+        return f'{key}:{values.hexdigest()}'
+
+    def get_cached_page(self, request, key):
+        """Return the response cached for this request under ``key``, or None."""
+        headers = _cache().get(f'{key}:vary')
+        response = None if headers is None else _cache().get(self.get_vary_key(key, request, headers))
+        record_cache('page', response is not None)
+        return response
+
+    def cache_page(self, request, key, response):
+        """
+        Render the response and cache it under ``key`` if it is safe to share.
+
+        Args:
+            request: The HTTP request object.
+            key (str): The key returned by get_page_cache_key().
+            response: The response of the view.
+        """
+        if hasattr(response, 'render') and callable(response.render):
+            with timer('template'):
+                response.render()
+        patch_vary_headers(response, self.page_cache_vary_headers)
+        headers = sorted({header.strip().lower() for header in response['Vary'].split(',')})
+        shareable = not response.cookies and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE') and '*' not in headers
+        if response.status_code == 200 and shareable:
+            timeout = self.get_page_cache_timeout()
+            if timeout > 0:
+                _cache().set_many({f'{key}:vary': headers, self.get_vary_key(key, request, headers): response}, timeout)
+
+    def dispatch(self, request, *args, **kwargs):
+        """Serve the page from the cache or cache the freshly rendered page."""
+        key = self.get_page_cache_key(request)
+        if key is None:
+            return super().dispatch(request, *args, **kwargs)
+        response = self.get_cached_page(request, key)
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+            self.cache_page(request, key, response)
+        return response
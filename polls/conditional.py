@@ -0,0 +1,135 @@
+"""
+polls/conditional.py.
+
+This module computes ETag and Last-Modified values for the poll pages so
+unchanged pages can be answered with ``304 Not Modified`` before any
+template is rendered.
+
+The values come from ``Question.version`` and ``Question.modified`` and
+the pub_date/end_date boundaries that have passed. They are kept in the
+cache under the same generations as the cached pages, so answering a
+conditional request usually needs no query at all. They also depend on the
+visitor, because pages greet logged-in users and mark their votes; the
+index ETag of a logged-in user also follows the generation of their votes.
+Requests with pending messages get no validators, so they always see a
+freshly rendered page.
+
+Functions:
+- index_etag, index_last_modified: Validators for the index page.
+- question_etag, question_last_modified: Validators for the detail and results pages.
+"""
+
+import hashlib
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.db.models import Count, Max, Min, Q
+from django.utils import timezone
+from .cache import INDEX_SCOPE, get_generation_cached, page_generation, question_scope, user_scope
+from .models import Question
+from .sessions import session_user_id
+
+
+def _visitor(request):
+    """Return the part of the validators that identifies the visitor, or None if uncacheable."""
+    if len(get_messages(request)):
+        return None
+    # Read the user id from the session, so a 304 never loads the user.
+    user_id = session_user_id(request)
+    return str(user_id) if user_id is not None else 'anonymous'
+
+
+def _etag(*parts):
+    """Return a strong ETag value built from the given parts."""
+    return hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def _index_stats():
+    """Query the index validators and how long they stay valid."""
+    now = timezone.now()
+    stats = Question.objects.aggregate(
+        latest_change=Max('modified'),
+        latest_publication=Max('pub_date', filter=Q(pub_date__lte=now)),
+        latest_closing=Max('end_date', filter=Q(end_date__lt=now)),
+        next_publication=Min('pub_date', filter=Q(pub_date__gt=now)),
+        next_closing=Min('end_date', filter=Q(end_date__gte=now)),
+        total=Count('pk'),
+        published=Count('pk', filter=Q(pub_date__lte=now)),
+        closed=Count('pk', filter=Q(end_date__lt=now)),
+    )
+    last_modified = max(
+        (stats[key] for key in ('latest_change', 'latest_publication', 'latest_closing') if stats[key] is not None),
+        default=None,
+    )
+    next_boundary = min(
+        (stats[key] for key in ('next_publication', 'next_closing') if stats[key] is not None),
+        default=None,
+    )
+    timeout = None
+    if next_boundary is not None:
+        timeout = min(getattr(settings, 'POLLS_PAGE_CACHE_TIMEOUT', 60),
+                      int((next_boundary - now).total_seconds()))
+    return (last_modified, stats['total'], stats['published'], stats['closed']), timeout
+
+
+def _index_state(request):
+    """Return the (etag, last_modified) of the index, computed once per request."""
+    if not hasattr(request, '_polls_index_state'):
+        visitor = _visitor(request)
+        state = (None, None)
+        if visitor is not None:
+            last_modified, *counts = get_generation_cached('validators', [INDEX_SCOPE], _index_stats)
+            if visitor != 'anonymous':
+                # Votes do not touch the index scope, but change the user's badges.
+                visitor = f'{visitor}:{page_generation([user_scope(visitor)])}'
+            etag = _etag(visitor, request.get_full_path(), last_modified and last_modified.isoformat(), *counts)
+            state = (etag, last_modified)
+        request._polls_index_state = state
+    return request._polls_index_state
+
+
+def _question_state(request, pk):
+    """Return the (etag, last_modified) of a question's pages, computed once per request."""
+    if not hasattr(request, '_polls_question_state'):
+        visitor = _visitor(request)
+        state = (None, None)
+        row = None
+        if visitor is not None:
+            row = get_generation_cached('validators', [question_scope(pk)], lambda: (
+                Question.objects.filter(pk=pk).values_list('version', 'modified', 'pub_date', 'end_date').first(),
+                None,
+            ))
+        if row is not None:
+            version, modified, pub_date, end_date = row
+            now = timezone.now()
+            published = pub_date <= now
+            closed = end_date is not None and end_date < now
+            boundaries = [modified]
+            if published:
+                boundaries.append(pub_date)
+            if closed:
+                boundaries.append(end_date)
+            last_modified = max(boundaries)
+            etag = _etag(visitor, request.get_full_path(), version, modified.isoformat(), published, closed)
+            state = (etag, last_modified)
+        request._polls_question_state = state
+    return request._polls_question_state
+
+
+def index_etag(request, *args, **kwargs):
+    """Return the ETag of the index page."""
+    return _index_state(request)[0]
+
+
+def index_last_modified(request, *args, **kwargs):
+    """Return the Last-Modified time of the index page."""
+    return _index_state(request)[1]
+
+
+def question_etag(request, pk, *args, **kwargs):
+    """Return the ETag of a question's detail or results page."""
+    return _question_state(request, pk)[0]
+
+
+def question_last_modified(request, pk, *args, **kwargs):
+    """Return the Last-Modified time of a question's detail or results page."""
+    return _question_state(request, pk)[1]
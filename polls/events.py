@@ -0,0 +1,115 @@
+"""
+polls/events.py.
+
+This module is an in-process publish/subscribe channel for live results.
+
+Votes written by ``polls.voting`` publish the change in each choice's tally
+once their transaction commits, and the results stream view forwards them
+to its subscribers as Server-Sent Events. Subscribers only see votes written
+by the same process, so this suits single-node deployments served by one
+ASGI process.
+
+Classes:
+- ResultsBroker: Fans tally deltas out to the asyncio queues of subscribers.
+
+Functions:
+- format_event: Format an event as a Server-Sent Events message.
+
+Attributes:
+- broker: The broker shared by the whole process.
+"""
+
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+
+class ResultsBroker:
+    """Fans tally deltas out to the asyncio queues of subscribers, per question."""
+
+    def __init__(self, max_queued=100):
+        """
+        Create a broker without subscribers.
+
+        Args:
+            max_queued (int): Events kept per subscriber; older ones are dropped for slow clients.
+        """
+        self.max_queued = max_queued
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, question_id):
+        """
+        Subscribe the running event loop to the deltas of a question.
+
+        Args:
+            question_id: The primary key of the question.
+
+        Returns:
+            asyncio.Queue: The queue the deltas are delivered to.
+        """
+        queue = asyncio.Queue(maxsize=self.max_queued)
+        with self._lock:
+            self._subscribers[question_id].add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, question_id, queue):
+        """
+        Stop delivering the deltas of a question to a queue.
+
+        Args:
+            question_id: The primary key of the question.
+            queue (asyncio.Queue): The queue returned by subscribe().
+        """
+        with self._lock:
+            subscribers = self._subscribers[question_id]
+            subscribers.difference_update({entry for entry in subscribers if entry[1] is queue})
+            if not subscribers:
+                del self._subscribers[question_id]
+
+    def subscriber_count(self, question_id):
+        """Return the number of subscribers of a question."""
+        with self._lock:
+            return len(self._subscribers.get(question_id, ()))
+
+    def publish(self, question_id, event):
+        """
+        Deliver an event to every subscriber of a question, from any thread.
+
+        Args:
+            question_id: The primary key of the question.
+            event (dict): The event, which must be JSON serializable.
+        """
+        with self._lock:
+            subscribers = list(self._subscribers.get(question_id, ()))
+        for loop, queue in subscribers:
+            if loop.is_closed():
+                # The subscriber's loop ended without unsubscribing.
+                self.unsubscribe(question_id, queue)
+                continue
+            loop.call_soon_threadsafe(_put_dropping_oldest, queue, event)
+
+
+def _put_dropping_oldest(queue, event):
+    """Queue an event, dropping the oldest one if the subscriber has fallen behind."""
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(event)
+
+
+def format_event(name, data):
+    """
+    Format an event as a Server-Sent Events message.
+
+    Args:
+        name (str): The event type.
+        data: The JSON serializable payload.
+
+    Returns:
+        str: The message, terminated by a blank line.
+    """
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+
+broker = ResultsBroker()
@@ -0,0 +1,207 @@
+"""
+polls/instrumentation.py.
+
+This module measures where request time goes.
+
+While a sampled request is handled, a RequestMetrics object collects its SQL
+query count and time, template render time and cache hits and misses. The
+SQL numbers come from an execute wrapper installed on every database
+connection, which costs one context variable lookup per query when no
+request is being measured. When the request ends, its numbers go into the
+histograms of polls.metrics, which the /metrics endpoint serves.
+
+Classes:
+- RequestMetrics: The measurements of one request.
+
+Functions:
+- start_request: Begin measuring a request if it is sampled.
+- finish_request: Stop measuring a request and record it in the histograms.
+- current_metrics: Return the measurements of the current request, if any.
+- timer: Context manager that adds its duration to a timing of the current request.
+- record_cache: Count a cache hit or miss for the current request.
+- install_query_timer: Install the SQL execute wrapper on a new connection.
+- server_timing: Format the measurements of a request as a Server-Timing header.
+"""
+
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from . import metrics as polls_metrics
+
+_current = ContextVar('polls_request_metrics', default=None)
+
+# Upper bounds in seconds, and in queries, of the histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+class RequestMetrics:
+    """
+    The measurements of one request.
+
+    Attributes:
+        started (float): perf_counter() when the request started.
+        queries (int): Number of SQL queries executed.
+        timings (dict): Seconds spent per activity, such as 'db' and 'template'.
+        cache (dict): Maps (cache name, 'hit' or 'miss') to a count.
+    """
+
+    __slots__ = ('started', 'queries', 'timings', 'cache')
+
+    def __init__(self):
+        """Start the measurements now."""
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.timings = {}
+        self.cache = {}
+
+    def add_time(self, name, seconds):
+        """Add seconds to a named timing."""
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+
+request_duration = polls_metrics.histogram(
+    'polls_request_duration_seconds', "Time to produce a response, per URL name.", ('view',), DURATION_BUCKETS,
+)
+request_queries = polls_metrics.histogram(
+    'polls_request_queries', "SQL queries per request, per URL name.", ('view',), QUERY_BUCKETS,
+)
+request_db_duration = polls_metrics.histogram(
+    'polls_request_db_duration_seconds', "Time spent in SQL queries per request, per URL name.", ('view',),
+    DURATION_BUCKETS,
+)
+request_template_duration = polls_metrics.histogram(
+    'polls_request_template_duration_seconds', "Time spent rendering templates per request, per URL name.",
+    ('view',), DURATION_BUCKETS,
+)
+cache_requests = polls_metrics.counter(
+    'polls_cache_requests_total', "Cache lookups made while serving sampled requests.", ('cache', 'result'),
+)
+
+
+def start_request():
+    """
+    Begin measuring a request if it falls in the sample.
+
+    Returns:
+        tuple or None: A token for finish_request(), or None if the request is not sampled.
+    """
+    rate = getattr(settings, 'POLLS_INSTRUMENTATION_SAMPLE_RATE', 1.0)
+    if rate <= 0 or (rate < 1 and random.random() >= rate):
+        return None
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def finish_request(token, view_name):
+    """
+    Stop measuring a request and record it in the histograms.
+
+    Args:
+        token (tuple): The value returned by start_request().
+        view_name (str): The name the request is recorded under.
+
+    Returns:
+        RequestMetrics: The measurements of the request.
+    """
+    metrics, context_token = token
+    _current.reset(context_token)
+    metrics.add_time('total', time.perf_counter() - metrics.started)
+    request_duration.observe((view_name,), metrics.timings['total'])
+    request_queries.observe((view_name,), metrics.queries)
+    request_db_duration.observe((view_name,), metrics.timings.get('db', 0.0))
+    request_template_duration.observe((view_name,), metrics.timings.get('template', 0.0))
+    for labels, count in metrics.cache.items():
+        cache_requests.inc(labels, count)
+    polls_metrics.maybe_flush()
+    return metrics
+
+
+def current_metrics():
+    """Return the RequestMetrics of the request being measured, or None."""
+    return _current.get()
+
+
+@contextmanager
+def timer(name):
+    """
+    Add the duration of the block to a named timing of the current request.
+
+    Args:
+        name (str): The timing, such as 'template'.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_time(name, time.perf_counter() - start)
+
+
+def record_cache(name, hit):
+    """
+    Count a cache hit or miss for the current request.
+
+    Args:
+        name (str): The cache, such as 'page' or 'results'.
+        hit (bool): Whether the lookup found a value.
+    """
+    metrics = _current.get()
+    if metrics is not None:
+        key = (name, 'hit' if hit else 'miss')
+        metrics.cache[key] = metrics.cache.get(key, 0) + 1
+
+
+def _time_query(execute, sql, params, many, context):
+    """Execute wrapper that counts and times the queries of a measured request."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.add_time('db', time.perf_counter() - start)
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """
+    Install the SQL execute wrapper on a new database connection.
+
+    Connected to the connection_created signal, so queries made from any
+    thread, including the ones sync_to_async runs for async views, are seen.
+
+    Args:
+        sender: The database wrapper class.
+        connection: The new database connection.
+        **kwargs: Additional keyword arguments.
+    """
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+def server_timing(metrics):
+    """
+    Format measurements as a Server-Timing header value.
+
+    Args:
+        metrics (RequestMetrics): The measurements of a request.
+
+    Returns:
+        str: The header value, with durations in milliseconds.
+    """
+    entries = [
+        f'app;dur={metrics.timings["total"] * 1000:.1f}',
+        f'db;dur={metrics.timings.get("db", 0.0) * 1000:.1f};desc="{metrics.queries} queries"',
+    ]
+    if 'template' in metrics.timings:
+        entries.append(f'tpl;dur={metrics.timings["template"] * 1000:.1f}')
+    for (name, result), count in sorted(metrics.cache.items()):
+        entries.append(f'cache-{name}-{result};desc="{count}"')
+    return ', '.join(entries)
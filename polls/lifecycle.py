@@ -0,0 +1,174 @@
+"""
+polls/lifecycle.py.
+
+This module moves questions through their lifecycle: scheduled until their
+pub_date, open until their end_date, then closed.
+
+The status of a question at its last transition is stored in
+``Question.status``. Every save sets it from the dates, fixtures included;
+when a date passes, advance() moves the question on, bumps its version and
+drops its cached pages. Listings and vote checks compare the dates with the
+clock themselves, so questions open and close on time even while the
+scheduler is off; the scheduler keeps the stored status and the versions of
+the questions in step. The scheduler
+calls advance() at each pub_date and end_date, either in a background thread
+of every server process (POLLS_LIFECYCLE_SCHEDULER = 'thread') or in its own
+process with ``manage.py run_lifecycle``.
+
+Classes:
+- LifecycleScheduler: Call advance() whenever a question is due.
+
+Functions:
+- advance: Move every due question to the status its dates give it now.
+- next_transition: Return when the next question becomes due.
+- start_scheduler: Start the background scheduler of this process, if enabled.
+- wake_scheduler: Make the running scheduler look for due questions now.
+"""
+
+import logging
+import os
+import threading
+from collections import defaultdict
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from .cache import invalidate_pages_on_commit
+from .models import Question
+
+logger = logging.getLogger('myapp')
+
+_scheduler = {'pid': None, 'instance': None}
+_scheduler_lock = threading.Lock()
+
+
+def advance(now=None):
+    """
+    Move every due question to the status its dates give it now.
+
+    The questions' versions are bumped, which changes the ETags of their
+    pages, and their cached pages and the index are dropped once committed.
+
+    Args:
+        now (datetime): The reference time, defaults to the current time.
+
+    Returns:
+        dict: Maps each new status to the ids of the questions moved to it.
+    """
+    now = now or timezone.now()
+    moved = defaultdict(list)
+    with transaction.atomic():
+        for question in Question.objects.due(now).select_for_update().only('id', 'pub_date', 'end_date', 'status'):
+            moved[question.compute_status(now)].append(question.pk)
+        for status, ids in moved.items():
+            Question.objects.filter(pk__in=ids).update(status=status, version=F('version') + 1, modified=now)
+            for question_id in ids:
+                invalidate_pages_on_commit(question_id)
+            logger.info("Questions %s are now %s.", ids, status)
+    return dict(moved)
+
+
+def next_transition():
+    """
+    Return when the next question becomes due.
+
+    Returns:
+        datetime or None: The earliest pub_date of a scheduled question or end_date of an open one.
+    """
+    # Read the stored status: a question is due once its dates move past it.
+    scheduled = Question.objects.filter(status=Question.Status.SCHEDULED)
+    next_open = scheduled.order_by('pub_date').values_list('pub_date', flat=True).first()
+    next_close = (
+        Question.objects.filter(status=Question.Status.OPEN, end_date__isnull=False)
+        .order_by('end_date').values_list('end_date', flat=True).first()
+    )
+    return min((moment for moment in (next_open, next_close) if moment is not None), default=None)
+
+
+class LifecycleScheduler:
+    """
+    Call advance() whenever a question is due.
+
+    The scheduler sleeps until the next pub_date or end_date, but never
+    longer than ``interval`` seconds, so questions created by other
+    processes are picked up too. wake() cuts the sleep short.
+
+    Attributes:
+        interval (float): The longest sleep, in seconds.
+    """
+
+    def __init__(self, interval=None):
+        """Create a scheduler that is not running yet."""
+        self.interval = interval if interval is not None else getattr(settings, 'POLLS_LIFECYCLE_INTERVAL', 60)
+        self.thread = None
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+
+    def run_once(self):
+        """
+        Advance the due questions and return how long to sleep.
+
+        Returns:
+            float: Seconds until the next transition, at most ``interval``.
+        """
+        try:
+            advance()
+            upcoming = next_transition()
+        except Exception:
+            # Keep the thread alive; the next pass tries again.
+            logger.exception("Could not advance the poll lifecycle.")
+            return self.interval
+        finally:
+            close_old_connections()
+        if upcoming is None:
+            return self.interval
+        # A question closes once its end_date has passed, so wake just after it.
+        return min(self.interval, max((upcoming - timezone.now()).total_seconds(), 0) + 0.001)
+
+    def run(self):
+        """Advance questions as they become due until stop() is called."""
+        while not self._stopping.is_set():
+            timeout = self.run_once()
+            self._wake.wait(timeout)
+            self._wake.clear()
+
+    def start(self):
+        """Run the scheduler in a daemon thread."""
+        self.thread = threading.Thread(target=self.run, name='polls-lifecycle', daemon=True)
+        self.thread.start()
+
+    def wake(self):
+        """Look for due questions now."""
+        self._wake.set()
+
+    def stop(self):
+        """Stop the scheduler after its current pass."""
+        self._stopping.set()
+        self._wake.set()
+        if self.thread is not None:
+            self.thread.join()
+
+
+def start_scheduler():
+    """
+    Start the background scheduler of this process, unless POLLS_LIFECYCLE_SCHEDULER is not 'thread'.
+
+    Called by the WSGI and ASGI applications. A forked worker starts its own.
+
+    Returns:
+        LifecycleScheduler or None: The running scheduler.
+    """
+    if getattr(settings, 'POLLS_LIFECYCLE_SCHEDULER', 'thread') != 'thread':
+        return None
+    with _scheduler_lock:
+        if _scheduler['pid'] != os.getpid():
+            _scheduler['pid'] = os.getpid()
+            _scheduler['instance'] = LifecycleScheduler()
+            _scheduler['instance'].start()
+        return _scheduler['instance']
+
+
+def wake_scheduler():
+    """Make the scheduler of this process, if one runs, look for due questions now."""
+    if _scheduler['pid'] == os.getpid():
+        _scheduler['instance'].wake()
@@ -0,0 +1 @@
+"""Makes this directory be counted as a module."""
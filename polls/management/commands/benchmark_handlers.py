@@ -0,0 +1,88 @@
+"""
+polls/management/commands/benchmark_handlers.py.
+
+Management command that compares the throughput of the sync views under the
+WSGI handler with the async views under the ASGI handler.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+
+
+class Command(BaseCommand):
+    """Measure requests per second of a page under WSGI and ASGI."""
+
+    help = (
+        "Request a page repeatedly through the WSGI handler with the sync views and "
+        "through the ASGI handler with the async views, and report requests per second."
+    )
+
+    def add_arguments(self, parser):
+        """Register the command line options."""
+        parser.add_argument('path', nargs='?', default='/polls/', help="Path of the page to request.")
+        parser.add_argument('--requests', type=int, default=500, help="Number of requests per handler.")
+        parser.add_argument('--concurrency', type=int, default=10, help="Number of requests in flight at once.")
+
+    def handle(self, *args, **options):
+        """Run both benchmarks and print the results."""
+        path, requests, concurrency = options['path'], options['requests'], options['concurrency']
+        if requests < 1 or concurrency < 1:
+            raise CommandError("--requests and --concurrency must be positive.")
+
+        # The test clients send requests for the host "testserver".
+        allowed_hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+        with override_settings(ROOT_URLCONF='mysite.urls', ALLOWED_HOSTS=allowed_hosts):
+            wsgi = self.run_wsgi(path, requests, concurrency)
+        with override_settings(ROOT_URLCONF='mysite.async_urls', ALLOWED_HOSTS=allowed_hosts):
+            asgi = asyncio.run(self.run_asgi(path, requests, concurrency))
+
+        for name, (elapsed, statuses) in (('WSGI (sync views)', wsgi), ('ASGI (async views)', asgi)):
+            summary = ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items()))
+            self.stdout.write(f"{name:<20} {requests / elapsed:8.1f} req/s  ({summary})")
+
+    @staticmethod
+    def _count(statuses, status):
+        statuses[status] = statuses.get(status, 0) + 1
+
+    def run_wsgi(self, path, requests, concurrency):
+        """
+        Send the requests through the WSGI handler from a pool of threads.
+
+        Returns:
+            tuple: The elapsed seconds and a count of responses per status code.
+        """
+        statuses = {}
+        clients = [Client() for _ in range(concurrency)]
+
+        def worker(index):
+            client = clients[index]
+            for _ in range(index, requests, concurrency):
+                self._count(statuses, client.get(path).status_code)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(worker, range(concurrency)))
+        return time.perf_counter() - start, statuses
+
+    async def run_asgi(self, path, requests, concurrency):
+        """
+        Send the requests through the ASGI handler from concurrent tasks.
+
+        Returns:
+            tuple: The elapsed seconds and a count of responses per status code.
+        """
+        statuses = {}
+
+        async def worker(index):
+            client = AsyncClient()
+            for _ in range(index, requests, concurrency):
+                response = await client.get(path)
+                self._count(statuses, response.status_code)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(index) for index in range(concurrency)))
+        return time.perf_counter() - start, statuses
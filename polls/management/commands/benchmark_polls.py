@@ -0,0 +1,84 @@
+"""
+polls/management/commands/benchmark_polls.py.
+
+Management command that measures latency percentiles and query counts of the
+index, detail, results and vote requests, and writes them as JSON.
+"""
+
+import json
+import platform
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.utils import timezone
+from polls.benchmark import compare_reports, run_client_benchmark, run_http_benchmark
+from polls.models import Question, Vote
+
+# Replaces every cache with one that never stores anything
+NO_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+class Command(BaseCommand):
+    """Benchmark the poll request paths and report the results as JSON."""
+
+    help = (
+        "Measure latency percentiles and query counts of the poll pages with Django's test "
+        "client, or latency and throughput against a running server with --url."
+    )
+
+    def add_arguments(self, parser):
+        """Register the command line options."""
+        parser.add_argument('--iterations', type=int, default=200, help="Measured requests per scenario.")
+        parser.add_argument('--cold', action='store_true', help="Disable caching to measure uncached requests.")
+        parser.add_argument('--url', help="Benchmark a running server at this address instead, e.g. http://127.0.0.1:8000.")
+        parser.add_argument('--concurrency', type=int, default=10, help="Requests in flight at once with --url.")
+        parser.add_argument('--output', help="Write the JSON report to this file instead of standard output.")
+        parser.add_argument('--baseline', help="Compare with an earlier JSON report and include the changes.")
+
+    def handle(self, *args, **options):
+        """Run the benchmark and write the report."""
+        if options['iterations'] < 1 or options['concurrency'] < 1:
+            raise CommandError("--iterations and --concurrency must be positive.")
+
+        try:
+            if options['url']:
+                scenarios = run_http_benchmark(options['url'], options['iterations'], options['concurrency'])
+            else:
+                # The test client sends requests for the host "testserver", and
+                # the vote scenario votes far faster than the rate limits allow.
+                overrides = {'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver'], 'POLLS_RATE_LIMITS': {}}
+                if options['cold']:
+                    overrides['CACHES'] = NO_CACHES
+                with override_settings(**overrides):
+                    scenarios = run_client_benchmark(options['iterations'])
+        except ValueError as error:
+            raise CommandError(error)
+
+        report = {
+            'meta': {
+                'timestamp': timezone.now().isoformat(),
+                'driver': 'http' if options['url'] else 'client',
+                'url': options['url'],
+                'cold': options['cold'],
+                'iterations': options['iterations'],
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'questions': Question.objects.count(),
+                'votes': Vote.objects.count(),
+            },
+            'scenarios': scenarios,
+        }
+        if options['baseline']:
+            with open(options['baseline']) as baseline:
+                report['changes'] = compare_reports(scenarios, json.load(baseline)['scenarios'])
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Wrote the report to {options['output']}."))
+        else:
+            self.stdout.write(output)
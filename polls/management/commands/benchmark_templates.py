@@ -0,0 +1,51 @@
+"""
+polls/management/commands/benchmark_templates.py.
+
+Management command that measures the render time and size of the index,
+detail and results pages with the loaders of each template mode, and writes
+them as JSON.
+"""
+
+import json
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from polls.benchmark import run_render_benchmark
+
+
+class Command(BaseCommand):
+    """Benchmark rendering the poll pages and report the results as JSON."""
+
+    help = "Measure the render time of the poll pages without caching, with the cached loader and minified."
+
+    def add_arguments(self, parser):
+        """Register the command line options."""
+        parser.add_argument('--iterations', type=int, default=200, help="Measured renders per page and mode.")
+        parser.add_argument('--output', help="Write the JSON report to this file instead of standard output.")
+
+    def handle(self, *args, **options):
+        """Run the benchmark and write the report."""
+        if options['iterations'] < 1:
+            raise CommandError("--iterations must be positive.")
+        try:
+            pages = run_render_benchmark(options['iterations'])
+        except ValueError as error:
+            raise CommandError(error)
+
+        report = {
+            'meta': {
+                'timestamp': timezone.now().isoformat(),
+                'iterations': options['iterations'],
+                'django': django.get_version(),
+                'template_mode': getattr(settings, 'POLLS_TEMPLATE_MODE', 'default'),
+            },
+            'pages': pages,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Wrote the report to {options['output']}."))
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,32 @@
+"""
+polls/management/commands/export_polls.py.
+
+Management command that streams every user, question, choice and vote to a
+JSON Lines, JSON or CSV archive (see polls.transfer).
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from polls.transfer import FORMATS, export_records
+
+
+class Command(BaseCommand):
+    """Write users, questions, choices and votes to an archive for import_polls."""
+
+    help = "Export users, questions, choices and votes to a .jsonl, .json or .csv file (optionally .gz)."
+
+    def add_arguments(self, parser):
+        """Register the command line options."""
+        parser.add_argument('path', help="The archive to write, e.g. polls.jsonl.gz.")
+        parser.add_argument('--format', choices=FORMATS, help="The archive format; guessed from the file name by default.")
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Number of rows fetched from the database at a time.")
+
+    def handle(self, *args, **options):
+        """Export the records."""
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size must be positive.")
+        try:
+            counts = export_records(options['path'], options['format'], options['chunk_size'])
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+        summary = ", ".join(f"{count} {label}" for label, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Exported {summary} to {options['path']}."))
@@ -0,0 +1,52 @@
+"""
+polls/management/commands/flush_votes.py.
+
+Management command that runs the write-behind vote flusher.
+"""
+
+import time
+from django.core.management.base import BaseCommand
+from polls.vote_queue import flush_vote_queue, get_vote_queue
+
+
+class Command(BaseCommand):
+    """Drain the write-behind vote queue into the database in batches."""
+
+    help = "Write queued votes to the database in batches (used with VOTE_MODE=write_behind)."
+
+    def add_arguments(self, parser):
+        """Register the command line options."""
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help="Maximum number of votes written per transaction.",
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help="Seconds to sleep when the queue is empty.",
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help="Drain the queue once and exit instead of running forever.",
+        )
+
+    def handle(self, *args, **options):
+        """Flush batches until the queue is empty, then sleep or exit."""
+        queue = get_vote_queue()
+        total = 0
+        try:
+            while True:
+                flushed = flush_vote_queue(queue, options['batch_size'])
+                total += flushed
+                if flushed:
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"Flushed {total} queued vote(s)."))
@@ -0,0 +1,48 @@
+"""
+polls/management/commands/import_polls.py.
+
+Management command that imports users, questions, choices and votes from
+JSON Lines, JSON or CSV archives in batches, remapping their primary keys
+(see polls.transfer). It replaces ``loaddata`` for large archives.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from polls.transfer import FORMATS, import_records
+
+
+class Command(BaseCommand):
+    """Import archives written by export_polls, or fixtures such as data/polls-v4.json."""
+
+    help = (
+        "Import users, questions, choices and votes from .jsonl, .json or .csv files (optionally .gz) "
+        "with batched inserts. Questions and choices get new keys; users are matched by username."
+    )
+
+    def add_arguments(self, parser):
+        """Register the command line options."""
+        parser.add_argument('paths', nargs='+', help="The archives to import, in order, e.g. users before votes.")
+        parser.add_argument('--format', choices=FORMATS, help="The archive format; guessed from each file name by default.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Number of records written per transaction.")
+        parser.add_argument(
+            '--checkpoint',
+            help="Record progress in this file, and resume from it if it exists.",
+        )
+
+    def handle(self, *args, **options):
+        """Import the archives."""
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be positive.")
+        log = self.stdout.write if options['verbosity'] > 1 else None
+        try:
+            counts = import_records(
+                options['paths'],
+                format=options['format'],
+                batch_size=options['batch_size'],
+                checkpoint=options['checkpoint'],
+                log=log,
+            )
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+        for label, totals in counts.items():
+            self.stdout.write(f"{label}: {totals['created']} created, {totals['skipped']} skipped")
+        self.stdout.write(self.style.SUCCESS("Import finished."))
@@ -0,0 +1,31 @@
+"""
+polls/management/commands/prune_sessions.py.
+
+Management command that deletes expired sessions in batches (see
+polls.sessions.prune_sessions). Run it from cron instead of clearsessions.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from polls.sessions import prune_sessions
+
+
+class Command(BaseCommand):
+    """Delete expired sessions from the database in batches."""
+
+    help = "Delete expired sessions in batches, without one long DELETE."
+
+    def add_arguments(self, parser):
+        """Register the command line options."""
+        parser.add_argument('--batch-size', type=int, default=1000, help="Sessions deleted per statement.")
+        parser.add_argument('--pause', type=float, default=0, help="Seconds to sleep between batches.")
+
+    def handle(self, *args, **options):
+        """Prune the expired sessions and report how many were deleted."""
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        log = self.stdout.write if options['verbosity'] > 1 else None
+        deleted = prune_sessions(options['batch_size'], options['pause'], log=log)
+        if deleted is None:
+            self.stdout.write("The session engine keeps no sessions in the database.")
+            return
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired sessions."))
@@ -0,0 +1,55 @@
+"""
+polls/management/commands/reconcile_votes.py.
+
+Management command that brings the denormalized ``Choice.votes`` counters
+back in line with the Vote rows they summarize.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F
+from polls.cache import invalidate_results_on_commit
+from polls.models import Choice, Question
+
+
+class Command(BaseCommand):
+    """Recount votes for every choice and fix counters that have drifted."""
+
+    help = "Reconcile Choice.votes counters against the recorded Vote rows."
+
+    def add_arguments(self, parser):
+        """Register the command line options."""
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Report drifted counters without writing any changes.",
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help="Number of choices written per UPDATE statement.",
+        )
+
+    def handle(self, *args, **options):
+        """Find every choice whose counter disagrees with its votes and fix it."""
+        with transaction.atomic():
+            drifted = list(
+                Choice.objects
+                .annotate(actual=Count('vote'))
+                .exclude(votes=F('actual'))
+                .only('id', 'question_id', 'votes')
+            )
+            for choice in drifted:
+                self.stdout.write(f"Choice {choice.id}: counter {choice.votes}, actual {choice.actual}")
+                choice.votes = choice.actual
+
+            if drifted and not options['dry_run']:
+                Choice.objects.bulk_update(drifted, ['votes'], batch_size=options['batch_size'])
+                question_ids = {choice.question_id for choice in drifted}
+                Question.objects.filter(pk__in=question_ids).touch()
+                for question_id in question_ids:
+                    invalidate_results_on_commit(question_id)
+
+        verb = "would be fixed" if options['dry_run'] else "fixed"
+        self.stdout.write(self.style.SUCCESS(f"{len(drifted)} choice counter(s) {verb}."))
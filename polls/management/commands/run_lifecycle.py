@@ -0,0 +1,40 @@
+"""
+polls/management/commands/run_lifecycle.py.
+
+Management command that opens and closes polls at their pub_date and
+end_date (see polls.lifecycle). Run it as its own process when
+POLLS_LIFECYCLE_SCHEDULER is 'off', or with --once from cron.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from polls.lifecycle import LifecycleScheduler, advance
+
+
+class Command(BaseCommand):
+    """Move questions from scheduled to open to closed as their dates pass."""
+
+    help = "Open and close polls as their publication and end dates pass."
+
+    def add_arguments(self, parser):
+        """Register the command line options."""
+        parser.add_argument('--once', action='store_true', help="Advance the due polls once and exit.")
+        parser.add_argument(
+            '--interval',
+            type=float,
+            help="Longest time between two looks for due polls, in seconds (default: POLLS_LIFECYCLE_INTERVAL).",
+        )
+
+    def handle(self, *args, **options):
+        """Advance the due polls, once or until interrupted."""
+        if options['once']:
+            moved = advance()
+            summary = ", ".join(f"{len(ids)} {status}" for status, ids in moved.items()) or "none"
+            self.stdout.write(self.style.SUCCESS(f"Polls moved: {summary}."))
+            return
+        if options['interval'] is not None and options['interval'] <= 0:
+            raise CommandError("--interval must be positive.")
+        self.stdout.write("Advancing polls as they become due. Press CTRL+C to stop.")
+        try:
+            LifecycleScheduler(options['interval']).run()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,42 @@
+"""
+polls/management/commands/seed_polls.py.
+
+Management command that fills the database with synthetic polls for benchmarks.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from polls.benchmark import delete_synthetic_data, seed_synthetic_data
+
+
+class Command(BaseCommand):
+    """Create synthetic users, questions, choices and votes, or remove them."""
+
+    help = "Seed synthetic polls and votes for benchmarking (see benchmark_polls)."
+
+    def add_arguments(self, parser):
+        """Register the command line options."""
+        parser.add_argument('--questions', type=int, default=1000, help="Number of questions to create.")
+        parser.add_argument('--users', type=int, default=1000, help="Number of users to create.")
+        parser.add_argument('--votes', type=int, default=100000, help="Number of votes to create.")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Number of rows written per INSERT.")
+        parser.add_argument('--seed', type=int, default=0, help="Seed of the random generator.")
+        parser.add_argument('--delete', action='store_true', help="Remove all synthetic data instead.")
+
+    def handle(self, *args, **options):
+        """Seed or delete the synthetic data."""
+        if options['delete']:
+            deleted = delete_synthetic_data()
+            self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} synthetic row(s)."))
+            return
+        if min(options['questions'], options['users'], options['batch_size']) < 1 or options['votes'] < 0:
+            raise CommandError("Counts must be positive.")
+        created = seed_synthetic_data(
+            questions=options['questions'],
+            users=options['users'],
+            votes=options['votes'],
+            batch_size=options['batch_size'],
+            seed=options['seed'],
+            log=self.stdout.write,
+        )
+        summary = ", ".join(f"{count} {name}" for name, count in created.items())
+        self.stdout.write(self.style.SUCCESS(f"Seeded {summary}."))
@@ -0,0 +1,133 @@
+"""
+polls/management/commands/stress_votes.py.
+
+Management command that measures concurrent vote throughput on SQLite with
+Django's default connection settings and with the tuned SQLite profile. Each
+profile runs against its own scratch copy of the database, so the journal
+mode it sets and the votes it casts never reach the real one.
+"""
+
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.test import override_settings
+from django.utils import timezone
+from polls.models import Choice, Question
+from polls.voting import cast_vote
+
+# Django's own SQLite behaviour: rollback journal, full sync, deferred transactions
+UNTUNED = {
+    'POLLS_SQLITE_PRAGMAS': {'journal_mode': 'DELETE', 'synchronous': 'FULL'},
+    'POLLS_SQLITE_IMMEDIATE_WRITES': False,
+}
+
+
+@contextmanager
+def scratch_copy(path):
+    """
+    Point the default database at a copy of it in ``path`` until the block ends.
+
+    Args:
+        path (str): The file to copy the database to.
+    """
+    connection.ensure_connection()
+    target = sqlite3.connect(path)
+    try:
+        connection.connection.backup(target)
+    finally:
+        target.close()
+    # Threads connect with the settings, this thread through its own wrapper.
+    original = connections['default']
+    connections.settings['default'] = {**original.settings_dict, 'NAME': path}
+    connections['default'] = connections.create_connection('default')
+    try:
+        yield
+    finally:
+        connections['default'].close()
+        connections['default'] = original
+        connections.settings['default'] = original.settings_dict
+
+
+class Command(BaseCommand):
+    """Cast votes from many threads and report votes per second and lock errors."""
+
+    help = (
+        "Cast votes from concurrent threads against scratch copies of the SQLite database, "
+        "first with Django's defaults and then with the tuned profile, and compare throughput."
+    )
+
+    def add_arguments(self, parser):
+        """Register the command line options."""
+        parser.add_argument('--threads', type=int, default=8, help="Number of concurrent voters.")
+        parser.add_argument('--votes', type=int, default=200, help="Number of votes per thread.")
+        parser.add_argument('--users', type=int, default=50, help="Number of stress test users.")
+
+    def handle(self, *args, **options):
+        """Run both profiles, each on a scratch copy of the database that is deleted afterwards."""
+        if connection.vendor != 'sqlite':
+            raise CommandError("stress_votes needs a SQLite database.")
+        if min(options['threads'], options['votes'], options['users']) < 1:
+            raise CommandError("--threads, --votes and --users must be positive.")
+
+        with tempfile.TemporaryDirectory() as directory:
+            for name, overrides in (('default', UNTUNED), ('tuned', {})):
+                with scratch_copy(os.path.join(directory, f'{name}.sqlite3')), override_settings(**overrides):
+                    question, choices, users = self.create_poll(options['users'])
+                    elapsed, cast, failed = self.run(question, choices, users, options['threads'], options['votes'])
+                rate = cast / elapsed if elapsed else 0
+                self.stdout.write(f"{name:<8} {rate:8.1f} votes/s  {cast} cast, {failed} failed in {elapsed:.2f}s")
+
+    @staticmethod
+    def create_poll(user_count):
+        """
+        Create the stress test poll and its voters.
+
+        Returns:
+            tuple: The question, its choices and the users.
+        """
+        question = Question.objects.create(question_text='Stress test poll', pub_date=timezone.now())
+        choices = [Choice.objects.create(question=question, choice_text=f'Choice {n}') for n in range(4)]
+        User.objects.bulk_create(User(username=f'stress-{question.pk}-{n}') for n in range(user_count))
+        return question, choices, list(User.objects.filter(username__startswith=f'stress-{question.pk}-'))
+
+    @staticmethod
+    def run(question, choices, users, threads, votes):
+        """
+        Cast votes from concurrent threads.
+
+        Returns:
+            tuple: The elapsed seconds, the number of votes cast and the number that failed.
+        """
+        counts = {'cast': 0, 'failed': 0}
+        lock = threading.Lock()
+        start_barrier = threading.Barrier(threads)
+
+        def voter():
+            rng = random.Random()
+            cast = failed = 0
+            start_barrier.wait()
+            for _ in range(votes):
+                try:
+                    cast_vote(rng.choice(users), question, rng.choice(choices))
+                    cast += 1
+                except OperationalError:
+                    failed += 1
+            connection.close()
+            with lock:
+                counts['cast'] += cast
+                counts['failed'] += failed
+
+        workers = [threading.Thread(target=voter) for _ in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return time.perf_counter() - start, counts['cast'], counts['failed']
@@ -0,0 +1,326 @@
+"""
+polls/metrics.py.
+
+This module keeps Prometheus-style counters and histograms and shares them
+between worker processes.
+
+Each process counts in memory. When ``POLLS_METRICS_DIR`` is set, every
+process also writes its counts to its own JSON file in that directory:
+every ``POLLS_METRICS_FLUSH_INTERVAL`` seconds from a daemon thread started
+by the WSGI and ASGI applications, and when it exits (gunicorn.conf.py
+flushes from its ``worker_exit`` hook, other processes at exit). The
+/metrics endpoint adds up the files of all processes, using the live counts
+for its own, so any worker can answer a scrape. Files of stopped workers are
+kept, so counters never go backwards while the server runs; clear the
+directory when the server starts (gunicorn.conf.py does).
+
+Classes:
+- Counter: Counter per label values.
+- Histogram: Cumulative histogram per label values.
+
+Functions:
+- counter: Create and register a counter.
+- histogram: Create and register a histogram.
+- flush: Write this process's counts to the metrics directory.
+- maybe_flush: Flush if the flush interval has passed.
+- start_flusher: Flush every flush interval from a daemon thread.
+- stop_flusher: Stop the flushing thread and flush one last time.
+- collect: Return the counts of every process added up.
+- render: Render counts in the Prometheus text exposition format.
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from django.conf import settings
+
+logger = logging.getLogger('myapp')
+
+REGISTRY = {}
+
+_lock = threading.Lock()
+_process = {'pid': os.getpid(), 'id': f'{os.getpid()}-{time.time_ns()}', 'flushed': 0.0}
+
+
+def _check_fork():
+    """Start from zero in a forked child, whose copied counts belong to its parent."""
+    if _process['pid'] != os.getpid():
+        _process.update(pid=os.getpid(), id=f'{os.getpid()}-{time.time_ns()}', flushed=0.0)
+        for metric in REGISTRY.values():
+            metric.reset()
+
+
+class Counter:
+    """
+    Counter per label values.
+
+    Attributes:
+        name (str): The metric name.
+        documentation (str): The help text of the metric.
+        labels (tuple): The names of the labels.
+    """
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        """Create an empty counter."""
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+
+    def inc(self, label_values=(), amount=1):
+        """Increase the counter of a tuple of label values."""
+        with _lock:
+            _check_fork()
+            key = tuple(str(value) for value in label_values)
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        """Return a copy of the counts per tuple of label values."""
+        with _lock:
+            _check_fork()
+            return dict(self._values)
+
+    def reset(self):
+        """Forget every count."""
+        self._values = {}
+
+
+class Histogram:
+    """
+    Cumulative histogram per label values, as Prometheus exposes them.
+
+    Attributes:
+        name (str): The metric name.
+        documentation (str): The help text of the metric.
+        labels (tuple): The names of the labels.
+        buckets (tuple): The upper bounds of the buckets.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels, buckets):
+        """Create an empty histogram."""
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+
+    def observe(self, label_values, value):
+        """Record one observation for a tuple of label values."""
+        with _lock:
+            _check_fork()
+            key = tuple(str(label) for label in label_values)
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0, 0.0]
+            counts = series[0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            series[1] += 1
+            series[2] += value
+
+    def samples(self):
+        """
+        Return a copy of the recorded series.
+
+        Returns:
+            dict: Maps each tuple of label values to [cumulative bucket counts, count, sum].
+        """
+        with _lock:
+            _check_fork()
+            return {key: [list(counts), count, total] for key, (counts, count, total) in self._series.items()}
+
+    def reset(self):
+        """Forget every observation."""
+        self._series = {}
+
+
+def _register(metric):
+    """Register a metric, returning the existing one if the name is taken."""
+    return REGISTRY.setdefault(metric.name, metric)
+
+
+def counter(name, documentation, labels=()):
+    """Create and register a counter."""
+    return _register(Counter(name, documentation, labels))
+
+
+def histogram(name, documentation, labels, buckets):
+    """Create and register a histogram."""
+    return _register(Histogram(name, documentation, labels, buckets))
+
+
+def _snapshot():
+    """Return this process's counts in a JSON-friendly form."""
+    return {
+        name: [[list(key), value] for key, value in metric.samples().items()]
+        for name, metric in REGISTRY.items()
+    }
+
+
+def _directory():
+    return getattr(settings, 'POLLS_METRICS_DIR', '')
+
+
+def flush():
+    """Write this process's counts to its file in the metrics directory, if one is set."""
+    directory = _directory()
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    snapshot = _snapshot()
+    path = os.path.join(directory, f"metrics-{_process['id']}.json")
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w') as file:
+        json.dump(snapshot, file)
+    os.replace(temporary, path)
+    _process['flushed'] = time.monotonic()
+
+
+def maybe_flush():
+    """Flush this process's counts if the flush interval has passed since the last flush."""
+    if _directory() and time.monotonic() - _process['flushed'] >= getattr(settings, 'POLLS_METRICS_FLUSH_INTERVAL', 5):
+        flush()
+
+
+_flusher = {'pid': None, 'thread': None, 'stopping': None}
+_flusher_lock = threading.Lock()
+
+
+def _flush_every(interval, stopping):
+    """Flush every ``interval`` seconds until ``stopping`` is set."""
+    while not stopping.wait(interval):
+        try:
+            flush()
+        except OSError:
+            # Keep the thread alive; the next flush tries again.
+            logger.exception("Could not write the metrics of this process.")
+
+
+def start_flusher():
+    """
+    Flush this process's counts every POLLS_METRICS_FLUSH_INTERVAL seconds from a daemon thread.
+
+    Called by the WSGI and ASGI applications, so a worker's counts reach the
+    metrics directory even while it sees no requests. A forked worker starts
+    its own thread. Does nothing without a metrics directory.
+
+    Returns:
+        threading.Thread or None: The flushing thread.
+    """
+    if not _directory():
+        return None
+    with _flusher_lock:
+        if _flusher['pid'] != os.getpid():
+            stopping = threading.Event()
+            interval = getattr(settings, 'POLLS_METRICS_FLUSH_INTERVAL', 5)
+            thread = threading.Thread(target=_flush_every, args=(interval, stopping), name='polls-metrics', daemon=True)
+            _flusher.update(pid=os.getpid(), thread=thread, stopping=stopping)
+            thread.start()
+        return _flusher['thread']
+
+
+def stop_flusher():
+    """Stop the flushing thread of this process, if one runs, and flush one last time."""
+    with _flusher_lock:
+        if _flusher['pid'] == os.getpid():
+            _flusher['stopping'].set()
+            _flusher['thread'].join()
+            _flusher.update(pid=None, thread=None, stopping=None)
+    flush()
+
+
+def _merge(total, kind, value):
+    """Add one process's value of a series to the running total."""
+    if total is None:
+        return value
+    if kind == 'counter':
+        return total + value
+    counts = [a + b for a, b in zip(total[0], value[0])]
+    return [counts, total[1] + value[1], total[2] + value[2]]
+
+
+def collect():
+    """
+    Return the counts of every process added up.
+
+    Returns:
+        dict: Maps each metric name to a dict of label values to the merged value.
+    """
+    snapshots = [_snapshot()]
+    directory = _directory()
+    own_file = f"metrics-{_process['id']}.json"
+    if directory and os.path.isdir(directory):
+        for filename in os.listdir(directory):
+            if not filename.endswith('.json') or filename == own_file:
+                continue
+            try:
+                with open(os.path.join(directory, filename)) as file:
+                    snapshots.append(json.load(file))
+            except (OSError, ValueError):
+                continue
+
+    merged = {name: {} for name in REGISTRY}
+    for snapshot in snapshots:
+        for name, series in snapshot.items():
+            metric = REGISTRY.get(name)
+            if metric is None:
+                continue
+            for key, value in series:
+                key = tuple(key)
+                merged[name][key] = _merge(merged[name].get(key), metric.kind, value)
+    return merged
+
+
+def _format_labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def render(merged=None):
+    """
+    Render counts in the Prometheus text exposition format.
+
+    Args:
+        merged (dict): Counts as returned by collect(); collected now if not given.
+
+    Returns:
+        str: The metrics.
+    """
+    if merged is None:
+        merged = collect()
+    lines = []
+    for name, metric in REGISTRY.items():
+        lines.append(f'# HELP {name} {metric.documentation}')
+        lines.append(f'# TYPE {name} {metric.kind}')
+        for key, value in sorted(merged.get(name, {}).items()):
+            if metric.kind == 'counter':
+                lines.append(f'{name}{_format_labels(metric.labels, key)} {value}')
+                continue
+            counts, count, total = value
+            for bound, bucket_count in [*zip(metric.buckets, counts), ('+Inf', count)]:
+                bucket_labels = _format_labels(metric.labels, key, f'le="{bound}"')
+                lines.append(f'{name}_bucket{bucket_labels} {bucket_count}')
+            lines.append(f'{name}_count{_format_labels(metric.labels, key)} {count}')
+            lines.append(f'{name}_sum{_format_labels(metric.labels, key)} {total}')
+    return '\n'.join(lines) + '\n'
+
+
+@atexit.register
+def _flush_at_exit():
+    """Write the last counts of this process when it exits."""
+    if settings.configured and _process['pid'] == os.getpid():
+        flush()
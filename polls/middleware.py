@@ -1,9 +1,27 @@
-"""Logger for failed user login attempts."""
+"""
+Middleware for the polls application.
+
+Classes:
+- FailedLoginLoggerMiddleware: Logger for failed user login attempts.
+- InstrumentationMiddleware: Measure each request and report it in a Server-Timing header.
+- RateLimitMiddleware: Answer votes, sign-ups and logins over their rate with 429.
+"""
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
 from django.utils.deprecation import MiddlewareMixin
+from . import instrumentation, metrics, ratelimit
+from .sessions import session_user_id
+from .utils import get_client_ip
 import logging
 
 logger = logging.getLogger('myapp')
 
+rate_limited_total = metrics.counter(
+    'polls_rate_limited_total', "Requests rejected with 429, per scope and key kind (ip or user).", ('scope', 'kind'),
+)
+
 
 class FailedLoginLoggerMiddleware(MiddlewareMixin):
     """Logger for failed user login attempts."""
@@ -11,5 +29,108 @@ class FailedLoginLoggerMiddleware(MiddlewareMixin):
     def process_exception(self, request, exception):
         """Logger for failed user login attempts."""
         if isinstance(exception, ValueError):
-            logger.warning(f"Failed login attempt from IP: {request.META.get('REMOTE_ADDR')}")
+            logger.warning("Failed login attempt from IP: %s", request.META.get('REMOTE_ADDR'))
         return None
+
+
+class InstrumentationMiddleware:
+    """
+    Measure wall time, SQL, template rendering and cache use of sampled requests.
+
+    The measurements are added to the in-process histograms of
+    polls.instrumentation under the URL name of the view and, when
+    POLLS_SERVER_TIMING is on, sent back in a Server-Timing header. The share
+    of requests measured is set by POLLS_INSTRUMENTATION_SAMPLE_RATE.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """Wrap the next handler, in async mode if it is a coroutine function."""
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        """Measure the request if it is sampled."""
+        if self.async_mode:
+            return self.__acall__(request)
+        token = instrumentation.start_request()
+        if token is None:
+            return self.get_response(request)
+        response = None
+        try:
+            response = self.get_response(request)
+        finally:
+            self.finish(request, response, token)
+        return response
+
+    async def __acall__(self, request):
+        """Measure the request if it is sampled, in async mode."""
+        token = instrumentation.start_request()
+        if token is None:
+            return await self.get_response(request)
+        response = None
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.finish(request, response, token)
+        return response
+
+    def process_template_response(self, request, response):
+        """Time the rendering of a template response that is not rendered yet."""
+        metrics = instrumentation.current_metrics()
+        if metrics is not None and not response.is_rendered:
+            start = time.perf_counter()
+            response.add_post_render_callback(
+                lambda rendered: metrics.add_time('template', time.perf_counter() - start)
+            )
+        return response
+
+    def finish(self, request, response, token):
+        """Record the measurements and add the Server-Timing header."""
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else '<unresolved>'
+        metrics = instrumentation.finish_request(token, view_name)
+        if response is not None and getattr(settings, 'POLLS_SERVER_TIMING', True):
+            response.headers['Server-Timing'] = instrumentation.server_timing(metrics)
+
+
+class RateLimitMiddleware(MiddlewareMixin):
+    """
+    Answer votes, sign-ups and logins over their rate with 429 Too Many Requests.
+
+    POST requests to the views named in ``scopes`` are counted per client
+    IP and per user (see polls.ratelimit) before the view runs. The user of
+    a vote is read from the session without loading the user; the user of
+    a login is the submitted username. Place it after the authentication
+    middleware.
+
+    Attributes:
+        scopes (dict): Maps URL names to rate limit scopes.
+    """
+
+    scopes = {'polls:vote': 'vote', 'signup': 'signup', 'login': 'login'}
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """Return a 429 response if the request is over one of its rates."""
+        scope = self.scopes.get(request.resolver_match.view_name)
+        if scope is None or request.method != 'POST':
+            return None
+        ip_address = get_client_ip(request)
+        keys = {'ip': ip_address}
+        if scope == 'login':
+            keys['user'] = request.POST.get('username') or None
+        else:
+            keys['user'] = session_user_id(request)
+        limited = ratelimit.check(scope, keys)
+        if limited is None:
+            return None
+        kind, wait = limited
+        logger.warning("Rate limited %s by %s from IP address %s.", scope, kind, ip_address)
+        rate_limited_total.inc((scope, kind))
+        response = HttpResponse("Too many requests. Please try again later.", status=429, content_type='text/plain')
+        response['Retry-After'] = str(wait)
+        return response
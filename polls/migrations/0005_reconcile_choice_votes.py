@@ -0,0 +1,24 @@
+# Generated by Django 5.1 on 2026-10-18 09:00
+
+from django.db import migrations
+from django.db.models import Count, F
+
+
+def reconcile_vote_counters(apps, schema_editor):
+    """Make Choice.votes match the Vote rows before it becomes the source of truth."""
+    Choice = apps.get_model('polls', 'Choice')
+    drifted = list(Choice.objects.annotate(actual=Count('vote')).exclude(votes=F('actual')))
+    for choice in drifted:
+        choice.votes = choice.actual
+    Choice.objects.bulk_update(drifted, ['votes'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0004_vote'),
+    ]
+
+    operations = [
+        migrations.RunPython(reconcile_vote_counters, migrations.RunPython.noop),
+    ]
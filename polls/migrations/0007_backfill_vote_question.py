@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:01
+
+from django.db import migrations
+from django.db.models import Count, F, Max, OuterRef, Subquery
+
+
+def backfill_vote_question(apps, schema_editor):
+    """Copy each vote's question from its choice and keep only the latest vote per user and question."""
+    Choice = apps.get_model('polls', 'Choice')
+    Vote = apps.get_model('polls', 'Vote')
+    Vote.objects.filter(question__isnull=True).update(
+        question_id=Subquery(Choice.objects.filter(pk=OuterRef('choice_id')).values('question_id')[:1])
+    )
+
+    duplicates = (
+        Vote.objects.values('user_id', 'question_id')
+        .annotate(latest=Max('pk'), total=Count('pk'))
+        .filter(total__gt=1)
+    )
+    for duplicate in duplicates:
+        Vote.objects.filter(
+            user_id=duplicate['user_id'], question_id=duplicate['question_id'],
+        ).exclude(pk=duplicate['latest']).delete()
+
+    drifted = list(Choice.objects.annotate(actual=Count('vote')).exclude(votes=F('actual')))
+    for choice in drifted:
+        choice.votes = choice.actual
+    Choice.objects.bulk_update(drifted, ['votes'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0006_vote_question'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_vote_question, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:14
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0009_question_pub_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='modified',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='last modified'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:59
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def compute_statuses(apps, schema_editor):
+    """Set the status of every question from its dates."""
+    Question = apps.get_model('polls', 'Question')
+    now = timezone.now()
+    Question.objects.filter(pub_date__gt=now).update(status='scheduled')
+    Question.objects.filter(pub_date__lte=now, end_date__lt=now).update(status='closed')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0010_question_version_modified'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='status',
+            field=models.CharField(choices=[('scheduled', 'Scheduled'), ('open', 'Open'), ('closed', 'Closed')], default='open', editable=False, max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['status', 'pub_date'], name='question_status_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['status', 'end_date'], name='question_status_end_date_idx'),
+        ),
+        migrations.RunPython(compute_statuses, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,122 @@
 """This module defines the models for a simple polling application."""
 
 import datetime
+import operator
+from functools import reduce
 from django.db import models
 from django.utils import timezone
 from django.contrib.auth.models import User
 
 
+class QuestionQuerySet(models.QuerySet):
+    """
+    QuerySet of questions with lifecycle and voting filters evaluated in SQL.
+
+    The filters compare the dates with the clock rather than reading the
+    stored status, so a question is listed and closed on time even while
+    the lifecycle scheduler is off or behind. The stored status only tells
+    the scheduler which questions are due (see polls.lifecycle).
+    """
+
+    @staticmethod
+    def dates_give(status, now):
+        """
+        Return the condition under which the dates give a question a status.
+
+        Args:
+            status (str): A Question.Status value.
+            now (datetime): The reference time.
+
+        Returns:
+            Q: The condition on pub_date and end_date.
+        """
+        if status == Question.Status.SCHEDULED:
+            return models.Q(pub_date__gt=now)
+        if status == Question.Status.CLOSED:
+            return models.Q(pub_date__lte=now, end_date__lt=now)
+        return models.Q(pub_date__lte=now) & (models.Q(end_date__isnull=True) | models.Q(end_date__gte=now))
+
+    def published(self, now=None):
+        """
+        Return the questions whose publication date has passed.
+
+        Args:
+            now (datetime): The reference time, defaults to the current time.
+
+        Returns:
+            QuerySet: The open and closed questions.
+        """
+        return self.filter(pub_date__lte=now or timezone.now())
+
+    def open(self, now=None):
+        """
+        Return the questions open for voting.
+
+        Args:
+            now (datetime): The reference time, defaults to the current time.
+
+        Returns:
+            QuerySet: The open questions.
+        """
+        return self.filter(self.dates_give(Question.Status.OPEN, now or timezone.now()))
+
+    def closed(self, now=None):
+        """
+        Return the questions whose end date has passed.
+
+        Args:
+            now (datetime): The reference time, defaults to the current time.
+
+        Returns:
+            QuerySet: The closed questions.
+        """
+        return self.filter(self.dates_give(Question.Status.CLOSED, now or timezone.now()))
+
+    def scheduled(self, now=None):
+        """
+        Return the questions not published yet.
+
+        Args:
+            now (datetime): The reference time, defaults to the current time.
+
+        Returns:
+            QuerySet: The scheduled questions.
+        """
+        return self.filter(self.dates_give(Question.Status.SCHEDULED, now or timezone.now()))
+
+    def due(self, now=None):
+        """
+        Return the questions whose stored status does not match their dates.
+
+        These are mostly scheduled questions whose publication date has
+        passed and open questions whose end date has passed, but any row out
+        of step with its dates is included, such as one whose dates were
+        changed with update(). The lifecycle scheduler moves them on (see
+        polls.lifecycle).
+
+        Args:
+            now (datetime): The reference time, defaults to the current time.
+
+        Returns:
+            QuerySet: The questions due for a status change.
+        """
+        now = now or timezone.now()
+        behind = [self.dates_give(status, now) & ~models.Q(status=status) for status in Question.Status.values]
+        return self.filter(reduce(operator.or_, behind))
+
+    def touch(self):
+        """
+        Record that the questions' choices or votes changed.
+
+        Increments ``version`` and sets ``modified`` to now, which changes the
+        ETag and Last-Modified headers of the questions' pages.
+
+        Returns:
+            int: The number of questions updated.
+        """
+        return self.update(version=models.F('version') + 1, modified=timezone.now())
+
+
 class Question(models.Model):
     """
     Represents a poll question, containing the text of the question and the publication date.
@@ -14,22 +125,80 @@ class Question(models.Model):
         question_text (str): The text of the poll question.
         pub_date (datetime): The publication date of the question.
         end_date (datetime): The end date for voting. If null, voting is allowed anytime after pub_date.
+        status (str): Where the question was in its lifecycle at its last transition: scheduled,
+            open or closed. It is computed from the dates whenever the question is saved, fixtures
+            included (see polls.signals), and moved on when a date passes by the lifecycle
+            scheduler (see polls.lifecycle), which drops the question's cached pages then.
+            Visibility and voting read the dates, not this field.
+        version (int): Incremented whenever the question's choices or votes change.
+        modified (datetime): When the question, its choices or its votes last changed.
 
     Methods:
         __str__(): Return the question text as a string representation.
+        compute_status(): Return the status the dates give the question at a given time.
         was_published_recently(): Check if the question was published within the last day.
-        is_published(): Return True if the current date-time is on or after the question's publication date.
+        is_published(): Return True if the question is open or closed.
         can_vote(): Return True if voting is allowed for this question.
     """
 
+    class Status(models.TextChoices):
+        """The lifecycle states of a question."""
+
+        SCHEDULED = 'scheduled', 'Scheduled'
+        OPEN = 'open', 'Open'
+        CLOSED = 'closed', 'Closed'
+
     question_text = models.CharField(max_length=200)
     pub_date = models.DateTimeField("date published", default=timezone.now)
     end_date = models.DateTimeField('end date', null=True, blank=True)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.OPEN, editable=False)
+    version = models.PositiveIntegerField(default=0)
+    modified = models.DateTimeField('last modified', default=timezone.now)
+
+    objects = QuestionQuerySet.as_manager()
+
+    class Meta:
+        """Index the newest-first ordering of the index and the lookups of the lifecycle scheduler."""
+
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'], name='question_pub_date_id_idx'),
+            models.Index(fields=['status', 'pub_date'], name='question_status_pub_date_idx'),
+            models.Index(fields=['status', 'end_date'], name='question_status_end_date_idx'),
+        ]
 
     def __str__(self):
         """Return the question text as a string representation."""
         return self.question_text
 
+    def save(self, *args, **kwargs):
+        """Record the modification time and save the question, with the status set by the pre_save signal."""
+        self.modified = timezone.now()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'modified', 'status'}
+        super().save(*args, **kwargs)
+
+    def compute_status(self, now=None):
+        """
+        Return the status the dates give the question at a given time.
+
+        Args:
+            now (datetime): The reference time, defaults to the current time.
+
+        Returns:
+            str: A Question.Status value.
+        """
+        now = now or timezone.now()
+        if self.pub_date > now:
+            return self.Status.SCHEDULED
+        if self.end_date is not None and self.end_date < now:
+            return self.Status.CLOSED
+        return self.Status.OPEN
+
+    @property
+    def is_open(self):
+        """Return True if the dates of the question make it open for voting now."""
+        return self.compute_status() == self.Status.OPEN
+
     def was_published_recently(self):
         """
         Check if the poll was published recently.
@@ -42,28 +211,26 @@ class Question(models.Model):
 
     def is_published(self):
         """
-        Return True if the current local date-time is on or after the question's publication date.
+        Return True if the question has been published, i.e. it is open or closed.
 
         Returns:
             bool: True if the question is published.
         """
-        return timezone.now() >= self.pub_date
+        return self.pub_date <= timezone.now()
 
     def can_vote(self):
         """
         Return True if voting is allowed for this question.
 
-        Voting is allowed if:
-            - Current local date-time is after or on the pub_date.
-            - Current local date-time is before the end_date, if end_date is not None.
+        Voting is allowed while the question is open: from its pub_date until
+        its end_date, if it has one. Like the QuerySet filters, this reads
+        the dates rather than the stored status, so it holds even when the
+        lifecycle scheduler is off or behind.
 
         Returns:
             bool: True if voting is allowed.
         """
-        now = timezone.now()
-        if self.end_date:
-            return self.pub_date <= now <= self.end_date
-        return now >= self.pub_date
+        return self.is_open
 
 
 class Choice(models.Model):
@@ -73,7 +240,10 @@ class Choice(models.Model):
     Attributes:
         question (Question): The question to which this choice belongs.
         choice_text (str): The text of the choice.
-        votes (int): The number of votes for this choice.
+        votes (int): The number of votes for this choice. This counter is the
+            source of truth for results and is kept in step with the Vote rows
+            by atomic F() updates, in polls.voting and in the Vote signal
+            handlers of polls.signals (see the reconcile_votes command).
     """
 
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
@@ -89,10 +259,12 @@ class Choice(models.Model):
         """
         Return the number of votes for this choice.
 
+        Reads the denormalized ``votes`` counter, so no extra query is made.
+
         Returns:
             int: Number of votes for this choice.
         """
-        return self.vote_set.count()
+        return self.votes
 
 
 class Vote(models.Model):
@@ -102,11 +274,27 @@ class Vote(models.Model):
     Attributes:
         user (User): The user who made the vote.
         choice (Choice): The choice that was voted for.
+        question (Question): The question of the choice, stored on the vote so
+            the database can enforce one vote per user and question.
     """
 
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+
+    class Meta:
+        """Enforce one vote per user and question."""
+
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'question'], name='unique_vote_per_user_question'),
+        ]
 
     def __str__(self):
         """Return a string representation of the vote."""
         return f"{self.user.username} voted for {self.choice.choice_text}"
+
+    def save(self, *args, **kwargs):
+        """Fill in the question from the choice before saving the vote."""
+        if self.question_id is None and self.choice_id is not None:
+            self.question_id = self.choice.question_id
+        super().save(*args, **kwargs)
@@ -0,0 +1,243 @@
+"""
+polls/ratelimit.py.
+
+This module throttles the endpoints that write: votes, sign-ups and logins.
+
+Each scope has a rate per key kind, set in POLLS_RATE_LIMITS: per client IP
+(as computed by polls.utils.get_client_ip) and per user, where the user of a
+login attempt is the submitted username. Keys are stored as digests, so
+submitted usernames never reach the stores as they were typed. RateLimitMiddleware (see
+polls.middleware) checks the rates before the view runs, so a throttled
+request is answered with 429 before any query but the session lookup.
+
+Two stores count the requests:
+
+- ``memory``: a token bucket per key in the memory of each process. Cheap,
+  but every worker has its own buckets.
+- ``cache``: a sliding window counter per key in the cache named by
+  POLLS_RATE_LIMIT_CACHE, shared by all workers that share the cache. It
+  only needs the cache's atomic ``add`` and ``incr``.
+
+Classes:
+- Rate: A number of requests allowed per period.
+- MemoryStore: Token buckets in the memory of this process.
+- CacheStore: Sliding window counters in a shared cache.
+
+Functions:
+- parse_rate: Parse a rate such as '10/m'.
+- get_store: Return the store selected by POLLS_RATE_LIMIT_STORE.
+- check: Count a request against the rates of a scope.
+"""
+
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+from django.conf import settings
+from django.core.cache import caches
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+class Rate(NamedTuple):
+    """
+    A number of requests allowed per period.
+
+    Attributes:
+        limit (int): The number of requests.
+        period (int): The period, in seconds.
+    """
+
+    limit: int
+    period: int
+
+
+def parse_rate(value):
+    """
+    Parse a rate such as '10/m' (ten per minute).
+
+    Args:
+        value (str): A count and a period of s, m, h or d, joined by '/'.
+
+    Returns:
+        Rate or None: The rate, or None if the value is empty.
+
+    Raises:
+        ValueError: If the value is not a valid rate.
+    """
+    if not value:
+        return None
+    count, _, unit = value.partition('/')
+    try:
+        rate = Rate(int(count), PERIODS[unit.strip().lower()])
+    except (KeyError, ValueError):
+        raise ValueError(f"Invalid rate {value!r}, expected e.g. '10/m'.")
+    if rate.limit < 1:
+        raise ValueError(f"Invalid rate {value!r}, the count must be positive.")
+    return rate
+
+
+class MemoryStore:
+    """
+    Token buckets in the memory of this process.
+
+    Each key has a bucket of ``limit`` tokens that refills at ``limit`` per
+    ``period``; a request takes a token. Buckets are kept in least recently
+    used order: the oldest ones are dropped once they have refilled, since a
+    full bucket is the same as no bucket, or once there are more than
+    ``max_keys``, so memory stays bounded however many IPs send requests.
+    Each request drops at most a few buckets, in constant time.
+
+    Attributes:
+        clock (callable): Returns the current time in seconds.
+        max_keys (int): The most buckets kept.
+    """
+
+    def __init__(self, clock=time.monotonic, max_keys=10000):
+        """Create a store with no buckets."""
+        self.clock = clock
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key, rate):
+        """
+        Take a token from the bucket of a key.
+
+        Args:
+            key (str): The key being throttled.
+            rate (Rate): The rate of the key.
+
+        Returns:
+            float: 0 if the request is allowed, otherwise the seconds until it would be.
+        """
+        now = self.clock()
+        refill = rate.limit / rate.period
+        with self._lock:
+            tokens, updated, _ = self._buckets.get(key, (rate.limit, now, now))
+            tokens = min(rate.limit, tokens + (now - updated) * refill)
+            wait = 0 if tokens >= 1 else (1 - tokens) / refill
+            if not wait:
+                tokens -= 1
+            self._buckets[key] = (tokens, now, now + (rate.limit - tokens) / refill)
+            self._buckets.move_to_end(key)
+            self._prune(now)
+        return wait
+
+    def _prune(self, now):
+        """Drop the least recently used buckets while they have refilled or there are too many."""
+        while self._buckets:
+            _, _, full_at = next(iter(self._buckets.values()))
+            if full_at > now and len(self._buckets) <= self.max_keys:
+                return
+            self._buckets.popitem(last=False)
+
+    def reset(self):
+        """Drop every bucket."""
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheStore:
+    """
+    Sliding window counters in a shared cache.
+
+    Requests are counted per key in fixed windows of one period. The count
+    of the sliding window is the count of the current window plus the count
+    of the previous one, weighted by how much of it the sliding window still
+    covers. Rejected requests are not counted.
+
+    Attributes:
+        alias (str): The name of the cache.
+        clock (callable): Returns the current time in seconds, the same in every process.
+    """
+
+    def __init__(self, alias='default', clock=time.time):
+        """Create a store counting in the cache named ``alias``."""
+        self.alias = alias
+        self.clock = clock
+
+    def hit(self, key, rate):
+        """
+        Count a request of a key if the window has room for it.
+
+        Args:
+            key (str): The key being throttled.
+            rate (Rate): The rate of the key.
+
+        Returns:
+            float: 0 if the request is allowed, otherwise the seconds until it would be.
+        """
+        cache = caches[self.alias]
+        now = self.clock()
+        window, elapsed = divmod(now, rate.period)
+        current_key = f'polls:ratelimit:{key}:{rate.period}:{int(window)}'
+        previous = cache.get(f'polls:ratelimit:{key}:{rate.period}:{int(window) - 1}', 0)
+        cache.add(current_key, 0, rate.period * 2)
+        try:
+            current = cache.incr(current_key)
+        except ValueError:
+            # The counter was evicted between add() and incr().
+            cache.set(current_key, 1, rate.period * 2)
+            current = 1
+        weight = 1 - elapsed / rate.period
+        if previous * weight + current <= rate.limit:
+            return 0
+        cache.decr(current_key)
+        if current > rate.limit or not previous:
+            return rate.period - elapsed
+        # Wait until the previous window weighs little enough.
+        return rate.period * (1 - (rate.limit - current) / previous) - elapsed
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store():
+    """
+    Return the store selected by POLLS_RATE_LIMIT_STORE, 'memory' or 'cache'.
+
+    Returns:
+        MemoryStore or CacheStore: The store shared by the requests of this process.
+    """
+    name = getattr(settings, 'POLLS_RATE_LIMIT_STORE', 'cache')
+    alias = getattr(settings, 'POLLS_RATE_LIMIT_CACHE', 'default')
+    with _stores_lock:
+        if (name, alias) not in _stores:
+            if name == 'memory':
+                _stores[name, alias] = MemoryStore()
+            elif name == 'cache':
+                _stores[name, alias] = CacheStore(alias)
+            else:
+                raise ValueError(f"Unknown rate limit store {name!r}, expected 'memory' or 'cache'.")
+        return _stores[name, alias]
+
+
+def check(scope, keys, store=None):
+    """
+    Count a request against the rates of a scope.
+
+    The keys are checked in order and checking stops at the first one over
+    its rate, so a rejected request does not use up the rates of the others.
+
+    Args:
+        scope (str): The scope in POLLS_RATE_LIMITS, such as 'vote'.
+        keys (dict): Maps key kinds, such as 'ip' and 'user', to the values of this request.
+        store: The store to count in, defaults to get_store().
+
+    Returns:
+        tuple: (kind, seconds to wait) of the first key over its rate, or None if the request is allowed.
+    """
+    rates = getattr(settings, 'POLLS_RATE_LIMITS', {}).get(scope, {})
+    for kind, value in keys.items():
+        rate = parse_rate(rates.get(kind))
+        if rate is None or value is None:
+            continue
+        digest = hashlib.sha256(str(value).encode()).hexdigest()
+        wait = (store or get_store()).hit(f'{scope}:{kind}:{digest}', rate)
+        if wait > 0:
+            return kind, math.ceil(wait)
+    return None
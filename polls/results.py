@@ -0,0 +1,94 @@
+"""
+polls/results.py.
+
+This module computes the results of a poll question from a single query so
+they can be shared by views, templates and JSON endpoints.
+
+Classes:
+- ChoiceResult: The tally for one choice of a question.
+- QuestionResults: The tallies, turnout and percentages for a question.
+
+Functions:
+- get_results: Build the QuestionResults for a question.
+"""
+
+from dataclasses import dataclass, field
+from .models import Choice
+
+
+@dataclass
+class ChoiceResult:
+    """
+    The tally for one choice of a question.
+
+    Attributes:
+        id (int): The primary key of the choice.
+        choice_text (str): The text of the choice.
+        votes (int): The number of votes for the choice.
+        percentage (float): The share of the total votes, from 0 to 100.
+    """
+
+    id: int
+    choice_text: str
+    votes: int
+    percentage: float = 0.0
+
+
+@dataclass
+class QuestionResults:
+    """
+    The results of a question.
+
+    Attributes:
+        question_id (int): The primary key of the question.
+        choices (list[ChoiceResult]): The tally of each choice, in creation order.
+        total_votes (int): The number of votes cast for the question.
+    """
+
+    question_id: int
+    choices: list = field(default_factory=list)
+    total_votes: int = 0
+
+    def as_dict(self):
+        """
+        Return the results as plain data suitable for JSON serialization.
+
+        Returns:
+            dict: The question id, the total votes and the tally of each choice.
+        """
+        return {
+            'question': self.question_id,
+            'total_votes': self.total_votes,
+            'choices': [
+                {
+                    'id': choice.id,
+                    'choice_text': choice.choice_text,
+                    'votes': choice.votes,
+                    'percentage': choice.percentage,
+                }
+                for choice in self.choices
+            ],
+        }
+
+
+def get_results(question):
+    """
+    Build the results of a question with one query.
+
+    Args:
+        question: The Question instance or its primary key.
+
+    Returns:
+        QuestionResults: The tallies, turnout and percentages of the question.
+    """
+    question_id = getattr(question, 'pk', question)
+    rows = (
+        Choice.objects.filter(question_id=question_id)
+        .order_by('pk')
+        .values_list('pk', 'choice_text', 'votes')
+    )
+    choices = [ChoiceResult(id=pk, choice_text=text, votes=votes) for pk, text, votes in rows]
+    total_votes = sum(choice.votes for choice in choices)
+    for choice in choices:
+        choice.percentage = round(100 * choice.votes / total_votes, 1) if total_votes else 0.0
+    return QuestionResults(question_id=question_id, choices=choices, total_votes=total_votes)
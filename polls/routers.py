@@ -0,0 +1,95 @@
+"""
+polls/routers.py.
+
+This module routes the reads of selected views to a read replica.
+
+When a ``replica`` database is configured (DATABASE_REPLICA_URL), queries
+made inside ``read_from_replica()`` go to it, so read-heavy pages do not
+compete with votes for the primary. Everything else, including all writes,
+uses ``default``. Without a replica the router changes nothing.
+
+Classes:
+- ReplicaRouter: Database router that sends marked reads to the replica.
+
+Functions:
+- read_from_replica: Context manager under which reads go to the replica.
+- read_from_primary: Context manager under which reads go to the primary.
+- reads_from_replica: View decorator that runs the view inside read_from_replica().
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA_DB_ALIAS = 'replica'
+
+_use_replica = ContextVar('polls_use_replica', default=False)
+
+
+@contextmanager
+def _reading_from(replica):
+    token = _use_replica.set(replica)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def read_from_replica():
+    """Return a context manager under which reads go to the replica, if there is one."""
+    return _reading_from(True)
+
+
+def read_from_primary():
+    """Return a context manager under which reads go to the primary, even inside read_from_replica()."""
+    return _reading_from(False)
+
+
+def reads_from_replica(view_func):
+    """
+    Run a view, sync or async, inside read_from_replica().
+
+    Args:
+        view_func (callable): The view function or bound dispatch method.
+
+    Returns:
+        callable: The decorated view.
+    """
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def wrapper(*args, **kwargs):
+            with read_from_replica():
+                return await view_func(*args, **kwargs)
+    else:
+        @wraps(view_func)
+        def wrapper(*args, **kwargs):
+            with read_from_replica():
+                return view_func(*args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    """Send reads made inside read_from_replica() to the replica and everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        """Return the replica for marked reads when it is configured, otherwise no opinion."""
+        if _use_replica.get() and REPLICA_DB_ALIAS in settings.DATABASES:
+            return REPLICA_DB_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        """Return the primary for every write."""
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Allow relations between objects read from either copy of the data."""
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """Never migrate the replica, which follows the primary through replication."""
+        if db == REPLICA_DB_ALIAS:
+            return False
+        return None
@@ -0,0 +1,132 @@
+"""
+polls/sessions.py.
+
+This module keeps sessions off the hot path of the poll pages.
+
+Anonymous readers without a session cookie never touch the session table:
+Django only loads a session that has a key. For logged-in users the pages
+need the user id to compute their validators, which session_user_id() reads
+from the session without loading the user, so a ``304 Not Modified`` costs
+no ``auth_user`` query.
+
+``SESSION_BACKEND=cached_db`` selects the SessionStore below, Django's cached
+database sessions with a write-back policy: with POLLS_SESSION_WRITE_INTERVAL
+above 0, a session changed again within that many seconds of its last
+database write is only written to the cache. New sessions, new keys (at
+login) and deleted sessions always reach the database.
+
+Classes:
+- SessionStore: Cached database sessions that write to the database at most once per interval.
+
+Functions:
+- session_user_id: Return the id of the logged-in user without loading the user.
+- prune_sessions: Delete expired sessions from the database in batches.
+"""
+
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY, get_user_model
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.utils import timezone
+from django.utils.functional import LazyObject, empty
+from django.utils.module_loading import import_string
+
+
+class SessionStore(CachedDBStore):
+    """
+    Cached database sessions that write to the database at most once per interval.
+
+    A marker of the last database write is kept in the cache next to the
+    session, so the interval holds across processes sharing the cache. Use
+    an interval well below SESSION_COOKIE_AGE: the expiry stored in the
+    database is the one of the last database write.
+    """
+
+    cache_key_prefix = 'polls.sessions'
+
+    def _written_key(self, session_key):
+        """Return the cache key marking a recent database write of a session."""
+        return f'{self.cache_key_prefix}{session_key}:written'
+
+    def save(self, must_create=False):
+        """Save the session to the cache, and to the database unless it was written there recently."""
+        interval = getattr(settings, 'POLLS_SESSION_WRITE_INTERVAL', 0)
+        if must_create or self.session_key is None or interval <= 0:
+            return super().save(must_create)
+        if self._cache.add(self._written_key(self.session_key), True, interval):
+            try:
+                return super().save(must_create)
+            except Exception:
+                self._cache.delete(self._written_key(self.session_key))
+                raise
+        self._cache.set(self.cache_key, self._get_session(), self.get_expiry_age())
+
+    async def asave(self, must_create=False):
+        """Save the session like save()."""
+        await sync_to_async(self.save)(must_create)
+
+    def delete(self, session_key=None):
+        """Delete the session and forget when it was last written."""
+        session_key = session_key or self.session_key
+        if session_key is not None:
+            self._cache.delete(self._written_key(session_key))
+        super().delete(session_key)
+
+
+def session_user_id(request):
+    """
+    Return the id of the logged-in user without loading the user.
+
+    The id is taken from ``request.user`` if it was already loaded, and
+    otherwise from the session. It is not checked against the user's
+    session hash, so use it only where a stale id is harmless, such as in
+    cache keys and validators.
+
+    Args:
+        request: The HTTP request object.
+
+    Returns:
+        The primary key of the user, or None for anonymous visitors.
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and not (isinstance(user, LazyObject) and user._wrapped is empty):
+        return user.pk if user.is_authenticated else None
+    session = getattr(request, 'session', None)
+    if session is None or SESSION_KEY not in session:
+        return None
+    return get_user_model()._meta.pk.to_python(session[SESSION_KEY])
+
+
+def prune_sessions(batch_size=1000, pause=0, now=None, log=None):
+    """
+    Delete expired sessions from the database in batches.
+
+    Unlike ``clearsessions``, which deletes them with one statement, each
+    batch is its own short DELETE, so a large backlog never holds a long lock.
+
+    Args:
+        batch_size (int): The number of sessions deleted per statement.
+        pause (float): Seconds to sleep between batches.
+        now (datetime): The reference time, defaults to the current time.
+        log (callable): Called with a progress message after each batch.
+
+    Returns:
+        int or None: The number of deleted sessions, or None if the session engine has no table.
+    """
+    store = import_string(f'{settings.SESSION_ENGINE}.SessionStore')
+    if not issubclass(store, DBStore):
+        return None
+    model = store.get_model_class()
+    now = now or timezone.now()
+    deleted = 0
+    while True:
+        keys = list(model.objects.filter(expire_date__lt=now).values_list('pk', flat=True)[:batch_size])
+        if not keys:
+            return deleted
+        deleted += model.objects.filter(pk__in=keys).delete()[0]
+        if log is not None:
+            log(f"Deleted {deleted} expired sessions.")
+        if pause:
+            time.sleep(pause)
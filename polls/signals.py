@@ -1,14 +1,25 @@
 # polls/signals.py
 
-"""This module contains signal handlers for user login and logout events."""
+"""This module contains signal handlers for user login and logout events and for cache invalidation."""
 
+from django.contrib.auth.models import User
 from django.contrib.auth.signals import user_logged_in, user_logged_out, user_login_failed
+from django.db import transaction
+from django.db.models import Count, QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 import logging
+from . import metrics
+from .cache import invalidate_pages_on_commit, invalidate_results_on_commit, invalidate_user_votes_on_commit
+from .lifecycle import wake_scheduler
+from .models import Choice, Question, Vote
 from .utils import get_client_ip
+from .voting import move_vote_counters
 
 logger = logging.getLogger('myapp')
 
+logins_total = metrics.counter('polls_logins_total', "Login attempts, per result (success or failure).", ('result',))
+
 
 @receiver(user_logged_in)
 def log_user_login(sender, request, user, **kwargs):
@@ -17,6 +28,7 @@ def log_user_login(sender, request, user, **kwargs):
 
     Logs a message when a user successfully logs in. Includes the user's
     username and the IP address from which the login attempt was made.
+    The attempt is counted in the polls_logins_total metric.
 
     Args:
         sender: The sender of the signal.
@@ -25,7 +37,8 @@ def log_user_login(sender, request, user, **kwargs):
         **kwargs: Additional keyword arguments.
     """
     ip_address = get_client_ip(request)
-    logger.info(f"User {user.username} logged in from IP address {ip_address}.")
+    logger.info("User %s logged in from IP address %s.", user.username, ip_address)
+    logins_total.inc(('success',))
 
 
 @receiver(user_logged_out)
@@ -43,7 +56,7 @@ def log_user_logout(sender, request, user, **kwargs):
         **kwargs: Additional keyword arguments.
     """
     ip_address = get_client_ip(request)
-    logger.info(f"User {user.username} logged out from IP address {ip_address}.")
+    logger.info("User %s logged out from IP address %s.", user.username, ip_address)
 
 
 @receiver(user_login_failed)
@@ -52,7 +65,8 @@ def log_user_login_failed(sender, credentials, request, **kwargs):
     Signal handler for user login failed event.
 
     Logs a message when a login attempt fails. Includes the username and
-    the IP address from which the login attempt was made.
+    the IP address from which the login attempt was made. The attempt is
+    counted in the polls_logins_total metric.
 
     Args:
         sender: The sender of the signal.
@@ -62,4 +76,185 @@ def log_user_login_failed(sender, credentials, request, **kwargs):
     """
     ip_address = get_client_ip(request)
     username = credentials.get('username', 'Unknown')
-    logger.warning(f"Login failed for username {username} from IP address {ip_address}.")
+    logger.warning("Login failed for username %s from IP address %s.", username, ip_address)
+    logins_total.inc(('failure',))
+
+
+@receiver(pre_save, sender=Question)
+def set_question_status(sender, instance, **kwargs):
+    """
+    Signal handler for questions about to be saved.
+
+    Sets the question's status from its dates. Unlike Question.save(), the
+    signal is also sent for the raw saves of loaddata, so fixtures never
+    leave a question open before its pub_date.
+
+    Args:
+        sender: The sender of the signal.
+        instance: The Question about to be saved.
+        **kwargs: Additional keyword arguments.
+    """
+    instance.status = instance.compute_status()
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalidate_question_pages(sender, instance, **kwargs):
+    """
+    Signal handler for saved or deleted questions.
+
+    Drops the cached pages of the question and of the index.
+
+    Args:
+        sender: The sender of the signal.
+        instance: The Question that was saved or deleted.
+        **kwargs: Additional keyword arguments.
+    """
+    invalidate_pages_on_commit(instance.pk)
+
+
+@receiver(post_save, sender=Question)
+def wake_lifecycle_scheduler(sender, instance, **kwargs):
+    """
+    Signal handler for saved questions.
+
+    Wakes the lifecycle scheduler once committed, in case the question's
+    new dates make it due sooner than the scheduler's next pass.
+
+    Args:
+        sender: The sender of the signal.
+        instance: The Question that was saved.
+        **kwargs: Additional keyword arguments.
+    """
+    transaction.on_commit(wake_scheduler)
+
+
+def _deleted_with(origin, *models):
+    """Return True if a deletion started from an instance or queryset of one of the models."""
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return issubclass(model, models)
+
+
+@receiver(pre_delete, sender=Question)
+@receiver(pre_delete, sender=Choice)
+def forget_voters(sender, instance, origin=None, **kwargs):
+    """
+    Signal handler for questions or choices about to be deleted.
+
+    Drops the cached vote maps of everyone who voted on the question or
+    choice, with one query, so the votes deleted with it need no handling
+    of their own (see vote_changed).
+
+    Args:
+        sender: The sender of the signal.
+        instance: The Question or Choice about to be deleted.
+        origin: Where the deletion started.
+        **kwargs: Additional keyword arguments.
+    """
+    if sender is Choice and _deleted_with(origin, Question):
+        return
+    votes = Vote.objects.filter(**{'question' if sender is Question else 'choice': instance})
+    invalidate_user_votes_on_commit(votes.values_list('user_id', flat=True).distinct())
+
+
+@receiver(pre_delete, sender=User)
+def forget_votes_of_user(sender, instance, origin=None, **kwargs):
+    """
+    Signal handler for users about to be deleted.
+
+    Takes the user's votes off the choice counters, bumps the versions of
+    the questions the user voted on, marks their cached results as out of
+    date and drops the user's cached vote map, once for all of the user's
+    votes (see vote_changed).
+
+    Args:
+        sender: The sender of the signal.
+        instance: The User about to be deleted.
+        origin: Where the deletion started.
+        **kwargs: Additional keyword arguments.
+    """
+    votes = Vote.objects.filter(user=instance).values('question_id', 'choice_id').annotate(count=Count('pk'))
+    question_ids = {vote['question_id'] for vote in votes}
+    if not question_ids:
+        return
+    move_vote_counters({vote['choice_id']: -vote['count'] for vote in votes})
+    Question.objects.filter(pk__in=question_ids).touch()
+    for question_id in question_ids:
+        invalidate_results_on_commit(question_id)
+    invalidate_user_votes_on_commit([instance.pk])
+
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def choice_changed(sender, instance, origin=None, **kwargs):
+    """
+    Signal handler for saved or deleted choices.
+
+    Bumps the version of the choice's question and marks its cached results
+    as out of date, unless the question is being deleted too.
+
+    Args:
+        sender: The sender of the signal.
+        instance: The Choice that was saved or deleted.
+        origin: Where the deletion started, for deleted choices.
+        **kwargs: Additional keyword arguments.
+    """
+    if origin is not None and _deleted_with(origin, Question):
+        return
+    Question.objects.filter(pk=instance.question_id).touch()
+    invalidate_results_on_commit(instance.question_id)
+
+
+@receiver(pre_save, sender=Vote)
+def remember_previous_choice(sender, instance, raw=False, **kwargs):
+    """
+    Signal handler for votes about to be saved.
+
+    Records the choice the vote had before, for vote_changed to move the
+    counters from.
+
+    Args:
+        sender: The sender of the signal.
+        instance: The Vote about to be saved.
+        raw: True when the vote is loaded from a fixture.
+        **kwargs: Additional keyword arguments.
+    """
+    instance._previous_choice_id = None
+    if instance.pk is not None and not raw:
+        instance._previous_choice_id = Vote.objects.filter(pk=instance.pk).values_list('choice_id', flat=True).first()
+
+
+@receiver(post_save, sender=Vote)
+@receiver(post_delete, sender=Vote)
+def vote_changed(sender, instance, created=False, raw=False, origin=None, **kwargs):
+    """
+    Signal handler for saved or deleted votes.
+
+    Moves the choice counters, bumps the version of the voted question,
+    marks its cached results as out of date and drops the voter's cached
+    vote map. Votes written by polls.voting do not send the signal, and
+    fixtures carry their own counters. Votes deleted along with their
+    question, choice or user are handled once for the whole batch by the
+    pre_delete handlers of those, instead of one query each.
+
+    Args:
+        sender: The sender of the signal.
+        instance: The Vote that was saved or deleted.
+        created: True for a new vote.
+        raw: True when the vote is loaded from a fixture.
+        origin: Where the deletion started, for deleted votes.
+        **kwargs: Additional keyword arguments.
+    """
+    if origin is not None:
+        if _deleted_with(origin, Question, Choice, User):
+            return
+        move_vote_counters({instance.choice_id: -1})
+    elif created and not raw:
+        move_vote_counters({instance.choice_id: 1})
+    elif not raw:
+        previous = getattr(instance, '_previous_choice_id', None)
+        if previous is not None and previous != instance.choice_id:
+            move_vote_counters({previous: -1, instance.choice_id: 1})
+    Question.objects.filter(pk=instance.question_id).touch()
+    invalidate_results_on_commit(instance.question_id)
+    invalidate_user_votes_on_commit([instance.user_id])
@@ -0,0 +1,24 @@
+"""Template tags for displaying poll results."""
+
+from django import template
+from polls.results import get_results
+
+register = template.Library()
+
+
+@register.simple_tag
+def question_results(question):
+    """
+    Return the results of a question for use in a template.
+
+    Usage:
+        {% load poll_results %}
+        {% question_results question as results %}
+
+    Args:
+        question: The Question instance or its primary key.
+
+    Returns:
+        QuestionResults: The tallies, turnout and percentages of the question.
+    """
+    return get_results(question)
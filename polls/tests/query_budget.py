@@ -0,0 +1,69 @@
+"""
+polls/tests/query_budget.py.
+
+Query budgets for tests: an upper bound on the number of SQL queries, and
+optionally on their total time, that a block of code may use.
+
+Classes:
+- query_budget: Context manager and decorator that enforces a query budget.
+"""
+
+from contextlib import ContextDecorator
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class query_budget(ContextDecorator):
+    """
+    Fail if the wrapped code runs more queries, or spends longer in the database, than allowed.
+
+    Use it as ``with query_budget(3):`` or as a ``@query_budget(3)``
+    decorator. After the block, ``queries`` holds the captured queries and
+    ``count`` and ``time`` their number and total seconds.
+
+    Attributes:
+        max_queries (int): The largest number of queries allowed.
+        max_time (float): The largest total query time allowed in seconds, or None for no limit.
+        using (str): The alias of the database whose queries are counted.
+    """
+
+    def __init__(self, max_queries, max_time=None, using=DEFAULT_DB_ALIAS):
+        """Set the budget."""
+        self.max_queries = max_queries
+        self.max_time = max_time
+        self.using = using
+        self.queries = []
+
+    def __enter__(self):
+        """Start capturing queries."""
+        self._context = CaptureQueriesContext(connections[self.using])
+        self._context.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Stop capturing and check the budget, unless the block raised."""
+        self._context.__exit__(exc_type, exc_value, traceback)
+        self.queries = self._context.captured_queries
+        if exc_type is not None:
+            return False
+
+        listing = '\n'.join(f"{n}. {query['sql']}" for n, query in enumerate(self.queries, start=1))
+        if self.count > self.max_queries:
+            raise AssertionError(
+                f"{self.count} queries executed, the budget is {self.max_queries}.\nCaptured queries were:\n{listing}"
+            )
+        if self.max_time is not None and self.time > self.max_time:
+            raise AssertionError(
+                f"Queries took {self.time:.3f}s, the budget is {self.max_time:.3f}s.\nCaptured queries were:\n{listing}"
+            )
+        return False
+
+    @property
+    def count(self):
+        """Return the number of captured queries."""
+        return len(self.queries)
+
+    @property
+    def time(self):
+        """Return the total time of the captured queries in seconds."""
+        return sum(float(query['time']) for query in self.queries)
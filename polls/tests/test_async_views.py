@@ -0,0 +1,80 @@
+import datetime
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from ..async_views import AsyncDetailView, AsyncIndexView, AsyncResultsView, AsyncVoteView
+from ..models import Question, Choice, Vote
+
+
+@override_settings(ROOT_URLCONF='mysite.async_urls')
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        """Set up a user, an open question with two choices and an empty cache."""
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.question = Question.objects.create(
+            question_text='Async question', pub_date=timezone.now() - datetime.timedelta(days=1)
+        )
+        self.choice1 = Choice.objects.create(question=self.question, choice_text='Choice 1')
+        self.choice2 = Choice.objects.create(question=self.question, choice_text='Choice 2')
+
+    def test_async_views_are_routed(self):
+        """The async urlconf serves the polls with the async views."""
+        self.assertIs(self.client.get(reverse('polls:index')).resolver_match.func.view_class, AsyncIndexView)
+        for name, view_class in (('polls:detail', AsyncDetailView), ('polls:results', AsyncResultsView)):
+            response = self.client.get(reverse(name, args=[self.question.id]))
+            self.assertIs(response.resolver_match.func.view_class, view_class)
+        self.assertIs(
+            self.client.post(reverse('polls:vote', args=[self.question.id])).resolver_match.func.view_class,
+            AsyncVoteView,
+        )
+
+    async def test_index_lists_questions(self):
+        """The async index lists published questions and sends validators."""
+        response = await self.async_client.get(reverse('polls:index'))
+        self.assertContains(response, 'Async question')
+        self.assertTrue(response.has_header('ETag'))
+        not_modified = await self.async_client.get(reverse('polls:index'), headers={'if-none-match': response['ETag']})
+        self.assertEqual(not_modified.status_code, 304)
+
+    async def test_detail_and_results(self):
+        """The async detail and results pages render the question."""
+        response = await self.async_client.get(reverse('polls:detail', args=[self.question.id]))
+        self.assertContains(response, 'Log in to vote')
+        response = await self.async_client.get(reverse('polls:results', args=[self.question.id]))
+        self.assertContains(response, 'Total votes: 0')
+
+    async def test_detail_of_unknown_question(self):
+        """An unknown question is a 404."""
+        response = await self.async_client.get(reverse('polls:detail', args=[self.question.id + 1]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_vote_requires_login(self):
+        """Anonymous votes are redirected to the login page."""
+        response = await self.async_client.post(reverse('polls:vote', args=[self.question.id]),
+                                                {'choice': self.choice1.id})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('login', response.url)
+
+    async def test_vote_and_change_vote(self):
+        """A logged-in user can vote and change the vote, keeping the counters right."""
+        await self.async_client.alogin(username='testuser', password='12345')
+        url = reverse('polls:vote', args=[self.question.id])
+        response = await self.async_client.post(url, {'choice': self.choice1.id})
+        self.assertRedirects(response, reverse('polls:results', args=[self.question.id]),
+                             fetch_redirect_response=False)
+        await self.async_client.post(url, {'choice': self.choice2.id})
+        vote = await Vote.objects.aget(user=self.user, question=self.question)
+        self.assertEqual(vote.choice_id, self.choice2.id)
+        await self.choice1.arefresh_from_db()
+        await self.choice2.arefresh_from_db()
+        self.assertEqual((self.choice1.votes, self.choice2.votes), (0, 1))
+
+    async def test_vote_with_invalid_choice(self):
+        """An invalid choice sends the user back to the detail page."""
+        await self.async_client.alogin(username='testuser', password='12345')
+        response = await self.async_client.post(reverse('polls:vote', args=[self.question.id]), {'choice': 999})
+        self.assertRedirects(response, reverse('polls:detail', args=[self.question.id]),
+                             fetch_redirect_response=False)
@@ -0,0 +1,67 @@
+from django.core.cache import cache
+from django.db.models import Count, F
+from django.test import SimpleTestCase, TestCase
+from ..benchmark import (
+    compare_reports, delete_synthetic_data, percentile, run_client_benchmark, run_render_benchmark,
+    seed_synthetic_data, summarize,
+)
+from ..models import Question, Choice, Vote
+
+
+class BenchmarkStatisticsTests(SimpleTestCase):
+    def test_percentile_nearest_rank(self):
+        """Percentiles use the nearest-rank method."""
+        samples = list(range(1, 101))
+        self.assertEqual(percentile(samples, 50), 50)
+        self.assertEqual(percentile(samples, 99), 99)
+        self.assertEqual(percentile([3.0], 95), 3.0)
+        self.assertIsNone(percentile([], 50))
+
+    def test_compare_reports(self):
+        """Changes are relative for latency and absolute for query counts."""
+        before = {'index': summarize([0.010] * 10, [3] * 10)}
+        after = {'index': summarize([0.015] * 10, [4] * 10), 'new': summarize([0.001], [1])}
+        self.assertEqual(
+            compare_reports(after, before),
+            {'index': {'p50_latency': 0.5, 'p95_latency': 0.5, 'p50_queries': 1}},
+        )
+
+
+class BenchmarkSuiteTests(TestCase):
+    def setUp(self):
+        """Seed a small synthetic data set and empty the cache."""
+        cache.clear()
+        self.created = seed_synthetic_data(questions=20, users=10, votes=150, batch_size=40)
+
+    def test_seeded_data_is_consistent(self):
+        """Seeding creates the requested rows with counters that match the votes."""
+        self.assertEqual(self.created, {'users': 10, 'questions': 20, 'choices': 80, 'votes': 150})
+        self.assertEqual(Vote.objects.count(), 150)
+        self.assertFalse(Choice.objects.annotate(actual=Count('vote')).exclude(votes=F('actual')).exists())
+
+    def test_client_benchmark_covers_every_path(self):
+        """The benchmark measures every path with successful responses."""
+        report = run_client_benchmark(iterations=3, warmup=1)
+        self.assertEqual(
+            set(report),
+            {'index', 'index_deep_page', 'detail', 'detail_logged_in', 'results', 'results_json', 'vote'},
+        )
+        for name, summary in report.items():
+            self.assertEqual(summary['requests'], 3)
+            self.assertEqual(set(summary['status']), {'302' if name == 'vote' else '200'})
+            self.assertIsNotNone(summary['latency_ms']['p95'])
+
+    def test_render_benchmark_covers_every_page(self):
+        """The render benchmark times each page in each template mode, minified pages being smaller."""
+        report = run_render_benchmark(iterations=2, warmup=1)
+        self.assertEqual(set(report), {'index', 'detail', 'results'})
+        for name, modes in report.items():
+            self.assertEqual(set(modes), {'uncached', 'cached', 'minified'})
+            self.assertIsNotNone(modes['cached']['latency_ms']['p50'])
+            self.assertLess(modes['minified']['bytes'], modes['cached']['bytes'])
+
+    def test_delete_synthetic_data(self):
+        """Deleting removes the synthetic questions and their votes."""
+        delete_synthetic_data()
+        self.assertFalse(Question.objects.exists())
+        self.assertFalse(Vote.objects.exists())
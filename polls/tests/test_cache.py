@@ -0,0 +1,117 @@
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from ..cache import get_cached_results, invalidate_results
+from ..models import Question, Choice, Vote
+
+
+class ResultsCacheTests(TestCase):
+    def setUp(self):
+        """Set up a question with two choices and an empty cache."""
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.question = Question.objects.create(question_text='Test Question', pub_date=timezone.now())
+        self.choice1 = Choice.objects.create(question=self.question, choice_text='Choice 1')
+        self.choice2 = Choice.objects.create(question=self.question, choice_text='Choice 2')
+
+    def test_cache_hit_runs_no_query(self):
+        """A cached snapshot is served without touching the database."""
+        get_cached_results(self.question)
+        with self.assertNumQueries(0):
+            results = get_cached_results(self.question)
+        self.assertEqual(results.total_votes, 0)
+
+    def test_invalidation_recomputes(self):
+        """An invalidated snapshot is recomputed on the next read."""
+        get_cached_results(self.question)
+        Choice.objects.filter(pk=self.choice1.pk).update(votes=2)
+        invalidate_results(self.question.pk)
+        with self.assertNumQueries(1):
+            results = get_cached_results(self.question)
+        self.assertEqual(results.total_votes, 2)
+
+    def test_vote_invalidates_on_commit(self):
+        """Voting invalidates the question's snapshot once the vote commits."""
+        get_cached_results(self.question)
+        self.client.login(username='testuser', password='12345')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('polls:vote', args=[self.question.id]), {'choice': self.choice1.id})
+        self.assertEqual(get_cached_results(self.question).total_votes, 1)
+
+    def test_vote_delete_signal_invalidates(self):
+        """Deleting a vote outside the vote view also invalidates the snapshot."""
+        vote = Vote.objects.create(user=self.user, choice=self.choice1)
+        self.assertEqual(get_cached_results(self.question).total_votes, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            vote.delete()
+        self.assertEqual(get_cached_results(self.question).total_votes, 0)
+
+    def test_choice_signal_invalidates(self):
+        """Adding a choice invalidates the snapshot."""
+        get_cached_results(self.question)
+        with self.captureOnCommitCallbacks(execute=True):
+            Choice.objects.create(question=self.question, choice_text='Choice 3')
+        self.assertEqual(len(get_cached_results(self.question).choices), 3)
+
+    @override_settings(POLLS_RESULTS_MAX_STALENESS=60)
+    def test_stale_snapshot_within_window(self):
+        """A dirty snapshot is still served while it is younger than the staleness window."""
+        get_cached_results(self.question)
+        Choice.objects.filter(pk=self.choice1.pk).update(votes=5)
+        invalidate_results(self.question.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_cached_results(self.question).total_votes, 0)
+
+    @override_settings(POLLS_RESULTS_MAX_STALENESS=60)
+    def test_stale_snapshot_after_window(self):
+        """A dirty snapshot older than the staleness window is recomputed."""
+        with mock.patch('polls.cache.time.time', return_value=1000.0):
+            get_cached_results(self.question)
+        Choice.objects.filter(pk=self.choice1.pk).update(votes=5)
+        invalidate_results(self.question.pk)
+        with mock.patch('polls.cache.time.time', return_value=1061.0):
+            self.assertEqual(get_cached_results(self.question).total_votes, 5)
+
+
+class CascadeDeleteTests(TestCase):
+    def setUp(self):
+        """Set up an empty cache."""
+        cache.clear()
+
+    def create_voted_question(self, voters):
+        """Create a question with two choices and a vote from each of several new users."""
+        question = Question.objects.create(question_text='Test Question', pub_date=timezone.now())
+        choice = Choice.objects.create(question=question, choice_text='Choice 1')
+        Choice.objects.create(question=question, choice_text='Choice 2')
+        for n in range(voters):
+            user = User.objects.create_user(username=f'voter{question.pk}-{n}')
+            Vote.objects.create(user=user, question=question, choice=choice)
+        return question
+
+    def delete_queries(self, instance):
+        """Return how many queries deleting an instance runs."""
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            instance.delete()
+        return len(queries.captured_queries)
+
+    def test_question_delete_does_not_grow_with_votes(self):
+        """Deleting a question costs the same number of queries whatever its number of votes."""
+        few = self.delete_queries(self.create_voted_question(2))
+        many = self.delete_queries(self.create_voted_question(20))
+        self.assertEqual(few, many)
+
+    def test_user_delete_invalidates_voted_questions(self):
+        """Deleting a user takes their votes off the counters and recomputes the questions they voted on, once."""
+        question = self.create_voted_question(1)
+        user = Vote.objects.get().user
+        version = Question.objects.get(pk=question.pk).version
+        self.assertEqual(get_cached_results(question).total_votes, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            user.delete()
+        self.assertEqual(Question.objects.get(pk=question.pk).version, version + 1)
+        self.assertEqual(get_cached_results(question).total_votes, 0)
@@ -0,0 +1,82 @@
+import datetime
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from ..models import Question, Choice
+from ..voting import cast_vote
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        """Set up a published question with a choice and an empty cache."""
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.question = Question.objects.create(
+            question_text='Test Question', pub_date=timezone.now() - datetime.timedelta(days=1)
+        )
+        self.choice = Choice.objects.create(question=self.question, choice_text='Choice 1')
+        self.urls = [
+            reverse('polls:index'),
+            reverse('polls:detail', args=[self.question.id]),
+            reverse('polls:results', args=[self.question.id]),
+        ]
+
+    def test_validators_are_sent(self):
+        """Index, detail and results pages carry ETag and Last-Modified headers."""
+        for url in self.urls:
+            response = self.client.get(url)
+            self.assertIn('ETag', response.headers)
+            self.assertIn('Last-Modified', response.headers)
+
+    def test_not_modified_without_rendering(self):
+        """A request with a matching ETag gets 304 without rendering a template."""
+        for url in self.urls:
+            etag = self.client.get(url).headers['ETag']
+            with mock.patch('django.template.response.SimpleTemplateResponse.render') as render:
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            render.assert_not_called()
+
+    def test_if_modified_since(self):
+        """A request with a current If-Modified-Since date gets 304."""
+        url = reverse('polls:results', args=[self.question.id])
+        last_modified = self.client.get(url).headers['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_vote_changes_etag(self):
+        """A vote bumps the question version and changes the ETag of its pages."""
+        url = reverse('polls:results', args=[self.question.id])
+        etag = self.client.get(url).headers['ETag']
+        self.question.refresh_from_db()
+        version = self.question.version
+        with self.captureOnCommitCallbacks(execute=True):
+            cast_vote(self.user, self.question, self.choice)
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.version, version + 1)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Total votes: 1')
+
+    def test_etag_depends_on_user(self):
+        """Anonymous and logged-in visitors get different ETags for the same page."""
+        url = reverse('polls:detail', args=[self.question.id])
+        anonymous_etag = self.client.get(url).headers['ETag']
+        self.client.login(username='testuser', password='12345')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=anonymous_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], anonymous_etag)
+
+    def test_closing_changes_etag(self):
+        """A question passing its end date changes the ETag of its pages."""
+        self.question.end_date = timezone.now() + datetime.timedelta(minutes=5)
+        self.question.save()
+        url = reverse('polls:results', args=[self.question.id])
+        etag = self.client.get(url).headers['ETag']
+        later = timezone.now() + datetime.timedelta(minutes=10)
+        with mock.patch('polls.conditional.timezone.now', return_value=later):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertNotEqual(response.headers['ETag'], etag)
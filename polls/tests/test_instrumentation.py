@@ -0,0 +1,80 @@
+import datetime
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from .. import instrumentation, metrics
+from ..models import Question, Choice
+
+
+class InstrumentationMiddlewareTests(TestCase):
+    def setUp(self):
+        """Set up a published question, an empty cache and empty metrics."""
+        cache.clear()
+        for metric in metrics.REGISTRY.values():
+            metric.reset()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.question = Question.objects.create(
+            question_text='Measured question', pub_date=timezone.now() - datetime.timedelta(days=1)
+        )
+        Choice.objects.create(question=self.question, choice_text='Choice 1')
+
+    def test_server_timing_header(self):
+        """Responses report total, SQL and template time and cache use."""
+        self.client.login(username='testuser', password='12345')
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('polls:index'))
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="5 queries", tpl;dur=[\d.]+')
+        self.assertIn('cache-validators-miss;desc="1"', timing)
+        self.assertIn('cache-votes-miss;desc="1"', timing)
+
+    def test_page_cache_hits_are_counted(self):
+        """A page served from the cache is reported as a hit with no queries."""
+        url = reverse('polls:detail', args=[self.question.id])
+        self.assertIn('cache-page-miss', self.client.get(url)['Server-Timing'])
+        timing = self.client.get(url)['Server-Timing']
+        self.assertIn('cache-page-hit;desc="1"', timing)
+        self.assertIn('desc="0 queries"', timing)
+        self.assertEqual(instrumentation.cache_requests.samples()[('page', 'hit')], 1)
+
+    def test_requests_recorded_per_view(self):
+        """Each request is observed in the histograms under its URL name."""
+        self.client.get(reverse('polls:index'))
+        self.client.get(reverse('polls:index'))
+        self.client.get(reverse('polls:results', args=[self.question.id]))
+        counts = {view: count for (view,), (_, count, _) in instrumentation.request_duration.samples().items()}
+        self.assertEqual(counts, {'polls:index': 2, 'polls:results': 1})
+        buckets, count, total = instrumentation.request_queries.samples()[('polls:results',)]
+        self.assertEqual(count, 1)
+        self.assertEqual(total, 3)
+
+    @override_settings(POLLS_INSTRUMENTATION_SAMPLE_RATE=0)
+    def test_unsampled_requests_not_measured(self):
+        """With a sample rate of 0 nothing is measured."""
+        response = self.client.get(reverse('polls:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(instrumentation.request_duration.samples(), {})
+
+    @override_settings(POLLS_SERVER_TIMING=False)
+    def test_header_can_be_disabled(self):
+        """The header can be turned off while the histograms are still filled."""
+        response = self.client.get(reverse('polls:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertIn(('polls:index',), instrumentation.request_duration.samples())
+
+    @override_settings(ROOT_URLCONF='mysite.async_urls')
+    async def test_async_views_are_measured(self):
+        """Queries run by async views through sync_to_async are counted."""
+        response = await self.async_client.get(reverse('polls:results', args=[self.question.id]))
+        self.assertIn('desc="3 queries"', response['Server-Timing'])
+
+    def test_render_metrics(self):
+        """The histograms render in the Prometheus text format."""
+        self.client.get(reverse('polls:index'))
+        text = metrics.render()
+        self.assertIn('# TYPE polls_request_duration_seconds histogram', text)
+        self.assertIn('polls_request_duration_seconds_count{view="polls:index"} 1', text)
+        self.assertIn('polls_request_queries_bucket{view="polls:index",le="+Inf"} 1', text)
+        self.assertIn('polls_cache_requests_total{cache="page",result="miss"} 1', text)
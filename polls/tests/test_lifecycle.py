@@ -0,0 +1,195 @@
+import datetime
+import json
+from io import StringIO
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core import serializers
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from .. import lifecycle
+from ..cache import page_generation, question_scope
+from ..models import Question, Choice
+
+
+class QuestionStatusTests(TestCase):
+    def setUp(self):
+        """Set up a scheduled, an open and a closed question."""
+        now = timezone.now()
+        self.scheduled = Question.objects.create(question_text='Scheduled', pub_date=now + datetime.timedelta(days=1))
+        self.open = Question.objects.create(
+            question_text='Open', pub_date=now - datetime.timedelta(days=1), end_date=now + datetime.timedelta(days=1),
+        )
+        self.closed = Question.objects.create(
+            question_text='Closed', pub_date=now - datetime.timedelta(days=2), end_date=now - datetime.timedelta(days=1),
+        )
+
+    def test_status_set_on_save(self):
+        """Saving a question sets its status from its dates."""
+        self.assertEqual(self.scheduled.status, Question.Status.SCHEDULED)
+        self.assertEqual(self.open.status, Question.Status.OPEN)
+        self.assertEqual(self.closed.status, Question.Status.CLOSED)
+
+        self.closed.end_date = None
+        self.closed.save(update_fields=['end_date'])
+        self.closed.refresh_from_db()
+        self.assertEqual(self.closed.status, Question.Status.OPEN)
+
+    def test_querysets(self):
+        """The lifecycle filters select questions by status."""
+        self.assertQuerySetEqual(Question.objects.scheduled(), [self.scheduled])
+        self.assertQuerySetEqual(Question.objects.open(), [self.open])
+        self.assertQuerySetEqual(Question.objects.closed(), [self.closed])
+        self.assertQuerySetEqual(Question.objects.published().order_by('pk'), [self.open, self.closed])
+
+    def test_methods_follow_the_clock(self):
+        """can_vote(), is_open and is_published() follow the dates even before the scheduler runs."""
+        self.assertTrue(self.open.can_vote())
+        self.assertFalse(self.closed.can_vote())
+        self.assertTrue(self.closed.is_published())
+        later = timezone.now() + datetime.timedelta(days=3)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            self.assertEqual(self.open.status, Question.Status.OPEN)
+            self.assertFalse(self.open.can_vote())
+            self.assertFalse(self.open.is_open)
+            self.assertTrue(self.scheduled.is_published())
+
+    def test_querysets_follow_the_clock(self):
+        """The lifecycle filters read the dates, so a stale stored status does not matter."""
+        Question.objects.update(status=Question.Status.OPEN)
+        later = timezone.now() + datetime.timedelta(days=3)
+        self.assertQuerySetEqual(Question.objects.scheduled(), [self.scheduled])
+        self.assertQuerySetEqual(Question.objects.closed(), [self.closed])
+        self.assertQuerySetEqual(Question.objects.open(later), [self.scheduled])
+        self.assertQuerySetEqual(Question.objects.closed(later).order_by('pk'), [self.open, self.closed])
+        self.assertEqual(Question.objects.published(later).count(), 3)
+
+    def test_status_set_on_raw_save(self):
+        """Questions loaded from a fixture get the status of their dates."""
+        pub_date = (timezone.now() + datetime.timedelta(days=1)).isoformat()
+        fixture = json.dumps([
+            {'model': 'polls.question', 'pk': 100, 'fields': {'question_text': 'Fixture', 'pub_date': pub_date}},
+        ])
+        for obj in serializers.deserialize('json', fixture):
+            obj.save()
+        self.assertEqual(Question.objects.get(pk=100).status, Question.Status.SCHEDULED)
+
+
+class AdvanceTests(TestCase):
+    def setUp(self):
+        """Set up a question that opens in an hour and closes in two."""
+        cache.clear()
+        self.now = timezone.now()
+        self.question = Question.objects.create(
+            question_text='Upcoming',
+            pub_date=self.now + datetime.timedelta(hours=1),
+            end_date=self.now + datetime.timedelta(hours=2),
+        )
+        Choice.objects.create(question=self.question, choice_text='Choice 1')
+
+    def advance(self, hours):
+        """Advance the lifecycle to the given number of hours from now, running on-commit callbacks."""
+        with self.captureOnCommitCallbacks(execute=True):
+            return lifecycle.advance(self.now + datetime.timedelta(hours=hours))
+
+    def test_questions_move_at_their_dates(self):
+        """Due questions open at their pub_date and close at their end_date."""
+        version = Question.objects.get(pk=self.question.pk).version
+        self.assertEqual(self.advance(0.5), {})
+        self.assertEqual(self.advance(1.5), {Question.Status.OPEN: [self.question.pk]})
+        self.assertEqual(self.advance(2.5), {Question.Status.CLOSED: [self.question.pk]})
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.status, Question.Status.CLOSED)
+        self.assertEqual(self.question.version, version + 2)
+
+    def test_late_questions_skip_to_closed(self):
+        """A scheduled question whose end_date has passed too goes straight to closed."""
+        self.assertEqual(self.advance(3), {Question.Status.CLOSED: [self.question.pk]})
+
+    def test_pages_invalidated(self):
+        """Moving a question drops its cached pages and the index."""
+        scopes = ['index', question_scope(self.question.pk)]
+        before = page_generation(scopes).split('.')
+        self.advance(1.5)
+        after = page_generation(scopes).split('.')
+        self.assertNotEqual(before[0], after[0])
+        self.assertNotEqual(before[1], after[1])
+
+    def test_rows_out_of_step_recomputed(self):
+        """A question whose status does not match its dates is moved to the right one."""
+        Question.objects.filter(pk=self.question.pk).update(status=Question.Status.OPEN)
+        self.assertEqual(self.advance(0), {Question.Status.SCHEDULED: [self.question.pk]})
+        Question.objects.filter(pk=self.question.pk).update(status=Question.Status.CLOSED)
+        self.assertEqual(self.advance(1.5), {Question.Status.OPEN: [self.question.pk]})
+        self.assertEqual(self.advance(1.5), {})
+
+    def test_index_follows_the_status(self):
+        """The index lists a question once it has been opened."""
+        url = reverse('polls:index')
+        self.assertNotContains(self.client.get(url), 'Upcoming')
+        Question.objects.filter(pk=self.question.pk).update(pub_date=self.now - datetime.timedelta(minutes=1))
+        with self.captureOnCommitCallbacks(execute=True):
+            lifecycle.advance()
+        self.assertContains(self.client.get(url), 'Upcoming')
+
+    def test_pages_follow_the_clock_without_scheduler(self):
+        """A question whose dates have passed is shown as such before the scheduler moves it."""
+        Question.objects.filter(pk=self.question.pk).update(pub_date=self.now - datetime.timedelta(minutes=1))
+        self.assertEqual(self.client.get(reverse('polls:detail', args=[self.question.id])).status_code, 200)
+        self.assertContains(self.client.get(reverse('polls:index')), 'OPEN')
+        Question.objects.filter(pk=self.question.pk).update(end_date=self.now - datetime.timedelta(seconds=1))
+        cache.clear()
+        self.assertContains(self.client.get(reverse('polls:index')), 'CLOSED')
+        self.assertEqual(Question.objects.get(pk=self.question.pk).status, Question.Status.SCHEDULED)
+
+    def test_votes_rejected_once_closed(self):
+        """Votes are refused once the scheduler has closed the question."""
+        User.objects.create_user(username='testuser', password='12345')
+        self.client.login(username='testuser', password='12345')
+        self.advance(3)
+        choice = self.question.choice_set.get()
+        response = self.client.post(reverse('polls:vote', args=[self.question.id]), {'choice': choice.id})
+        self.assertRedirects(response, reverse('polls:detail', args=[self.question.id]), fetch_redirect_response=False)
+        self.assertEqual(choice.vote_set.count(), 0)
+
+    def test_next_transition(self):
+        """The next transition is the pub_date of a scheduled or end_date of an open question."""
+        self.assertEqual(lifecycle.next_transition(), self.question.pub_date)
+        self.advance(1.5)
+        self.assertEqual(lifecycle.next_transition(), self.question.end_date)
+        self.advance(2.5)
+        self.assertIsNone(lifecycle.next_transition())
+
+
+class SchedulerTests(TestCase):
+    def test_sleeps_until_next_transition(self):
+        """The scheduler sleeps until the next transition, at most its interval."""
+        scheduler = lifecycle.LifecycleScheduler(interval=60)
+        self.assertEqual(scheduler.run_once(), 60)
+        Question.objects.create(question_text='Soon', pub_date=timezone.now() + datetime.timedelta(seconds=10))
+        self.assertLessEqual(scheduler.run_once(), 10.001)
+        Question.objects.create(question_text='Later', pub_date=timezone.now() + datetime.timedelta(hours=1))
+        self.assertLessEqual(scheduler.run_once(), 10.001)
+
+    def test_survives_errors(self):
+        """An error in a pass is logged and the scheduler tries again after its interval."""
+        scheduler = lifecycle.LifecycleScheduler(interval=60)
+        with mock.patch.object(lifecycle, 'advance', side_effect=RuntimeError), self.assertLogs('myapp', 'ERROR'):
+            self.assertEqual(scheduler.run_once(), 60)
+
+    @override_settings(POLLS_LIFECYCLE_SCHEDULER='off')
+    def test_disabled(self):
+        """No thread is started when the scheduler is off."""
+        self.assertIsNone(lifecycle.start_scheduler())
+
+    def test_command_once(self):
+        """run_lifecycle --once advances the due questions."""
+        question = Question.objects.create(question_text='Due', pub_date=timezone.now() + datetime.timedelta(days=1))
+        Question.objects.filter(pk=question.pk).update(pub_date=timezone.now() - datetime.timedelta(days=1))
+        output = StringIO()
+        call_command('run_lifecycle', '--once', stdout=output)
+        self.assertIn('1 open', output.getvalue())
+        question.refresh_from_db()
+        self.assertEqual(question.status, Question.Status.OPEN)
@@ -0,0 +1,122 @@
+import asyncio
+import datetime
+import json
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from ..events import ResultsBroker, broker
+from ..models import Question, Choice
+from ..views import ResultsStreamView
+from ..voting import cast_vote
+
+
+def parse_event(chunk):
+    """Return the (event, data) of a Server-Sent Events message."""
+    if isinstance(chunk, bytes):
+        chunk = chunk.decode()
+    lines = dict(line.split(': ', 1) for line in chunk.strip().splitlines())
+    return lines['event'], json.loads(lines['data'])
+
+
+class ResultsJsonTests(TestCase):
+    def setUp(self):
+        """Set up a question with two choices and an empty cache."""
+        cache.clear()
+        self.question = Question.objects.create(question_text='Test Question', pub_date=timezone.now())
+        self.choice1 = Choice.objects.create(question=self.question, choice_text='Choice 1', votes=1)
+        self.choice2 = Choice.objects.create(question=self.question, choice_text='Choice 2', votes=3)
+
+    def test_results_json(self):
+        """results.json returns the aggregated tallies of a question."""
+        response = self.client.get(reverse('polls:results_json', args=[self.question.id]))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['question_text'], 'Test Question')
+        self.assertEqual(data['total_votes'], 4)
+        self.assertEqual([c['votes'] for c in data['choices']], [1, 3])
+
+    def test_unpublished_question_not_found(self):
+        """results.json of an unpublished question returns 404."""
+        future = Question.objects.create(question_text='Future', pub_date=timezone.now() + datetime.timedelta(days=1))
+        response = self.client.get(reverse('polls:results_json', args=[future.id]))
+        self.assertEqual(response.status_code, 404)
+
+
+class ResultsBrokerTests(TestCase):
+    def test_publish_reaches_subscribers_of_the_question(self):
+        """Published events reach the question's subscribers only."""
+        async def scenario():
+            local_broker = ResultsBroker()
+            queue = local_broker.subscribe(1)
+            other = local_broker.subscribe(2)
+            local_broker.publish(1, {'deltas': {'5': 1}})
+            event = await asyncio.wait_for(queue.get(), 1)
+            self.assertTrue(other.empty())
+            local_broker.unsubscribe(1, queue)
+            self.assertEqual(local_broker.subscriber_count(1), 0)
+            return event
+
+        self.assertEqual(asyncio.run(scenario()), {'deltas': {'5': 1}})
+
+    def test_slow_subscriber_drops_oldest(self):
+        """A subscriber that falls behind keeps only the newest events."""
+        async def scenario():
+            local_broker = ResultsBroker(max_queued=2)
+            queue = local_broker.subscribe(1)
+            for i in range(3):
+                local_broker.publish(1, i)
+            await asyncio.sleep(0)
+            return [queue.get_nowait() for _ in range(queue.qsize())]
+
+        self.assertEqual(asyncio.run(scenario()), [1, 2])
+
+
+class ResultsStreamTests(TestCase):
+    def setUp(self):
+        """Set up a user and a question with two choices."""
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.question = Question.objects.create(question_text='Test Question', pub_date=timezone.now())
+        self.choice1 = Choice.objects.create(question=self.question, choice_text='Choice 1')
+        self.choice2 = Choice.objects.create(question=self.question, choice_text='Choice 2')
+
+    async def test_stream_sends_snapshot_then_deltas(self):
+        """The stream starts with a snapshot and then sends a delta for each vote."""
+        response = await self.async_client.get(reverse('polls:results_stream', args=[self.question.id]))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = aiter(response.streaming_content)
+
+        name, data = parse_event(await anext(events))
+        self.assertEqual((name, data['total_votes']), ('snapshot', 0))
+
+        def vote():
+            with self.captureOnCommitCallbacks(execute=True):
+                cast_vote(self.user, self.question, self.choice2)
+
+        await sync_to_async(vote)()
+        name, data = parse_event(await asyncio.wait_for(anext(events), 1))
+        self.assertEqual(name, 'delta')
+        self.assertEqual(data, {'question': self.question.id, 'deltas': {str(self.choice2.id): 1}, 'total_votes': 1})
+
+    async def test_closing_stream_unsubscribes(self):
+        """Closing the stream removes its subscription."""
+        stream = ResultsStreamView().stream(self.question.id)
+        await anext(stream)
+        self.assertEqual(broker.subscriber_count(self.question.id), 1)
+        await stream.aclose()
+        self.assertEqual(broker.subscriber_count(self.question.id), 0)
+
+    async def test_stream_of_unknown_question(self):
+        """The stream of a missing question returns 404."""
+        response = await self.async_client.get(reverse('polls:results_stream', args=[9999]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_stream_not_served_under_wsgi(self):
+        """Under WSGI the stream returns 501 at once instead of holding the worker."""
+        response = self.client.get(reverse('polls:results_stream', args=[self.question.id]))
+        self.assertEqual(response.status_code, 501)
+        self.assertFalse(response.streaming)
+        self.assertEqual(broker.subscriber_count(self.question.id), 0)
@@ -0,0 +1,132 @@
+import json
+import logging
+import os
+import tempfile
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from mysite.log import JsonFormatter, QueueHandler, parse_levels
+
+
+class LoggingPipelineTests(SimpleTestCase):
+    def setUp(self):
+        """Set up a logger that is not shared with the application."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.filename = os.path.join(self.directory.name, 'test.log')
+        self.logger = logging.getLogger('polls.tests.logging')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        self.addCleanup(setattr, self.logger, 'propagate', True)
+
+    def write(self, *records, **handler_options):
+        """Log records through a QueueHandler and return the JSON lines written."""
+        handler = QueueHandler(self.filename, **handler_options)
+        self.logger.addHandler(handler)
+        try:
+            for method, args, kwargs in records:
+                getattr(self.logger, method)(*args, **kwargs)
+        finally:
+            self.logger.removeHandler(handler)
+            handler.close()
+        with open(self.filename, encoding='utf-8') as file:
+            return [json.loads(line) for line in file]
+
+    def test_records_written_as_json(self):
+        """Records are written as JSON lines with their extra fields."""
+        [entry] = self.write(('info', ("Vote for %s", 'Choice 1'), {'extra': {'question': 3}}))
+        self.assertEqual(entry['message'], 'Vote for Choice 1')
+        self.assertEqual(entry['level'], 'INFO')
+        self.assertEqual(entry['logger'], 'polls.tests.logging')
+        self.assertEqual(entry['question'], 3)
+
+    def test_arguments_resolved_when_logged(self):
+        """Arguments changed after the call do not change the record."""
+        handler = QueueHandler(self.filename)
+        self.logger.addHandler(handler)
+        choices = ['Choice 1']
+        self.logger.info("Choices: %s", choices)
+        choices.append('Choice 2')
+        self.logger.removeHandler(handler)
+        handler.close()
+        with open(self.filename, encoding='utf-8') as file:
+            self.assertEqual(json.loads(file.readline())['message'], "Choices: ['Choice 1']")
+
+    def test_exceptions_included(self):
+        """The traceback of logged exceptions is kept."""
+        try:
+            raise ValueError('broken')
+        except ValueError:
+            [entry] = self.write(('exception', ("Failed",), {}))
+        self.assertIn('ValueError: broken', entry['exception'])
+
+    def test_disabled_levels_not_written(self):
+        """Records below the logger level are dropped before reaching the queue."""
+        entries = self.write(('debug', ("Hidden",), {}), ('warning', ("Shown",), {}))
+        self.assertEqual([entry['message'] for entry in entries], ['Shown'])
+
+    def test_rotation_by_size(self):
+        """The file is rotated once it reaches max_bytes."""
+        self.write(*[('info', ("x" * 100,), {})] * 5, max_bytes=300, backup_count=2)
+        self.assertTrue(os.path.exists(f'{self.filename}.1'))
+
+    def test_external_rotation(self):
+        """With external rotation the file is reopened once it has been moved away."""
+        handler = QueueHandler(self.filename, rotation='external')
+        self.logger.addHandler(handler)
+        try:
+            self.logger.info("Before")
+            # Let the writer thread drain the queue before the file is moved.
+            handler.listener.stop()
+            os.rename(self.filename, f'{self.filename}.1')
+            handler.listener.start()
+            self.logger.info("After")
+        finally:
+            self.logger.removeHandler(handler)
+            handler.close()
+        for filename, message in ((f'{self.filename}.1', 'Before'), (self.filename, 'After')):
+            with open(filename, encoding='utf-8') as file:
+                self.assertEqual([json.loads(line)['message'] for line in file], [message])
+
+    def test_unknown_rotation(self):
+        """An unknown rotation is rejected."""
+        with self.assertRaises(ValueError):
+            QueueHandler(self.filename, rotation='weekly')
+
+    def test_formatter_without_extras(self):
+        """The formatter can be used on its own."""
+        record = logging.LogRecord('myapp', logging.WARNING, __file__, 1, "Plain %d", (1,), None)
+        entry = json.loads(JsonFormatter().format(record))
+        self.assertEqual(entry['message'], 'Plain 1')
+        self.assertNotIn('exception', entry)
+
+
+class LogLevelTests(SimpleTestCase):
+    def test_parse_levels(self):
+        """Per-logger levels are read from logger=LEVEL pairs."""
+        self.assertEqual(
+            parse_levels('django.db.backends=debug, myapp=WARNING,'),
+            {'django.db.backends': 'DEBUG', 'myapp': 'WARNING'},
+        )
+        self.assertEqual(parse_levels(''), {})
+
+    def test_parse_levels_invalid(self):
+        """Pairs without a known level are rejected."""
+        for value in ('myapp', 'myapp=LOUD'):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                parse_levels(value)
+
+    def test_sql_not_logged_by_default(self):
+        """SQL statements are not logged unless asked for."""
+        self.assertEqual(settings.LOGGING['loggers']['django.db.backends']['level'], 'WARNING')
+        self.assertFalse(logging.getLogger('django.db.backends').isEnabledFor(logging.DEBUG))
+
+
+class ApplicationLoggingTests(TestCase):
+    def test_logins_logged(self):
+        """Logins are logged to the myapp logger."""
+        User.objects.create_user(username='testuser', password='12345')
+        with self.assertLogs('myapp', level='INFO') as logs:
+            self.client.post(reverse('login'), {'username': 'testuser', 'password': '12345'})
+        self.assertEqual(logs.records[0].getMessage(), 'User testuser logged in from IP address 127.0.0.1.')
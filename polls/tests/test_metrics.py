@@ -0,0 +1,118 @@
+import json
+import os
+import tempfile
+import time
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from .. import metrics
+from ..models import Question, Choice
+from ..signals import logins_total
+from ..voting import cast_vote, votes_total
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        """Set up a user, a question with choices and empty metrics."""
+        cache.clear()
+        for metric in metrics.REGISTRY.values():
+            metric.reset()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.question = Question.objects.create(question_text='Counted question', pub_date=timezone.now())
+        self.choice1 = Choice.objects.create(question=self.question, choice_text='Choice 1')
+        self.choice2 = Choice.objects.create(question=self.question, choice_text='Choice 2')
+
+    def test_votes_counted_by_kind(self):
+        """First votes count as cast, later ones as changed, and only once committed."""
+        with self.captureOnCommitCallbacks(execute=True):
+            cast_vote(self.user, self.question, self.choice1)
+            self.assertEqual(votes_total.samples(), {})
+        with self.captureOnCommitCallbacks(execute=True):
+            cast_vote(self.user, self.question, self.choice2)
+        with self.captureOnCommitCallbacks(execute=True):
+            cast_vote(self.user, self.question, self.choice2)
+        question = str(self.question.id)
+        self.assertEqual(votes_total.samples(), {(question, 'cast'): 1, (question, 'changed'): 1})
+
+    def test_logins_counted_by_result(self):
+        """Successful and failed logins are counted apart."""
+        self.client.post(reverse('login'), {'username': 'testuser', 'password': 'wrong'})
+        self.client.post(reverse('login'), {'username': 'testuser', 'password': '12345'})
+        self.assertEqual(logins_total.samples(), {('success',): 1, ('failure',): 1})
+
+    def test_metrics_endpoint(self):
+        """/metrics serves the counters and histograms as Prometheus text."""
+        with self.captureOnCommitCallbacks(execute=True):
+            cast_vote(self.user, self.question, self.choice1)
+        self.client.get(reverse('polls:index'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+        self.assertIn('# TYPE polls_votes_total counter', text)
+        self.assertIn(f'polls_votes_total{{question="{self.question.id}",kind="cast"}} 1', text)
+        self.assertIn('polls_request_duration_seconds_count{view="polls:index"} 1', text)
+
+    @override_settings(POLLS_METRICS_TOKEN='secret')
+    def test_metrics_token(self):
+        """With a token set, scrapes must send it as a bearer token."""
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+
+    def test_processes_are_merged(self):
+        """Counts flushed by other worker processes are added to this one's."""
+        with tempfile.TemporaryDirectory() as directory, override_settings(POLLS_METRICS_DIR=directory):
+            votes_total.inc(('1', 'cast'), 2)
+            metrics.flush()
+            self.assertEqual(len(os.listdir(directory)), 1)
+            with open(os.path.join(directory, 'metrics-other.json'), 'w') as file:
+                json.dump({
+                    'polls_votes_total': [[['1', 'cast'], 3], [['2', 'changed'], 1]],
+                    'polls_request_queries': [[['polls:index'], [[0] * 10 + [1], 1, 55]]],
+                    'polls_unknown_total': [[[], 7]],
+                }, file)
+            with open(os.path.join(directory, 'metrics-broken.json'), 'w') as file:
+                file.write('{')
+            votes_total.inc(('1', 'cast'))
+
+            merged = metrics.collect()
+        self.assertEqual(merged['polls_votes_total'], {('1', 'cast'): 6, ('2', 'changed'): 1})
+        self.assertEqual(merged['polls_request_queries'][('polls:index',)], [[0] * 10 + [1], 1, 55])
+        self.assertNotIn('polls_unknown_total', merged)
+        text = metrics.render(merged)
+        self.assertIn('polls_request_queries_bucket{view="polls:index",le="89"} 1', text)
+        self.assertIn('polls_request_queries_bucket{view="polls:index",le="+Inf"} 1', text)
+
+    def test_flush_interval(self):
+        """maybe_flush() writes at most once per interval."""
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(POLLS_METRICS_DIR=directory, POLLS_METRICS_FLUSH_INTERVAL=3600):
+            metrics.flush()
+            path = os.path.join(directory, os.listdir(directory)[0])
+            votes_total.inc(('1', 'cast'))
+            metrics.maybe_flush()
+            with open(path) as file:
+                self.assertEqual(json.load(file)['polls_votes_total'], [])
+
+    def test_flusher_thread(self):
+        """The flushing thread writes counts without further events, and stopping it flushes once more."""
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(POLLS_METRICS_DIR=directory, POLLS_METRICS_FLUSH_INTERVAL=0.01):
+            votes_total.inc(('1', 'cast'))
+            thread = metrics.start_flusher()
+            self.assertIs(metrics.start_flusher(), thread)
+            for _ in range(500):
+                if os.listdir(directory):
+                    break
+                time.sleep(0.01)
+            votes_total.inc(('1', 'cast'))
+            metrics.stop_flusher()
+            self.assertFalse(thread.is_alive())
+            [filename] = os.listdir(directory)
+            with open(os.path.join(directory, filename)) as file:
+                self.assertEqual(json.load(file)['polls_votes_total'], [[['1', 'cast'], 2]])
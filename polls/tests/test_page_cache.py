@@ -0,0 +1,107 @@
+import datetime
+from django.contrib.auth.models import User
+from django.db import connection
+from django.core.cache import cache
+from django.test import TestCase, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from ..models import Question, Choice
+from ..views import DetailView, IndexView
+
+
+class AnonymousPageCacheTests(TestCase):
+    def setUp(self):
+        """Set up a published question with a choice and an empty cache."""
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.question = Question.objects.create(
+            question_text='Cached question', pub_date=timezone.now() - datetime.timedelta(days=1)
+        )
+        self.choice = Choice.objects.create(question=self.question, choice_text='Choice 1')
+
+    def test_anonymous_pages_served_from_cache(self):
+        """Repeated anonymous requests are answered without any query."""
+        for url in (reverse('polls:index'),
+                    reverse('polls:detail', args=[self.question.id]),
+                    reverse('polls:results', args=[self.question.id])):
+            first = self.client.get(url)
+            with self.assertNumQueries(0):
+                second = self.client.get(url)
+            self.assertEqual(first.content, second.content)
+
+    def test_authenticated_pages_not_cached(self):
+        """Pages for logged-in users are always rendered."""
+        self.client.login(username='testuser', password='12345')
+        url = reverse('polls:index')
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertIsNotNone(response.context)
+        self.assertContains(response, 'Welcome back, testuser!')
+
+    def test_anonymous_detail_has_no_csrf_token(self):
+        """The anonymous detail page embeds no CSRF token, so it can be shared."""
+        response = self.client.get(reverse('polls:detail', args=[self.question.id]))
+        self.assertNotContains(response, 'csrfmiddlewaretoken')
+        self.assertContains(response, 'Log in to vote')
+
+    def test_question_change_invalidates_pages(self):
+        """Editing a question drops the cached index and detail pages."""
+        self.client.get(reverse('polls:index'))
+        self.client.get(reverse('polls:detail', args=[self.question.id]))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.question.question_text = 'Renamed question'
+            self.question.save()
+        self.assertContains(self.client.get(reverse('polls:index')), 'Renamed question')
+        self.assertContains(self.client.get(reverse('polls:detail', args=[self.question.id])), 'Renamed question')
+
+    def test_vote_invalidates_results_page(self):
+        """A vote drops the cached results page of its question."""
+        url = reverse('polls:results', args=[self.question.id])
+        self.assertContains(self.client.get(url), 'Total votes: 0')
+        self.client.login(username='testuser', password='12345')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('polls:vote', args=[self.question.id]), {'choice': self.choice.id})
+        self.client.logout()
+        self.assertContains(self.client.get(url), 'Total votes: 1')
+
+    def test_messages_are_not_cached(self):
+        """A page showing a visitor's message is neither served from nor stored in the cache."""
+        closed = Question.objects.create(
+            question_text='Closed question',
+            pub_date=timezone.now() - datetime.timedelta(days=2),
+            end_date=timezone.now() - datetime.timedelta(days=1),
+        )
+        self.client.get(reverse('polls:index'))
+        response = self.client.get(reverse('polls:detail', args=[closed.id]), follow=True)
+        self.assertContains(response, 'This poll is closed.')
+        self.assertNotContains(self.client.get(reverse('polls:index')), 'This poll is closed.')
+
+    def test_index_timeout_capped_at_next_publication(self):
+        """The index expires when the next question is published."""
+        Question.objects.create(question_text='Soon', pub_date=timezone.now() + datetime.timedelta(seconds=30))
+        view = IndexView()
+        view.request = RequestFactory().get(reverse('polls:index'))
+        self.assertTrue(0 < view.get_page_cache_timeout() <= 30)
+
+    def test_detail_timeout_capped_at_end_date(self):
+        """A detail page expires when its question closes."""
+        self.question.end_date = timezone.now() + datetime.timedelta(seconds=10)
+        self.question.save()
+        view = DetailView()
+        view.object = self.question
+        self.assertTrue(0 < view.get_page_cache_timeout() <= 10)
+
+    def test_pages_cached_per_vary_header_values(self):
+        """Pages name the headers they vary on and are cached once per value of those headers."""
+        url = reverse('polls:index')
+        response = self.client.get(url)
+        self.assertIn('Cookie', response['Vary'])
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        self.client.cookies['theme'] = 'dark'
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertGreater(len(queries), 0)
+        with self.assertNumQueries(0):
+            self.client.get(url)
@@ -0,0 +1,107 @@
+import datetime
+from django.contrib.auth.models import User
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from ..models import Question, Choice, Vote
+from .query_budget import query_budget
+
+# Numbers of questions, choices per question and voters to check each view with
+DATA_SIZES = (2, 10, 40)
+
+# Every cache misses, so the budgets cover the work done on a cold cache.
+NO_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+# Most queries, and most seconds spent in them, each request may use at any data size.
+# Logged-in requests include loading the session and the user.
+BUDGETS = {
+    'index': (3, 0.5),
+    'index_logged_in': (5, 0.5),
+    'detail': (3, 0.5),
+    'detail_logged_in': (6, 0.5),
+    'results': (3, 0.5),
+    'results_logged_in': (6, 0.5),
+    'vote': (10, 0.5),
+    'signup_form': (0, 0.5),
+    'signup': (12, 0.5),
+}
+
+
+@override_settings(CACHES=NO_CACHES)
+class QueryBudgetTests(TestCase):
+    def populate(self, size):
+        """
+        Create ``size`` open questions with ``size`` choices each, voted on by ``size`` users.
+
+        Returns:
+            tuple: A question with choices and one of the voters.
+        """
+        Question.objects.all().delete()
+        User.objects.all().delete()
+        now = timezone.now()
+        users = User.objects.bulk_create(User(username=f'voter{n}') for n in range(size))
+        questions = Question.objects.bulk_create(
+            Question(question_text=f'Question {n}', pub_date=now - datetime.timedelta(hours=n + 1))
+            for n in range(size)
+        )
+        choices = Choice.objects.bulk_create(
+            Choice(question=question, choice_text=f'Choice {n}', votes=size if n == 0 else 0)
+            for question in questions for n in range(size)
+        )
+        Vote.objects.bulk_create(
+            Vote(user=user, question=choice.question, choice=choice)
+            for choice in choices if choice.votes for user in users
+        )
+        return questions[0], users[0]
+
+    def requests(self, question, user):
+        """Return each measured request as a (name, client, method, path, data) tuple."""
+        anonymous = Client()
+        logged_in = Client()
+        logged_in.force_login(user)
+        other_choice = question.choice_set.order_by('-pk').first()
+        return [
+            ('index', anonymous, 'get', reverse('polls:index'), None),
+            ('index_logged_in', logged_in, 'get', reverse('polls:index'), None),
+            ('detail', anonymous, 'get', reverse('polls:detail', args=[question.pk]), None),
+            ('detail_logged_in', logged_in, 'get', reverse('polls:detail', args=[question.pk]), None),
+            ('results', anonymous, 'get', reverse('polls:results', args=[question.pk]), None),
+            ('results_logged_in', logged_in, 'get', reverse('polls:results', args=[question.pk]), None),
+            ('vote', logged_in, 'post', reverse('polls:vote', args=[question.pk]), {'choice': other_choice.pk}),
+            ('signup_form', Client(), 'get', reverse('signup'), None),
+            ('signup', Client(), 'post', reverse('signup'), {
+                'username': 'newuser', 'password1': 'a-long-Passw0rd', 'password2': 'a-long-Passw0rd',
+            }),
+        ]
+
+    def test_views_stay_within_budget(self):
+        """Every view stays within its query budget and uses as many queries at every data size."""
+        counts = {}
+        for size in DATA_SIZES:
+            question, user = self.populate(size)
+            for name, client, method, path, data in self.requests(question, user):
+                with self.subTest(view=name, size=size), query_budget(*BUDGETS[name]) as budget:
+                    getattr(client, method)(path, data)
+                counts.setdefault(name, {})[size] = budget.count
+        for name, by_size in counts.items():
+            with self.subTest(view=name):
+                self.assertEqual(len(set(by_size.values())), 1, f"{name} queries grow with the data: {by_size}")
+
+
+class QueryBudgetHelperTests(TestCase):
+    def test_over_budget_fails(self):
+        """Running more queries than the budget allows fails with the captured queries."""
+        with self.assertRaisesMessage(AssertionError, '2 queries executed, the budget is 1.'):
+            with query_budget(1):
+                list(Question.objects.all())
+                list(Choice.objects.all())
+
+    def test_decorator_counts_queries(self):
+        """The budget also works as a decorator."""
+        @query_budget(1)
+        def load_questions():
+            return list(Question.objects.all())
+
+        load_questions()
+        with self.assertRaises(AssertionError):
+            query_budget(0)(load_questions)()
@@ -0,0 +1,197 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from .. import metrics
+from ..middleware import rate_limited_total
+from ..models import Question, Choice, Vote
+from ..ratelimit import CacheStore, MemoryStore, Rate, check, parse_rate
+
+
+class FakeClock:
+    """A clock that only moves when told to."""
+
+    def __init__(self, now=1000.0):
+        """Start the clock at ``now`` seconds."""
+        self.now = now
+
+    def __call__(self):
+        """Return the current time."""
+        return self.now
+
+    def advance(self, seconds):
+        """Move the clock forward."""
+        self.now += seconds
+
+
+class ParseRateTests(SimpleTestCase):
+    def test_rates(self):
+        """Rates are a count per second, minute, hour or day."""
+        self.assertEqual(parse_rate('10/m'), Rate(10, 60))
+        self.assertEqual(parse_rate('5/H'), Rate(5, 3600))
+        self.assertIsNone(parse_rate(''))
+        for value in ('10', '10/w', 'x/m', '0/s'):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                parse_rate(value)
+
+
+class MemoryStoreTests(SimpleTestCase):
+    def setUp(self):
+        """Set up a store on a fake clock."""
+        self.clock = FakeClock()
+        self.store = MemoryStore(clock=self.clock, max_keys=2)
+        self.rate = Rate(3, 60)
+
+    def test_token_bucket(self):
+        """A burst of the limit is allowed, then one request per refilled token."""
+        self.assertEqual([self.store.hit('a', self.rate) for _ in range(3)], [0, 0, 0])
+        self.assertEqual(self.store.hit('a', self.rate), 20)
+        self.assertEqual(self.store.hit('b', self.rate), 0)
+        self.clock.advance(20)
+        self.assertEqual(self.store.hit('a', self.rate), 0)
+        self.assertGreater(self.store.hit('a', self.rate), 0)
+
+    def test_full_buckets_pruned(self):
+        """Buckets that have refilled are dropped once there are too many."""
+        self.store.hit('a', self.rate)
+        self.store.hit('b', self.rate)
+        self.clock.advance(60)
+        self.store.hit('c', self.rate)
+        self.assertEqual(set(self.store._buckets), {'c'})
+
+    def test_least_recently_used_evicted(self):
+        """Past max_keys the least recently used bucket is dropped, even if it is not full."""
+        self.store.hit('a', self.rate)
+        self.store.hit('b', self.rate)
+        self.store.hit('a', self.rate)
+        self.store.hit('c', self.rate)
+        self.assertEqual(list(self.store._buckets), ['a', 'c'])
+
+
+class CacheStoreTests(SimpleTestCase):
+    def setUp(self):
+        """Set up a store on a fake clock at the start of a window, with an empty cache."""
+        cache.clear()
+        self.clock = FakeClock(now=6000.0)
+        self.store = CacheStore(clock=self.clock)
+        self.rate = Rate(3, 60)
+
+    def test_sliding_window(self):
+        """The previous window counts for the part the sliding window still covers."""
+        self.assertEqual([self.store.hit('a', self.rate) for _ in range(3)], [0, 0, 0])
+        self.clock.advance(15)
+        self.assertEqual(self.store.hit('a', self.rate), 45)
+
+        self.clock.advance(75)
+        self.assertEqual(self.store.hit('a', self.rate), 0)
+        self.assertAlmostEqual(self.store.hit('a', self.rate), 10)
+        self.clock.advance(10)
+        self.assertEqual(self.store.hit('a', self.rate), 0)
+
+    def test_shared_between_stores(self):
+        """Stores on the same cache, as in different workers, share the counts."""
+        other = CacheStore(clock=self.clock)
+        self.assertEqual(self.store.hit('a', Rate(1, 60)), 0)
+        self.assertGreater(other.hit('a', Rate(1, 60)), 0)
+
+
+@override_settings(POLLS_RATE_LIMITS={'vote': {'ip': '2/m', 'user': '1/m'}})
+class CheckTests(SimpleTestCase):
+    def test_stops_at_first_key_over_its_rate(self):
+        """A request rejected by its IP does not use up the rate of its user."""
+        store = MemoryStore(clock=FakeClock())
+        self.assertIsNone(check('vote', {'ip': '10.0.0.1', 'user': 1}, store))
+        self.assertEqual(check('vote', {'ip': '10.0.0.1', 'user': 1}, store), ('user', 60))
+        self.assertEqual(check('vote', {'ip': '10.0.0.1', 'user': 2}, store), ('ip', 30))
+        self.assertIsNone(check('vote', {'ip': '10.0.0.2', 'user': 2}, store))
+        self.assertIsNone(check('signup', {'ip': '10.0.0.1'}, store))
+
+
+    @override_settings(POLLS_RATE_LIMITS={'login': {'ip': '1/m', 'user': '1/m'}})
+    def test_keys_are_digests(self):
+        """Submitted values never reach the store as they were typed."""
+        store = MemoryStore(clock=FakeClock())
+        check('login', {'ip': '10.0.0.1', 'user': 'Robert\'); DROP TABLE'}, store)
+        self.assertEqual(len(store._buckets), 2)
+        for key in store._buckets:
+            self.assertRegex(key, r'^login:(ip|user):[0-9a-f]{64}$')
+
+
+class RateLimitMiddlewareTests(TestCase):
+    def setUp(self):
+        """Set up two users, a question with a choice, an empty cache and empty metrics."""
+        cache.clear()
+        for metric in metrics.REGISTRY.values():
+            metric.reset()
+        User.objects.create_user(username='testuser', password='12345')
+        User.objects.create_user(username='otheruser', password='12345')
+        self.question = Question.objects.create(question_text='Test Question', pub_date=timezone.now())
+        self.choice = Choice.objects.create(question=self.question, choice_text='Choice 1')
+
+    @override_settings(POLLS_RATE_LIMITS={'login': {'ip': '2/m', 'user': ''}})
+    def test_login_limited_by_ip_without_queries(self):
+        """Logins over the IP rate get a 429 before any query."""
+        url = reverse('login')
+        for _ in range(2):
+            self.client.post(url, {'username': 'testuser', 'password': 'wrong'})
+        with self.assertNumQueries(0):
+            response = self.client.post(url, {'username': 'testuser', 'password': '12345'})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn(int(response['Retry-After']), range(1, 61))
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(rate_limited_total.samples(), {('login', 'ip'): 1})
+
+    @override_settings(POLLS_RATE_LIMITS={'login': {'user': '2/m'}})
+    def test_login_limited_by_username(self):
+        """Attempts on one username are limited whatever the IP."""
+        url = reverse('login')
+        for n in range(2):
+            self.client.post(url, {'username': 'testuser', 'password': 'wrong'}, REMOTE_ADDR=f'10.0.0.{n}')
+        response = self.client.post(url, {'username': 'testuser', 'password': '12345'}, REMOTE_ADDR='10.0.0.9')
+        self.assertEqual(response.status_code, 429)
+        response = self.client.post(url, {'username': 'otheruser', 'password': '12345'})
+        self.assertEqual(response.status_code, 302)
+
+    @override_settings(POLLS_RATE_LIMITS={'vote': {'user': '1/m'}})
+    def test_votes_limited_by_user(self):
+        """A user over the vote rate gets a 429 and the vote is not written."""
+        url = reverse('polls:vote', args=[self.question.id])
+        self.client.login(username='testuser', password='12345')
+        self.assertEqual(self.client.post(url, {'choice': self.choice.id}).status_code, 302)
+        self.assertEqual(self.client.post(url, {'choice': self.choice.id}).status_code, 429)
+        self.client.login(username='otheruser', password='12345')
+        self.assertEqual(self.client.post(url, {'choice': self.choice.id}).status_code, 302)
+        self.assertEqual(Vote.objects.count(), 2)
+
+    @override_settings(POLLS_RATE_LIMITS={'signup': {'ip': '1/h'}})
+    def test_signup_limited_by_ip(self):
+        """Sign-ups over the IP rate get a 429, but the form still shows."""
+        url = reverse('signup')
+        self.client.post(url, {'username': 'newuser', 'password1': 'Secret-pass-123', 'password2': 'Secret-pass-123'})
+        self.client.logout()
+        response = self.client.post(url, {'username': 'another', 'password1': 'Secret-pass-123',
+                                          'password2': 'Secret-pass-123'})
+        self.assertEqual(response.status_code, 429)
+        self.assertFalse(User.objects.filter(username='another').exists())
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    @override_settings(POLLS_RATE_LIMITS={'login': {'ip': '1/m'}})
+    def test_forged_forwarded_for_ignored(self):
+        """Without trusted proxies, a client cannot pick its IP with X-Forwarded-For."""
+        url = reverse('login')
+        self.client.post(url, {'username': 'testuser', 'password': 'wrong'}, HTTP_X_FORWARDED_FOR='10.0.0.1')
+        response = self.client.post(url, {'username': 'testuser', 'password': 'wrong'},
+                                    HTTP_X_FORWARDED_FOR='10.0.0.2')
+        self.assertEqual(response.status_code, 429)
+
+    @override_settings(POLLS_RATE_LIMITS={'login': {'ip': '1/m'}}, POLLS_TRUSTED_PROXIES=1)
+    def test_forwarded_for_read_behind_trusted_proxy(self):
+        """Behind a proxy, the IP is the entry it appended, whatever the client prepended."""
+        url = reverse('login')
+        self.client.post(url, {'username': 'testuser', 'password': 'wrong'}, HTTP_X_FORWARDED_FOR='1.1.1.1, 10.0.0.1')
+        response = self.client.post(url, {'username': 'testuser', 'password': 'wrong'},
+                                    HTTP_X_FORWARDED_FOR='2.2.2.2, 10.0.0.1')
+        self.assertEqual(response.status_code, 429)
+        response = self.client.post(url, {'username': 'testuser', 'password': 'wrong'}, HTTP_X_FORWARDED_FOR='10.0.0.2')
+        self.assertNotEqual(response.status_code, 429)
@@ -0,0 +1,68 @@
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from ..models import Question, Choice
+from ..results import get_results
+
+
+class ResultsServiceTests(TestCase):
+    def setUp(self):
+        """Set up a question with two choices."""
+        cache.clear()
+        self.question = Question.objects.create(question_text='Test Question', pub_date=timezone.now())
+        self.choice1 = Choice.objects.create(question=self.question, choice_text='Choice 1', votes=3)
+        self.choice2 = Choice.objects.create(question=self.question, choice_text='Choice 2', votes=1)
+
+    def test_totals_and_percentages(self):
+        """get_results sums the votes and computes each choice's share."""
+        results = get_results(self.question)
+        self.assertEqual(results.total_votes, 4)
+        self.assertEqual([c.votes for c in results.choices], [3, 1])
+        self.assertEqual([c.percentage for c in results.choices], [75.0, 25.0])
+
+    def test_no_votes(self):
+        """A question without votes reports zero percent for every choice."""
+        Choice.objects.filter(question=self.question).update(votes=0)
+        results = get_results(self.question.pk)
+        self.assertEqual(results.total_votes, 0)
+        self.assertEqual([c.percentage for c in results.choices], [0.0, 0.0])
+
+    def test_as_dict(self):
+        """as_dict returns plain data for JSON responses."""
+        data = get_results(self.question).as_dict()
+        self.assertEqual(data['question'], self.question.pk)
+        self.assertEqual(data['total_votes'], 4)
+        self.assertEqual(data['choices'][0], {
+            'id': self.choice1.pk, 'choice_text': 'Choice 1', 'votes': 3, 'percentage': 75.0,
+        })
+
+    def test_single_query_regardless_of_choices(self):
+        """get_results runs one query no matter how many choices exist."""
+        with self.assertNumQueries(1):
+            get_results(self.question)
+        for i in range(20):
+            Choice.objects.create(question=self.question, choice_text=f'Extra {i}')
+        with self.assertNumQueries(1):
+            get_results(self.question)
+
+    def test_results_view_query_count_is_constant(self):
+        """The results page query count does not grow with the number of choices."""
+        url = reverse('polls:results', args=[self.question.id])
+        with self.assertNumQueries(3):
+            self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(20):
+                Choice.objects.create(question=self.question, choice_text=f'Extra {i}')
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertContains(response, 'Choice 1: <strong>3</strong> votes (75.0%)', html=False)
+        self.assertContains(response, 'Total votes: 4')
+
+    def test_template_tag(self):
+        """The question_results tag exposes the results to any template."""
+        template = Template(
+            '{% load poll_results %}{% question_results question as results %}{{ results.total_votes }}'
+        )
+        self.assertEqual(template.render(Context({'question': self.question})), '4')
@@ -0,0 +1,87 @@
+import datetime
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from mysite.database import parse_database_url
+from ..models import Question
+from ..routers import ReplicaRouter, read_from_primary, read_from_replica, reads_from_replica
+
+REPLICA_DATABASES = {
+    'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+    'replica': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+}
+
+
+class DatabaseUrlTests(SimpleTestCase):
+    def test_sqlite_urls(self):
+        """SQLite URLs give the file name, or :memory:."""
+        self.assertEqual(parse_database_url('sqlite://:memory:')['NAME'], ':memory:')
+        self.assertEqual(parse_database_url('sqlite:///db.sqlite3')['NAME'], 'db.sqlite3')
+        self.assertEqual(parse_database_url('sqlite:////var/db.sqlite3')['NAME'], '/var/db.sqlite3')
+
+    def test_postgres_url(self):
+        """PostgreSQL URLs give the credentials, host, port and options."""
+        database = parse_database_url('postgres://admin:p%40ss@db:5432/pollsdb?sslmode=require')
+        self.assertEqual(database, {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': 'pollsdb',
+            'USER': 'admin',
+            'PASSWORD': 'p@ss',
+            'HOST': 'db',
+            'PORT': '5432',
+            'OPTIONS': {'sslmode': 'require'},
+        })
+
+    def test_unsupported_scheme(self):
+        """Unknown schemes are rejected."""
+        with self.assertRaises(ValueError):
+            parse_database_url('mysql://localhost/polls')
+
+
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        """Set up the router."""
+        self.router = ReplicaRouter()
+
+    @override_settings(DATABASES={'default': REPLICA_DATABASES['default']})
+    def test_without_replica(self):
+        """Without a replica the router leaves every read alone."""
+        with read_from_replica():
+            self.assertIsNone(self.router.db_for_read(Question))
+
+    @override_settings(DATABASES=REPLICA_DATABASES)
+    def test_marked_reads_go_to_replica(self):
+        """Only reads inside read_from_replica() go to the replica, and never writes."""
+        self.assertIsNone(self.router.db_for_read(Question))
+        with read_from_replica():
+            self.assertEqual(self.router.db_for_read(Question), 'replica')
+            self.assertEqual(self.router.db_for_write(Question), 'default')
+            with read_from_primary():
+                self.assertIsNone(self.router.db_for_read(Question))
+        self.assertIsNone(self.router.db_for_read(Question))
+
+    @override_settings(DATABASES=REPLICA_DATABASES)
+    def test_decorated_view_reads_from_replica(self):
+        """A decorated view runs with its reads routed to the replica."""
+        view = reads_from_replica(lambda: self.router.db_for_read(Question))
+        self.assertEqual(view(), 'replica')
+
+    def test_replica_is_not_migrated(self):
+        """Migrations never run on the replica."""
+        self.assertFalse(self.router.allow_migrate('replica', 'polls'))
+        self.assertIsNone(self.router.allow_migrate('default', 'polls'))
+
+
+class ReplicaViewTests(TestCase):
+    def setUp(self):
+        """Set up a published question and an empty cache."""
+        cache.clear()
+        self.question = Question.objects.create(
+            question_text='Replica question', pub_date=timezone.now() - datetime.timedelta(days=1)
+        )
+
+    def test_views_work_without_replica(self):
+        """The replica-reading views work on a single database."""
+        self.assertContains(self.client.get(reverse('polls:index')), 'Replica question')
+        self.assertContains(self.client.get(reverse('polls:results', args=[self.question.id])), 'Replica question')
@@ -0,0 +1,133 @@
+import datetime
+from io import StringIO
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from ..models import Question, Choice
+from ..sessions import SessionStore, prune_sessions
+
+
+class SessionQueryTests(TestCase):
+    def setUp(self):
+        """Set up a user and a published question with a choice."""
+        cache.clear()
+        User.objects.create_user(username='testuser', password='12345')
+        self.question = Question.objects.create(
+            question_text='Test Question', pub_date=timezone.now() - datetime.timedelta(days=1)
+        )
+        Choice.objects.create(question=self.question, choice_text='Choice 1')
+        self.urls = [
+            reverse('polls:index'),
+            reverse('polls:detail', args=[self.question.id]),
+            reverse('polls:results', args=[self.question.id]),
+        ]
+
+    def queries_of(self, table, url, **headers):
+        """Return the response to a GET of url and how many queries it ran on a table."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, **headers)
+        return response, sum(f'"{table}"' in query['sql'] for query in queries.captured_queries)
+
+    def test_anonymous_pages_run_no_session_queries(self):
+        """Anonymous page views never read the session or user tables."""
+        for url in self.urls:
+            for table in ('django_session', 'auth_user'):
+                with self.subTest(url=url, table=table):
+                    self.assertEqual(self.queries_of(table, url)[1], 0)
+
+    def test_not_modified_without_loading_the_user(self):
+        """A logged-in user's 304 reads the user id from the session only."""
+        self.client.login(username='testuser', password='12345')
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.client.get(url).headers['ETag']
+                response, count = self.queries_of('auth_user', url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(count, 0)
+
+    @override_settings(SESSION_ENGINE='polls.sessions')
+    def test_cached_db_sessions_log_in(self):
+        """Logged-in users are served from cached database sessions."""
+        self.client.login(username='testuser', password='12345')
+        self.assertContains(self.client.get(reverse('polls:index')), 'Welcome back, testuser!')
+        count = self.queries_of('django_session', reverse('polls:index'))[1]
+        self.assertEqual(count, 0)
+
+
+@override_settings(SESSION_ENGINE='polls.sessions')
+class WriteBackSessionTests(TestCase):
+    def setUp(self):
+        """Start with an empty cache."""
+        cache.clear()
+
+    def stored_value(self, session):
+        """Return the value of 'a' stored in the database for a session."""
+        return Session.objects.get(pk=session.session_key).get_decoded()['a']
+
+    @override_settings(POLLS_SESSION_WRITE_INTERVAL=60)
+    def test_changes_written_back_once_per_interval(self):
+        """Within the interval changes only reach the cache, then the next one is written."""
+        session = SessionStore()
+        for value in (1, 2, 3):
+            session['a'] = value
+            session.save()
+        self.assertEqual(self.stored_value(session), 2)
+        self.assertEqual(SessionStore(session.session_key)['a'], 3)
+
+        cache.delete(session._written_key(session.session_key))
+        session['a'] = 4
+        session.save()
+        self.assertEqual(self.stored_value(session), 4)
+
+    def test_written_through_by_default(self):
+        """Without an interval every change is written to the database."""
+        session = SessionStore()
+        for value in (1, 2, 3):
+            session['a'] = value
+            session.save()
+        self.assertEqual(self.stored_value(session), 3)
+
+    @override_settings(POLLS_SESSION_WRITE_INTERVAL=60)
+    def test_delete_reaches_the_database(self):
+        """Deleting a session removes it from the database and the cache."""
+        session = SessionStore()
+        session['a'] = 1
+        session.save()
+        session.save()
+        session.delete()
+        self.assertFalse(Session.objects.exists())
+        self.assertIsNone(cache.get(session._written_key(session.session_key)))
+
+
+class PruneSessionsTests(TestCase):
+    def setUp(self):
+        """Set up five expired sessions and a live one."""
+        now = timezone.now()
+        for n in range(5):
+            Session.objects.create(session_key=f'expired{n}', session_data='', expire_date=now - datetime.timedelta(days=1))
+        Session.objects.create(session_key='live', session_data='', expire_date=now + datetime.timedelta(days=1))
+
+    def test_prunes_in_batches(self):
+        """Expired sessions are deleted a batch at a time and live ones kept."""
+        batches = []
+        self.assertEqual(prune_sessions(batch_size=2, log=batches.append), 5)
+        self.assertEqual(len(batches), 3)
+        self.assertEqual(list(Session.objects.values_list('pk', flat=True)), ['live'])
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_engines_without_table(self):
+        """Nothing is pruned when sessions are not kept in the database."""
+        self.assertIsNone(prune_sessions())
+        self.assertEqual(Session.objects.count(), 6)
+
+    def test_command(self):
+        """prune_sessions wraps the prune function."""
+        output = StringIO()
+        call_command('prune_sessions', '--batch-size', '10', stdout=output)
+        self.assertIn('Deleted 5 expired sessions.', output.getvalue())
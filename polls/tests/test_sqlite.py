@@ -0,0 +1,76 @@
+import datetime
+import io
+import re
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from ..apps import apply_sqlite_pragmas
+from ..models import Question, Choice
+from ..voting import cast_vote
+
+
+class SqlitePragmaTests(TestCase):
+    def test_pragmas_applied_to_connection(self):
+        """New connections get the synchronous level and busy timeout of the profile."""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+
+    def test_pragmas_follow_settings(self):
+        """The pragmas come from the POLLS_SQLITE_PRAGMAS setting."""
+        with override_settings(POLLS_SQLITE_PRAGMAS={'busy_timeout': 1234}):
+            apply_sqlite_pragmas(sender=None, connection=connection)
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 1234)
+            cursor.execute('PRAGMA busy_timeout = 5000')
+
+
+class ImmediateVoteTransactionTests(TransactionTestCase):
+    def setUp(self):
+        """Set up a user and an open question with a choice."""
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.question = Question.objects.create(
+            question_text='Locking question', pub_date=timezone.now() - datetime.timedelta(days=1)
+        )
+        self.choice = Choice.objects.create(question=self.question, choice_text='Choice 1')
+
+    def test_vote_transaction_begins_immediate(self):
+        """A vote takes the write lock when its transaction begins."""
+        with CaptureQueriesContext(connection) as queries:
+            cast_vote(self.user, self.question, self.choice)
+        self.assertEqual(queries.captured_queries[0]['sql'], 'BEGIN IMMEDIATE')
+        self.assertIsNone(connection.transaction_mode)
+
+    @override_settings(POLLS_SQLITE_IMMEDIATE_WRITES=False)
+    def test_immediate_writes_can_be_disabled(self):
+        """Without the setting the vote transaction is deferred."""
+        with CaptureQueriesContext(connection) as queries:
+            cast_vote(self.user, self.question, self.choice)
+        self.assertNotIn('BEGIN IMMEDIATE', [query['sql'] for query in queries.captured_queries])
+
+
+class StressVotesTests(TransactionTestCase):
+    def test_tuned_profile_never_locks(self):
+        """Concurrent voters on the tuned profile wait for the write lock instead of failing."""
+        output = io.StringIO()
+        call_command('stress_votes', threads=6, votes=15, users=10, stdout=output)
+        tuned = re.search(r'^tuned .* (\d+) cast, (\d+) failed', output.getvalue(), re.MULTILINE)
+        self.assertEqual(tuned.groups(), ('90', '0'))
+
+    def test_real_database_untouched(self):
+        """Both profiles run on scratch copies, so the database keeps its rows and journal mode."""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+        call_command('stress_votes', threads=2, votes=2, users=2, stdout=io.StringIO())
+        self.assertFalse(Question.objects.exists())
+        self.assertFalse(User.objects.exists())
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], journal_mode)
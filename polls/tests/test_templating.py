@@ -0,0 +1,61 @@
+import datetime
+from django.conf import settings
+from django.core.cache import cache
+from django.template import engines
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from ..benchmark import TEMPLATE_MODES
+from ..models import Question, Choice
+from ..templating import minify, warm_templates
+
+
+def templates_with(loaders):
+    """Return the project's TEMPLATES setting with the given loaders."""
+    config = settings.TEMPLATES[0]
+    return [{**config, 'APP_DIRS': False, 'OPTIONS': {**config['OPTIONS'], 'loaders': loaders}}]
+
+
+class MinifyTests(SimpleTestCase):
+    def test_strips_indentation_blank_lines_and_comments(self):
+        """Indentation, blank lines and HTML comments go; line breaks and tags stay."""
+        source = '<!-- a comment -->\n<ul>\n\n    {% for x in xs %}\n        <li>{{ x }}</li>\n    {% endfor %}\n</ul>\n'
+        self.assertEqual(minify(source), '<ul>\n{% for x in xs %}\n<li>{{ x }}</li>\n{% endfor %}\n</ul>')
+
+
+class WarmTemplatesTests(SimpleTestCase):
+    @override_settings(TEMPLATES=templates_with(TEMPLATE_MODES['cached']))
+    def test_cached_loader_is_filled(self):
+        """Every template of the project and the polls app is compiled into the cached loader."""
+        self.assertGreaterEqual(warm_templates(), 6)
+        cached = engines['django'].engine.template_loaders[0].get_template_cache
+        self.assertIn('polls/index.html', cached)
+        self.assertIn('registration/login.html', cached)
+
+    @override_settings(TEMPLATES=templates_with(TEMPLATE_MODES['uncached']))
+    def test_skipped_without_cached_loader(self):
+        """Nothing is compiled when the templates would not be kept."""
+        self.assertEqual(warm_templates(), 0)
+
+
+@override_settings(TEMPLATES=templates_with(TEMPLATE_MODES['minified']))
+class MinifiedPagesTests(TestCase):
+    def setUp(self):
+        """Set up a published question with a choice."""
+        cache.clear()
+        self.question = Question.objects.create(
+            question_text='Minified question', pub_date=timezone.now() - datetime.timedelta(days=1)
+        )
+        Choice.objects.create(question=self.question, choice_text='Choice 1')
+
+    def test_pages_render_minified(self):
+        """The poll pages keep their content without the indentation."""
+        for url in (
+            reverse('polls:index'),
+            reverse('polls:detail', args=[self.question.id]),
+            reverse('polls:results', args=[self.question.id]),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, 'Minified question')
+                self.assertNotIn('\n    <', response.content.decode().split('</head>')[1])
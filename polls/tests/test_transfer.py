@@ -0,0 +1,133 @@
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from .. import transfer
+from ..models import Question, Choice, Vote
+
+
+class TransferTests(TestCase):
+    def setUp(self):
+        """Set up two users, a question with choices and votes, and a scratch directory."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.alice = User.objects.create_user(username='alice', password='12345')
+        self.bob = User.objects.create_user(username='bob', password='12345')
+        self.question = Question.objects.create(question_text='Exported question', pub_date=timezone.now())
+        self.choice1 = Choice.objects.create(question=self.question, choice_text='Choice 1')
+        self.choice2 = Choice.objects.create(question=self.question, choice_text='Choice 2')
+        Vote.objects.create(user=self.alice, question=self.question, choice=self.choice1)
+        Vote.objects.create(user=self.bob, question=self.question, choice=self.choice2)
+
+    def path(self, name):
+        """Return a path in the scratch directory."""
+        return os.path.join(self.directory.name, name)
+
+    def test_round_trip(self):
+        """Exported archives import as copies with new keys, in every format."""
+        for name in ('polls.jsonl', 'polls.json', 'polls.csv', 'polls.jsonl.gz'):
+            with self.subTest(name=name):
+                path = self.path(name)
+                counts = transfer.export_records(path, chunk_size=1)
+                self.assertEqual(counts, {'auth.user': 2, 'polls.question': 1, 'polls.choice': 2, 'polls.vote': 2})
+
+                counts = transfer.import_records([path])
+                self.assertEqual(counts['auth.user'], {'created': 0, 'skipped': 2})
+                self.assertEqual(counts['polls.vote'], {'created': 2, 'skipped': 0})
+                copy = Question.objects.exclude(pk=self.question.pk).get()
+                self.assertEqual(copy.question_text, self.question.question_text)
+                self.assertEqual(copy.pub_date, self.question.pub_date)
+                self.assertEqual(
+                    sorted(copy.choice_set.values_list('choice_text', 'votes')), [('Choice 1', 1), ('Choice 2', 1)]
+                )
+                copy.delete()
+
+    def test_import_into_another_database(self):
+        """References are remapped when the keys of the archive are taken."""
+        path = self.path('polls.jsonl')
+        transfer.export_records(path)
+        Vote.objects.all().delete()
+        Question.objects.all().delete()
+        self.bob.delete()
+        Question.objects.create(question_text='Unrelated question', pub_date=timezone.now())
+
+        counts = transfer.import_records([path], batch_size=1)
+        self.assertEqual(counts['auth.user'], {'created': 1, 'skipped': 1})
+        question = Question.objects.get(question_text='Exported question')
+        votes = Vote.objects.filter(question=question).values_list('user__username', 'choice__choice_text')
+        self.assertEqual(sorted(votes), [('alice', 'Choice 1'), ('bob', 'Choice 2')])
+        self.assertTrue(User.objects.get(username='bob').check_password('12345'))
+
+    def test_fixtures(self):
+        """The fixtures in data/ import in the order users, polls, votes."""
+        Vote.objects.all().delete()
+        data = os.path.join(settings.BASE_DIR, 'data')
+        counts = transfer.import_records(
+            [os.path.join(data, name) for name in ('users.json', 'polls-v4.json', 'votes-v4.json')]
+        )
+        self.assertEqual(counts['polls.question']['created'], 5)
+        self.assertEqual(counts['polls.vote'], {'created': 11, 'skipped': 0})
+
+    def test_records_without_references_skipped(self):
+        """Records whose question, user or choice was not imported are skipped."""
+        path = self.path('orphans.jsonl')
+        with open(path, 'w') as file:
+            for record in (
+                {'model': 'polls.choice', 'pk': 1, 'fields': {'question': 99, 'choice_text': 'Orphan'}},
+                {'model': 'polls.vote', 'pk': 1, 'fields': {'user': 1, 'choice': 1}},
+                {'model': 'auth.group', 'pk': 1, 'fields': {'name': 'staff'}},
+            ):
+                file.write(json.dumps(record) + '\n')
+        counts = transfer.import_records([path])
+        self.assertEqual(counts, {
+            'polls.choice': {'created': 0, 'skipped': 1},
+            'polls.vote': {'created': 0, 'skipped': 1},
+            'auth.group': {'created': 0, 'skipped': 1},
+        })
+
+    def test_resume_from_checkpoint(self):
+        """An interrupted import resumes after its last committed batch."""
+        path = self.path('polls.jsonl')
+        checkpoint = self.path('import.checkpoint')
+        transfer.export_records(path)
+        Question.objects.all().delete()
+
+        failing = mock.Mock(side_effect=RuntimeError('connection lost'))
+        with mock.patch.dict(transfer.IMPORTERS, {'polls.vote': failing}), self.assertRaises(RuntimeError):
+            transfer.import_records([path], batch_size=1, checkpoint=checkpoint)
+        self.assertEqual(Choice.objects.count(), 2)
+        self.assertEqual(Vote.objects.count(), 0)
+
+        counts = transfer.import_records([path], batch_size=1, checkpoint=checkpoint)
+        self.assertEqual(counts, {'polls.vote': {'created': 2, 'skipped': 0}})
+        self.assertEqual(Question.objects.count(), 1)
+        self.assertEqual(Choice.objects.count(), 2)
+        self.assertEqual(Vote.objects.filter(choice__question__question_text='Exported question').count(), 2)
+
+        self.assertEqual(transfer.import_records([path], checkpoint=checkpoint), {})
+
+    def test_json_array_read_in_pieces(self):
+        """Fixtures are parsed one record at a time, whatever the read size."""
+        records = [{'model': 'polls.question', 'pk': n, 'fields': {'question_text': f'Q{n} ]"[,'}} for n in range(5)]
+        text = ' [\n' + ',\n'.join(json.dumps(record) for record in records) + '\n] '
+        for chunk_size in (1, 7, 1000):
+            with self.subTest(chunk_size=chunk_size):
+                items = list(transfer._read_json_array(io.StringIO(text), chunk_size=chunk_size))
+                self.assertEqual(items, records)
+
+    def test_commands(self):
+        """export_polls and import_polls wrap the transfer functions."""
+        path = self.path('polls.csv')
+        output = io.StringIO()
+        call_command('export_polls', path, stdout=output)
+        self.assertIn('Exported 2 auth.user, 1 polls.question, 2 polls.choice, 2 polls.vote', output.getvalue())
+        output = io.StringIO()
+        call_command('import_polls', path, '--batch-size', '10', stdout=output)
+        self.assertIn('polls.question: 1 created, 0 skipped', output.getvalue())
+        self.assertEqual(Question.objects.count(), 2)
@@ -0,0 +1,79 @@
+import datetime
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from ..cache import get_user_votes
+from ..models import Question, Choice, Vote
+
+
+class UserVoteMapTests(TestCase):
+    def setUp(self):
+        """Set up a logged-in user, a question with two choices and an empty cache."""
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.client.login(username='testuser', password='12345')
+        self.question = self.create_question('Voted question')
+        self.choice1 = Choice.objects.create(question=self.question, choice_text='Choice 1')
+        self.choice2 = Choice.objects.create(question=self.question, choice_text='Choice 2')
+
+    def create_question(self, text):
+        """Create a question published a day ago."""
+        return Question.objects.create(question_text=text, pub_date=timezone.now() - datetime.timedelta(days=1))
+
+    def vote(self, choice):
+        """Vote for a choice, running the on-commit invalidation."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('polls:vote', args=[self.question.id]), {'choice': choice.id})
+
+    def vote_queries(self, url):
+        """Return how many queries of the vote table a request runs."""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        return sum('"polls_vote"' in query['sql'] for query in queries.captured_queries)
+
+    def test_one_query_however_many_polls(self):
+        """The index loads the user's votes with at most one query, whatever the number of polls."""
+        url = reverse('polls:index')
+        for size in (2, 20):
+            for n in range(size):
+                question = self.create_question(f'Question {n}')
+                choice = Choice.objects.create(question=question, choice_text='Choice')
+                Vote.objects.create(user=self.user, question=question, choice=choice)
+            with self.subTest(size=size):
+                cache.clear()
+                self.assertEqual(self.vote_queries(url), 1)
+                self.assertEqual(self.vote_queries(url), 0)
+
+    def test_map_follows_votes(self):
+        """Voting drops the cached map, so every page shows the new choice."""
+        self.assertEqual(get_user_votes(self.user.pk), {})
+        self.assertNotContains(self.client.get(reverse('polls:index')), 'VOTED')
+
+        self.vote(self.choice1)
+        self.assertEqual(get_user_votes(self.user.pk), {self.question.id: self.choice1.id})
+        self.assertContains(self.client.get(reverse('polls:index')), 'VOTED')
+
+        self.vote(self.choice2)
+        response = self.client.get(reverse('polls:detail', args=[self.question.id]))
+        self.assertEqual(response.context['previous_choice_id'], self.choice2.id)
+        self.assertRegex(response.content.decode(), rf'value="{self.choice2.id}"\s+class="choice-radio"\s+checked')
+        response = self.client.get(reverse('polls:results', args=[self.question.id]))
+        self.assertContains(response, 'You voted for <strong>Choice 2</strong>')
+
+    def test_index_etag_changes_after_voting(self):
+        """A logged-in user's index is not answered with 304 once their votes changed."""
+        url = reverse('polls:index')
+        etag = self.client.get(url).headers['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.vote(self.choice1)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_anonymous_visitors_run_no_vote_query(self):
+        """Anonymous visitors have an empty map and no query of the vote table."""
+        self.client.logout()
+        self.assertEqual(self.vote_queries(reverse('polls:index')), 0)
+        self.assertEqual(self.vote_queries(reverse('polls:results', args=[self.question.id])), 0)
@@ -1,13 +1,22 @@
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from unittest import skipUnless
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth.models import User
 from django.utils import timezone
 from ..models import Question, Choice, Vote
+from ..voting import cast_vote
 
 
 class VoteViewTests(TestCase):
     def setUp(self):
         """Set up a user, a question, and choices for testing."""
+        cache.clear()
         self.user = User.objects.create_user(username='testuser', password='12345')
         self.question = Question.objects.create(
             question_text='Test Question',
@@ -33,6 +42,83 @@ class VoteViewTests(TestCase):
         self.assertTrue(Vote.objects.filter(user=self.user, choice=self.choice2).exists())
         self.assertFalse(Vote.objects.filter(user=self.user, choice=self.choice1).exists())
 
+    def test_vote_increments_counter(self):
+        """Casting a vote increments the choice's denormalized counter."""
+        self.client.login(username='testuser', password='12345')
+        self.client.post(reverse('polls:vote', args=[self.question.id]), {'choice': self.choice1.id})
+        self.choice1.refresh_from_db()
+        self.assertEqual(self.choice1.votes, 1)
+        self.assertEqual(self.choice1.vote_count, 1)
+
+    def test_changed_vote_moves_counter(self):
+        """Changing a vote decrements the old choice and increments the new one."""
+        self.client.login(username='testuser', password='12345')
+        self.client.post(reverse('polls:vote', args=[self.question.id]), {'choice': self.choice1.id})
+        self.client.post(reverse('polls:vote', args=[self.question.id]), {'choice': self.choice2.id})
+        self.choice1.refresh_from_db()
+        self.choice2.refresh_from_db()
+        self.assertEqual(self.choice1.votes, 0)
+        self.assertEqual(self.choice2.votes, 1)
+
+    def test_repeated_vote_keeps_counter(self):
+        """Voting for the same choice twice counts it only once."""
+        self.client.login(username='testuser', password='12345')
+        self.client.post(reverse('polls:vote', args=[self.question.id]), {'choice': self.choice1.id})
+        self.client.post(reverse('polls:vote', args=[self.question.id]), {'choice': self.choice1.id})
+        self.choice1.refresh_from_db()
+        self.assertEqual(self.choice1.votes, 1)
+
+    def test_results_page_query_count_is_constant(self):
+        """The results page does not run one COUNT query per choice."""
+        for i in range(10):
+            Choice.objects.create(question=self.question, choice_text=f'Extra {i}')
+        with self.assertNumQueries(3):
+            self.client.get(reverse('polls:results', args=[self.question.id]))
+
+    def test_vote_records_question(self):
+        """A vote stores the question of its choice."""
+        vote = Vote.objects.create(user=self.user, choice=self.choice1)
+        self.assertEqual(vote.question, self.question)
+
+    def test_one_vote_per_user_enforced_by_database(self):
+        """The database rejects a second vote by the same user for the same question."""
+        Vote.objects.create(user=self.user, choice=self.choice1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Vote.objects.create(user=self.user, choice=self.choice2)
+
+    def test_detail_shows_previous_choice(self):
+        """The detail page preselects the choice of the user's previous vote."""
+        Vote.objects.create(user=self.user, choice=self.choice2)
+        self.client.login(username='testuser', password='12345')
+        response = self.client.get(reverse('polls:detail', args=[self.question.id]))
+        self.assertEqual(response.context['previous_choice'], self.choice2)
+
+    def test_counters_follow_vote_rows(self):
+        """Votes saved, changed or deleted outside polls.voting move the counters too."""
+        vote = Vote.objects.create(user=self.user, choice=self.choice1)
+        vote.choice = self.choice2
+        vote.save()
+        self.assertEqual(list(Choice.objects.order_by('pk').values_list('votes', flat=True)), [0, 1])
+        other = User.objects.create_user(username='otheruser', password='12345')
+        Vote.objects.create(user=other, choice=self.choice1)
+        vote.delete()
+        self.assertEqual(list(Choice.objects.order_by('pk').values_list('votes', flat=True)), [1, 0])
+        other.delete()
+        self.assertEqual(list(Choice.objects.order_by('pk').values_list('votes', flat=True)), [0, 0])
+
+    def test_reconcile_votes_fixes_drift(self):
+        """reconcile_votes recounts drifted counters from the Vote rows."""
+        Vote.objects.create(user=self.user, choice=self.choice1)
+        Choice.objects.filter(pk=self.choice1.pk).update(votes=0)
+        Choice.objects.filter(pk=self.choice2.pk).update(votes=7)
+        out = StringIO()
+        call_command('reconcile_votes', stdout=out)
+        self.choice1.refresh_from_db()
+        self.choice2.refresh_from_db()
+        self.assertEqual(self.choice1.votes, 1)
+        self.assertEqual(self.choice2.votes, 0)
+        self.assertIn("2 choice counter(s) fixed.", out.getvalue())
+
     # def test_no_choice_selected(self):
     #     question = Question.objects.create(question_text='Test Question', pub_date=timezone.now())
     #     Choice.objects.create(question=question, choice_text='Choice 1')
@@ -58,3 +144,56 @@ class VoteViewTests(TestCase):
     #
     #     # Check for error message
     #     self.assertContains(response, "Invalid choice.")
+
+
+class ConcurrentVoteTests(TransactionTestCase):
+    def setUp(self):
+        """Set up a user and a question with several choices."""
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.question = Question.objects.create(question_text='Test Question', pub_date=timezone.now())
+        self.choices = [
+            Choice.objects.create(question=self.question, choice_text=f'Choice {i}') for i in range(4)
+        ]
+
+    def _vote(self, choice):
+        """Cast a vote from a worker thread, retrying while the database is busy."""
+        try:
+            while True:
+                try:
+                    return cast_vote(self.user, self.question, choice)
+                except OperationalError:
+                    continue
+        finally:
+            connection.close()
+
+    @skipUnlessDBFeature('has_select_for_update')
+    def test_voter_locked_before_reading_previous_vote(self):
+        """The voter's row is locked before the previous vote is read, so first votes cannot race."""
+        with CaptureQueriesContext(connection) as queries:
+            cast_vote(self.user, self.question, self.choices[0])
+        sql = [query['sql'] for query in queries.captured_queries]
+        lock = next(i for i, query in enumerate(sql) if '"auth_user"' in query and 'FOR UPDATE' in query)
+        read = next(i for i, query in enumerate(sql) if '"polls_vote"' in query)
+        self.assertLess(lock, read)
+
+    @skipUnless(connection.vendor == 'postgresql', "PostgreSQL upserts and reads the previous votes at once.")
+    def test_one_statement_writes_votes_on_postgresql(self):
+        """On PostgreSQL a single statement upserts the vote and returns the one it replaced."""
+        cast_vote(self.user, self.question, self.choices[0])
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(cast_vote(self.user, self.question, self.choices[1]), self.choices[0].pk)
+        self.assertEqual(len([query for query in queries.captured_queries if '"polls_vote"' in query['sql']]), 1)
+        counters = dict(Choice.objects.values_list('pk', 'votes'))
+        self.assertEqual((counters[self.choices[0].pk], counters[self.choices[1].pk]), (0, 1))
+
+    def test_parallel_votes_leave_one_row(self):
+        """Many parallel votes from one user leave exactly one vote and consistent counters."""
+        picks = [self.choices[i % len(self.choices)] for i in range(40)]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(self._vote, picks))
+
+        self.assertEqual(Vote.objects.filter(user=self.user, question=self.question).count(), 1)
+        vote = Vote.objects.get(user=self.user, question=self.question)
+        counters = dict(Choice.objects.values_list('pk', 'votes'))
+        self.assertEqual(sum(counters.values()), 1)
+        self.assertEqual(counters[vote.choice_id], 1)
@@ -0,0 +1,88 @@
+import shutil
+import tempfile
+from io import StringIO
+from pathlib import Path
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from ..models import Question, Choice, Vote
+from ..vote_queue import VoteQueue, flush_vote_queue, get_vote_queue
+
+
+class WriteBehindVoteTests(TestCase):
+    def setUp(self):
+        """Set up a user, a question, choices and an empty queue file."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.settings_override = override_settings(
+            POLLS_VOTE_MODE='write_behind',
+            POLLS_VOTE_QUEUE_PATH=str(Path(self.tmpdir) / 'queue.sqlite3'),
+        )
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.question = Question.objects.create(question_text='Test Question', pub_date=timezone.now())
+        self.choice1 = Choice.objects.create(question=self.question, choice_text='Choice 1')
+        self.choice2 = Choice.objects.create(question=self.question, choice_text='Choice 2')
+
+    def test_vote_is_queued_not_written(self):
+        """In write-behind mode a vote is queued and not written during the request."""
+        self.client.login(username='testuser', password='12345')
+        response = self.client.post(reverse('polls:vote', args=[self.question.id]), {'choice': self.choice1.id})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Vote.objects.count(), 0)
+        self.assertEqual(len(get_vote_queue()), 1)
+
+    def test_flush_votes_command_writes_batch(self):
+        """flush_votes writes queued votes, keeps the last vote per user and updates counters."""
+        self.client.login(username='testuser', password='12345')
+        self.client.post(reverse('polls:vote', args=[self.question.id]), {'choice': self.choice1.id})
+        self.client.post(reverse('polls:vote', args=[self.question.id]), {'choice': self.choice2.id})
+
+        out = StringIO()
+        call_command('flush_votes', '--once', stdout=out)
+
+        self.assertIn("Flushed 2 queued vote(s).", out.getvalue())
+        self.assertEqual(len(get_vote_queue()), 0)
+        vote = Vote.objects.get(user=self.user, question=self.question)
+        self.assertEqual(vote.choice, self.choice2)
+        self.choice1.refresh_from_db()
+        self.choice2.refresh_from_db()
+        self.assertEqual((self.choice1.votes, self.choice2.votes), (0, 1))
+
+    def test_flush_is_idempotent(self):
+        """Writing the same queued votes twice leaves the same counters."""
+        queue = VoteQueue(Path(self.tmpdir) / 'replay.sqlite3')
+        queue.put(self.user.id, self.question.id, self.choice1.id)
+        flush_vote_queue(queue)
+        queue.put(self.user.id, self.question.id, self.choice1.id)
+        flush_vote_queue(queue)
+        self.choice1.refresh_from_db()
+        self.assertEqual(self.choice1.votes, 1)
+
+    def test_flush_drops_votes_for_deleted_choices(self):
+        """Queued votes whose choice no longer exists are dropped."""
+        queue = get_vote_queue()
+        queue.put(self.user.id, self.question.id, self.choice1.id)
+        self.choice1.delete()
+        self.assertEqual(flush_vote_queue(queue), 1)
+        self.assertEqual(Vote.objects.count(), 0)
+        self.assertEqual(len(queue), 0)
+
+    def test_batch_uses_constant_queries(self):
+        """A batch costs the same number of queries however many votes it holds."""
+        queue = get_vote_queue()
+        users = [User.objects.create_user(username=f'user{i}', password='12345') for i in range(20)]
+        for user in users[:2]:
+            queue.put(user.id, self.question.id, self.choice1.id)
+        with self.assertNumQueries(8):
+            flush_vote_queue(queue)
+        for user in users:
+            queue.put(user.id, self.question.id, self.choice2.id)
+        with self.assertNumQueries(8):
+            flush_vote_queue(queue)
+        self.choice2.refresh_from_db()
+        self.assertEqual(self.choice2.votes, 20)
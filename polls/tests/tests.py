@@ -1,4 +1,5 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 import datetime
 from django.utils import timezone
 from polls.models import Question
@@ -130,6 +131,10 @@ def create_question(question_text, days):
 
 
 class QuestionIndexViewTests(TestCase):
+    def setUp(self):
+        """Start every test with an empty page cache."""
+        cache.clear()
+
     def test_no_questions(self):
         """If no questions exist, an appropriate message is displayed."""
         response = self.client.get(reverse('polls:index'))
@@ -181,4 +186,64 @@ class QuestionIndexViewTests(TestCase):
             [question2, question1],
         )
 
-
+    def test_index_is_paginated(self):
+        """
+        The index shows one page of questions and links to the next page
+        with a cursor; following it shows the older questions.
+        """
+        questions = [create_question(question_text=f"Question {i}.", days=-i - 1) for i in range(25)]
+        response = self.client.get(reverse("polls:index"))
+        self.assertQuerySetEqual(response.context["latest_question_list"], questions[:20])
+        next_cursor = response.context["next_cursor"]
+        self.assertIsNotNone(next_cursor)
+
+        response = self.client.get(reverse("polls:index"), {"cursor": next_cursor})
+        self.assertQuerySetEqual(response.context["latest_question_list"], questions[20:])
+        self.assertIsNone(response.context["next_cursor"])
+
+    def test_cursor_orders_same_pub_date_by_id(self):
+        """Questions published at the same instant are neither skipped nor repeated."""
+        pub_date = timezone.now() - datetime.timedelta(days=1)
+        questions = [Question.objects.create(question_text=f"Q{i}", pub_date=pub_date) for i in range(25)]
+        first = self.client.get(reverse("polls:index"))
+        second = self.client.get(reverse("polls:index"), {"cursor": first.context["next_cursor"]})
+        listed = list(first.context["latest_question_list"]) + list(second.context["latest_question_list"])
+        self.assertEqual(sorted(q.pk for q in listed), sorted(q.pk for q in questions))
+
+    def test_invalid_cursor(self):
+        """A malformed cursor returns 404."""
+        response = self.client.get(reverse("polls:index"), {"cursor": "garbage"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_out_of_range_cursor(self):
+        """A cursor whose date or id is out of range returns 404."""
+        for cursor in ("99999999999999999999-1", "0-99999999999999999999"):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(reverse("polls:index"), {"cursor": cursor})
+                self.assertEqual(response.status_code, 404)
+
+    def test_open_and_closed_status(self):
+        """The open/closed status is computed by the database."""
+        now = timezone.now()
+        open_question = Question.objects.create(question_text="Open.", pub_date=now - datetime.timedelta(days=2))
+        closed_question = Question.objects.create(
+            question_text="Closed.",
+            pub_date=now - datetime.timedelta(days=3),
+            end_date=now - datetime.timedelta(days=1),
+        )
+        response = self.client.get(reverse("polls:index"))
+        status = {q.pk: q.is_open for q in response.context["latest_question_list"]}
+        self.assertEqual(status, {open_question.pk: True, closed_question.pk: False})
+
+    @override_settings(POLLS_PAGE_CACHE_TIMEOUT=0)
+    def test_index_query_count_is_flat(self):
+        """The index runs the same number of queries however many polls exist."""
+        for i in range(3):
+            create_question(question_text=f"Question {i}.", days=-i - 1)
+        with self.assertNumQueries(2):
+            self.client.get(reverse("polls:index"))
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(50):
+                create_question(question_text=f"More {i}.", days=-i - 5)
+        with self.assertNumQueries(2):
+            self.client.get(reverse("polls:index"))
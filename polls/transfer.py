@@ -0,0 +1,399 @@
+"""
+polls/transfer.py.
+
+This module moves users, questions, choices and votes between databases. It
+backs the ``export_polls`` and ``import_polls`` management commands.
+
+Records have the shape of Django fixtures, ``{"model": "polls.question",
+"pk": 3, "fields": {...}}``, and are read and written one at a time, so an
+archive of millions of votes never has to fit in memory. Three formats are
+supported, each optionally gzip-compressed (``.gz``):
+
+- ``jsonl``: one record per line.
+- ``json``: a fixture, i.e. a JSON array of records, like data/polls-v4.json.
+- ``csv``: one record per row, with the columns of CSV_COLUMNS.
+
+Imported questions and choices get new primary keys, users are matched by
+username, and the references of later records are remapped to the new keys.
+Records must therefore come after the records they refer to, which is the
+order export_records() writes them in. Only the id maps are kept in memory,
+so memory grows with the number of users, questions and choices, not votes.
+
+Functions:
+- detect_format: Guess the format of an archive from its file name.
+- export_records: Write every user, question, choice and vote to a file.
+- read_records: Yield the records of an archive one at a time.
+- import_records: Import archives in batches, optionally resuming from a checkpoint.
+"""
+
+import csv
+import gzip
+import json
+import os
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from .cache import invalidate_pages, invalidate_user_votes_on_commit
+from .models import Choice, Question, Vote
+
+# The exported fields of each model, in the order export_records() writes the models
+MODELS = {
+    'auth.user': (User, (
+        'username', 'password', 'email', 'first_name', 'last_name',
+        'is_staff', 'is_active', 'is_superuser', 'last_login', 'date_joined',
+    )),
+    'polls.question': (Question, ('question_text', 'pub_date', 'end_date')),
+    'polls.choice': (Choice, ('question', 'choice_text', 'votes')),
+    'polls.vote': (Vote, ('user', 'question', 'choice')),
+}
+
+# References to other records, which are remapped on import
+FOREIGN_KEYS = {'question': 'polls.question', 'choice': 'polls.choice', 'user': 'auth.user'}
+
+CSV_COLUMNS = ['model', 'pk', *dict.fromkeys(name for _, fields in MODELS.values() for name in fields)]
+
+FORMATS = ('jsonl', 'json', 'csv')
+
+
+def detect_format(path):
+    """
+    Guess the format of an archive from its file name.
+
+    Args:
+        path (str): The file name, such as ``votes.jsonl.gz``.
+
+    Returns:
+        str: One of FORMATS.
+
+    Raises:
+        ValueError: If the extension is not recognized.
+    """
+    name = path[:-3] if path.endswith('.gz') else path
+    extension = os.path.splitext(name)[1].lower()
+    formats = {'.jsonl': 'jsonl', '.ndjson': 'jsonl', '.json': 'json', '.csv': 'csv'}
+    if extension not in formats:
+        raise ValueError(f"Cannot tell the format of {path}; use a .jsonl, .json or .csv file or pass a format.")
+    return formats[extension]
+
+
+def _open(path, mode):
+    """Open an archive as text, decompressing or compressing .gz files."""
+    if path.endswith('.gz'):
+        return gzip.open(path, f'{mode}t', encoding='utf-8', newline='')
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+def _json_value(value):
+    """Convert a datetime to JSON, keeping its microseconds."""
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(f"Cannot export {type(value).__name__} values.")
+
+
+def _csv_value(value):
+    """Convert an exported value to a CSV cell."""
+    if value is None:
+        return ''
+    return _json_value(value) if hasattr(value, 'isoformat') else value
+
+
+def export_records(path, format=None, chunk_size=2000):
+    """
+    Write every user, question, choice and vote to a file.
+
+    Rows are read with ``iterator(chunk_size=...)`` and written as they
+    arrive, so memory use does not grow with the size of the tables.
+
+    Args:
+        path (str): The file to write.
+        format (str): One of FORMATS, guessed from the file name if not given.
+        chunk_size (int): Number of rows fetched from the database at a time.
+
+    Returns:
+        dict: The number of records written per model.
+    """
+    format = format or detect_format(path)
+    counts = {}
+    with _open(path, 'w') as file:
+        if format == 'csv':
+            writer = csv.writer(file)
+            writer.writerow(CSV_COLUMNS)
+        elif format == 'json':
+            file.write('[')
+        first = True
+        for label, (model, fields) in MODELS.items():
+            columns = [f'{name}_id' if name in FOREIGN_KEYS else name for name in fields]
+            rows = model.objects.order_by('pk').values_list('pk', *columns).iterator(chunk_size=chunk_size)
+            counts[label] = 0
+            for pk, *values in rows:
+                counts[label] += 1
+                if format == 'csv':
+                    cells = dict(zip(fields, values))
+                    writer.writerow([label, pk, *(_csv_value(cells.get(name)) for name in CSV_COLUMNS[2:])])
+                    continue
+                line = json.dumps({'model': label, 'pk': pk, 'fields': dict(zip(fields, values))}, default=_json_value)
+                if format == 'json':
+                    file.write(f'\n{line}' if first else f',\n{line}')
+                else:
+                    file.write(f'{line}\n')
+                first = False
+        if format == 'json':
+            file.write('\n]\n')
+    return counts
+
+
+def _skip_separators(file, buffer, position, chunk_size):
+    """Return the buffer and position of the next character that is not whitespace or a comma."""
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position < len(buffer):
+            return buffer, position
+        buffer, position = file.read(chunk_size), 0
+        if not buffer:
+            raise ValueError("The JSON array is not closed.")
+
+
+def _read_json_array(file, chunk_size=65536):
+    """Yield the items of a JSON array one at a time, without parsing the whole file."""
+    decoder = json.JSONDecoder()
+    buffer, position = _skip_separators(file, '', 0, chunk_size)
+    if buffer[position] != '[':
+        raise ValueError("Expected a JSON array of records.")
+    position += 1
+    while True:
+        buffer, position = _skip_separators(file, buffer, position, chunk_size)
+        if buffer[position] == ']':
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            more = file.read(chunk_size)
+            if not more:
+                raise
+            buffer, position = buffer[position:] + more, 0
+            continue
+        yield item
+
+
+def read_records(path, format=None):
+    """
+    Yield the records of an archive one at a time.
+
+    Args:
+        path (str): The archive to read.
+        format (str): One of FORMATS, guessed from the file name if not given.
+
+    Yields:
+        dict: Records with ``model``, ``pk`` and ``fields`` keys.
+    """
+    format = format or detect_format(path)
+    with _open(path, 'r') as file:
+        if format == 'json':
+            yield from _read_json_array(file)
+        elif format == 'jsonl':
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            for row in csv.DictReader(file):
+                label = row.pop('model')
+                pk = row.pop('pk')
+                _, fields = MODELS.get(label, (None, ()))
+                yield {'model': label, 'pk': pk, 'fields': {name: row.get(name, '') for name in fields}}
+
+
+class _Checkpoint:
+    """
+    An append-only log of the batches an import has committed.
+
+    Each line records how many records of a file have been imported and the
+    keys given to the new rows, so an interrupted import can resume where it
+    stopped without creating its rows twice.
+    """
+
+    def __init__(self, path):
+        """Load the checkpoint at path, if it exists."""
+        self.path = path
+        self.positions = {}
+        self.ids = {label: {} for label in FOREIGN_KEYS.values()}
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as file:
+                for line in file:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    self.positions[entry['file']] = entry['position']
+                    for label, ids in entry['ids'].items():
+                        self.ids[label].update(ids)
+
+    def save(self, file, position, ids):
+        """Record a committed batch of a file and the keys of its new rows."""
+        self.positions[file] = position
+        if self.path:
+            with open(self.path, 'a', encoding='utf-8') as checkpoint:
+                checkpoint.write(json.dumps({'file': file, 'position': position, 'ids': ids}) + '\n')
+
+
+def _field_values(model, fields, record_fields):
+    """Convert the exported values of a record to the Python values of its model's fields."""
+    values = {}
+    for name in fields:
+        if name in FOREIGN_KEYS or name not in record_fields:
+            continue
+        field = model._meta.get_field(name)
+        value = record_fields[name]
+        if value == '' and field.null:
+            values[name] = None
+        elif value != '' or field.empty_strings_allowed:
+            values[name] = field.to_python(value)
+    return values
+
+
+def _reference(ids, label, record_fields, name):
+    """Return the new key of a record's reference, or None if it is missing or unknown."""
+    value = record_fields.get(name)
+    return None if value in (None, '') else ids[label].get(str(value))
+
+
+def _import_users(batch, ids):
+    """Create the users of a batch, matching existing users by username."""
+    records = {record['fields']['username']: record for record in batch}
+    existing = dict(User.objects.filter(username__in=records).values_list('username', 'pk'))
+    new_users = []
+    for username, record in records.items():
+        if username not in existing:
+            values = _field_values(User, MODELS['auth.user'][1], record['fields'])
+            values.setdefault('password', make_password(None))
+            new_users.append(User(**values))
+    User.objects.bulk_create(new_users)
+    keys = {**existing, **{user.username: user.pk for user in new_users}}
+    return {str(record['pk']): keys[record['fields']['username']] for record in batch}, len(new_users)
+
+
+def _import_questions(batch, ids):
+    """Create the questions of a batch."""
+    questions = [Question(**_field_values(Question, MODELS['polls.question'][1], record['fields'])) for record in batch]
+    for question in questions:
+        question.status = question.compute_status()
+    Question.objects.bulk_create(questions)
+    return {str(record['pk']): question.pk for record, question in zip(batch, questions)}, len(questions)
+
+
+def _import_choices(batch, ids):
+    """Create the choices of a batch whose question was imported."""
+    pairs = []
+    for record in batch:
+        question_id = _reference(ids, 'polls.question', record['fields'], 'question')
+        if question_id is not None:
+            values = _field_values(Choice, MODELS['polls.choice'][1], record['fields'])
+            pairs.append((record, Choice(question_id=question_id, **values)))
+    Choice.objects.bulk_create([choice for _, choice in pairs])
+    return {str(record['pk']): choice.pk for record, choice in pairs}, len(pairs)
+
+
+def _import_votes(batch, ids):
+    """
+    Create the votes of a batch whose user and choice were imported.
+
+    The question of each vote is taken from its choice. Votes of a user for
+    a question that already has one, in the database or earlier in the
+    batch, are skipped.
+    """
+    references = []
+    for record in batch:
+        user_id = _reference(ids, 'auth.user', record['fields'], 'user')
+        choice_id = _reference(ids, 'polls.choice', record['fields'], 'choice')
+        if user_id is not None and choice_id is not None:
+            references.append((user_id, choice_id))
+    questions = dict(
+        Choice.objects.filter(pk__in={choice_id for _, choice_id in references}).values_list('pk', 'question_id')
+    )
+    taken = set(
+        Vote.objects.filter(
+            user_id__in={user_id for user_id, _ in references}, question_id__in=set(questions.values()),
+        ).values_list('user_id', 'question_id')
+    )
+    votes = []
+    for user_id, choice_id in references:
+        question_id = questions.get(choice_id)
+        if question_id is not None and (user_id, question_id) not in taken:
+            taken.add((user_id, question_id))
+            votes.append(Vote(user_id=user_id, question_id=question_id, choice_id=choice_id))
+    Vote.objects.bulk_create(votes)
+    invalidate_user_votes_on_commit(vote.user_id for vote in votes)
+    return {}, len(votes)
+
+
+IMPORTERS = {
+    'auth.user': _import_users,
+    'polls.question': _import_questions,
+    'polls.choice': _import_choices,
+    'polls.vote': _import_votes,
+}
+
+
+def import_records(paths, format=None, batch_size=1000, checkpoint=None, log=None):
+    """
+    Import archives in batches, optionally resuming from a checkpoint.
+
+    Consecutive records of the same model are written with one bulk_create
+    per batch, each batch in its own transaction. Choices keep the ``votes``
+    counter of the archive; run reconcile_votes after importing only part
+    of a poll's votes.
+
+    Records of other models, records whose references were not imported,
+    users whose username is taken (their records are mapped to the existing
+    user) and second votes of a user for a question are skipped. With a checkpoint file, every committed batch is
+    recorded in it, and a later run with the same file continues after the
+    last recorded batch. A batch interrupted between its commit and its
+    checkpoint entry is imported again.
+
+    Args:
+        paths (list): The archives to import, in order.
+        format (str): One of FORMATS, guessed from each file name if not given.
+        batch_size (int): Number of records written per transaction.
+        checkpoint (str): A file recording the progress of the import, if given.
+        log (callable): Called with a progress message after each file, if given.
+
+    Returns:
+        dict: The number of rows created and records skipped per model.
+    """
+    log = log or (lambda message: None)
+    state = _Checkpoint(checkpoint)
+    counts = {}
+
+    def write(path, label, batch, position):
+        with transaction.atomic():
+            new_ids, created = IMPORTERS[label](batch, state.ids)
+        if label in state.ids:
+            state.ids[label].update(new_ids)
+        state.save(path, position, {label: new_ids} if new_ids else {})
+        totals = counts.setdefault(label, {'created': 0, 'skipped': 0})
+        totals['created'] += created
+        totals['skipped'] += len(batch) - created
+
+    for path in paths:
+        key = os.path.abspath(path)
+        done = state.positions.get(key, 0)
+        label = None
+        batch = []
+        position = 0
+        for position, record in enumerate(read_records(path, format), start=1):
+            if position <= done:
+                continue
+            if record['model'] not in IMPORTERS:
+                counts.setdefault(record['model'], {'created': 0, 'skipped': 0})['skipped'] += 1
+                continue
+            if batch and (record['model'] != label or len(batch) >= batch_size):
+                write(key, label, batch, position - 1)
+                batch = []
+            label = record['model']
+            batch.append(record)
+        if batch:
+            write(key, label, batch, position)
+        log(f"Imported {path}." if position > done else f"Skipped {path}, already imported.")
+
+    if counts:
+        invalidate_pages()
+    return counts
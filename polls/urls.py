@@ -8,6 +8,8 @@ URL patterns:
 - Index page: List of latest polls.
 - Detail page: Details for a specific poll question.
 - Results page: Results for a specific poll question.
+- Results JSON: Results for a specific poll question as JSON.
+- Results stream: Live changes to the results as Server-Sent Events.
 - Vote page: Handling votes for a specific poll question.
 """
 
@@ -20,5 +22,7 @@ urlpatterns = [
     path('', views.IndexView.as_view(), name='index'),  # Route for the index page listing all polls
     path('<int:pk>/', views.DetailView.as_view(), name='detail'),  # Route for showing details of a specific poll
     path('<int:pk>/results/', views.ResultsView.as_view(), name='results'),  # Route for displaying results of a specific poll
+    path('<int:pk>/results.json', views.ResultsJsonView.as_view(), name='results_json'),  # Route for the results as JSON
+    path('<int:pk>/results/stream/', views.ResultsStreamView.as_view(), name='results_stream'),  # Route for live results
     path('<int:question_id>/vote/', views.VoteView.as_view(), name='vote'),  # Route for submitting a vote on a specific poll
 ]
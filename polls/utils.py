@@ -5,22 +5,37 @@ This module provides utility functions for the polls application.
 
 Functions:
 - get_client_ip: Extracts the client's IP address from the request headers.
+- encode_cursor: Encodes a (pub_date, id) position for keyset pagination.
+- decode_cursor: Decodes a cursor made by encode_cursor.
 """
 
+import datetime
+from django.conf import settings
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
 
 def get_client_ip(request):
     """
     Get the visitor’s IP address using request headers.
 
+    X-Forwarded-For is only read behind POLLS_TRUSTED_PROXIES reverse
+    proxies, each of which appends the address it received the request
+    from. The client is then the entry appended by the outermost proxy,
+    counted from the right, since anything to its left was sent by the
+    client and can be forged. Without proxies, it is REMOTE_ADDR.
+
     Args:
         request: The HTTP request object.
 
     Returns:
         str: The client's IP address. If not available, returns 'Unknown'.
     """
+    proxies = getattr(settings, 'POLLS_TRUSTED_PROXIES', 0)
     x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0].strip()
+    if proxies > 0 and x_forwarded_for:
+        addresses = [address.strip() for address in x_forwarded_for.split(',')]
+        ip = addresses[-min(proxies, len(addresses))]
     else:
         ip = request.META.get('REMOTE_ADDR')
 
@@ -29,3 +44,42 @@ def get_client_ip(request):
         ip = 'Unknown'
 
     return ip
+
+
+def encode_cursor(pub_date, pk):
+    """
+    Encode a question's position in the newest-first listing as a URL-safe cursor.
+
+    Args:
+        pub_date (datetime): The publication date of the last question on a page.
+        pk (int): The primary key of that question.
+
+    Returns:
+        str: The cursor, as microseconds since the epoch and the id joined by '-'.
+    """
+    microseconds = (pub_date - EPOCH) // datetime.timedelta(microseconds=1)
+    return f"{microseconds}-{pk}"
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor made by encode_cursor.
+
+    Args:
+        cursor (str): The cursor from the query string.
+
+    Returns:
+        tuple: The (pub_date, id) position.
+
+    Raises:
+        ValueError: If the cursor is malformed or out of range.
+    """
+    try:
+        microseconds, pk = cursor.split('-')
+        pub_date, pk = EPOCH + datetime.timedelta(microseconds=int(microseconds)), int(pk)
+    except (OverflowError, TypeError) as error:
+        raise ValueError(f"Invalid cursor {cursor!r}.") from error
+    # Ids beyond a signed 64-bit integer overflow the database driver
+    if not 0 < pk < 2 ** 63:
+        raise ValueError(f"Invalid cursor {cursor!r}.")
+    return pub_date, pk
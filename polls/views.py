@@ -8,45 +8,138 @@ Classes:
 - IndexView: Displays a list of the latest questions.
 - DetailView: Shows details of a specific question and allows voting.
 - ResultsView: Displays the results of a specific question.
+- ResultsJsonView: Returns the results of a specific question as JSON.
+- ResultsStreamView: Streams live changes to the results as Server-Sent Events.
 - VoteView: Handles voting for a specific choice in a question.
+- MetricsView: Serves the metrics of all worker processes in the Prometheus text format.
 """
 
+import asyncio
+import hmac
 import logging
-from django.http import HttpResponseRedirect
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Min, Q
+from django.http import (
+    Http404, HttpResponse, HttpResponseForbidden, HttpResponseRedirect, JsonResponse, StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from django.views import generic, View
 from django.utils import timezone
-from .models import Choice, Question, Vote
+from django.utils.functional import SimpleLazyObject
+from .models import Choice, Question
+from . import metrics
+from .events import broker, format_event
+from .conditional import index_etag, index_last_modified, question_etag, question_last_modified
+from .cache import INDEX_SCOPE, AnonymousPageCacheMixin, get_cached_results, get_request_votes, question_scope
+from .routers import reads_from_replica
+from .vote_queue import get_vote_queue
+from .utils import decode_cursor, encode_cursor
+from .voting import cast_vote
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 
 logger = logging.getLogger('myapp')
 
 
-class IndexView(generic.ListView):
+@method_decorator(reads_from_replica, name='dispatch')
+@method_decorator(condition(etag_func=index_etag, last_modified_func=index_last_modified), name='dispatch')
+class IndexView(AnonymousPageCacheMixin, generic.ListView):
     """
-    Display the latest questions.
+    Display the latest questions, one page at a time.
+
+    Pages are selected with keyset pagination: the ``cursor`` query parameter
+    holds the (pub_date, id) of the last question on the previous page, so
+    the cost of a page does not depend on how many polls came before it.
+    Its queries go to the read replica when one is configured.
 
     Attributes:
         template_name (str): The path to the template that renders the view.
         context_object_name (str): The name of the context variable to use in the template.
+        page_size (int): The number of questions on a page.
     """
 
     template_name = "polls/index.html"
     context_object_name = "latest_question_list"
+    page_size = 20
 
     def get_queryset(self):
         """
-        Return the last five published questions, excluding those set to be published in the future.
+        Return the published questions after the cursor, newest first.
+
+        Only the columns the template needs are loaded. Whether a question is
+        published and open comes from its dates, compared with the clock.
 
         Returns:
             QuerySet: A QuerySet of the latest questions.
+
+        Raises:
+            Http404: If the cursor is malformed.
+        """
+        queryset = (
+            Question.objects.published()
+            .only('id', 'question_text', 'pub_date', 'end_date')
+            .order_by('-pub_date', '-id')
+        )
+        cursor = self.request.GET.get('cursor')
+        if cursor:
+            try:
+                pub_date, pk = decode_cursor(cursor)
+            except ValueError:
+                raise Http404("Invalid cursor.")
+            queryset = queryset.filter(Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk))
+        return queryset
+
+    def get_context_data(self, **kwargs):
         """
-        return Question.objects.filter(pub_date__lte=timezone.now()).order_by("-pub_date")
+        Limit the list to one page and add the cursor of the next page.
+
+        Args:
+            **kwargs: Additional keyword arguments. ``page_rows`` may hold the
+                first page_size + 1 rows of the queryset if they were already fetched.
+
+        Returns:
+            dict: The context data with the page of questions, ``next_cursor``
+            and ``user_votes``, the user's vote map.
+        """
+        page = kwargs.pop('page_rows', None)
+        if page is None:
+            page = list(self.object_list[:self.page_size + 1])
+        next_cursor = None
+        if len(page) > self.page_size:
+            page = page[:self.page_size]
+            next_cursor = encode_cursor(page[-1].pub_date, page[-1].pk)
+        context = super().get_context_data(object_list=page, **kwargs)
+        context['next_cursor'] = next_cursor
+        context['is_first_page'] = not self.request.GET.get('cursor')
+        context['user_votes'] = get_request_votes(self.request)
+        return context
 
+    def get_page_cache_scopes(self):
+        """Return the page cache scope of the index."""
+        return [INDEX_SCOPE]
 
-class DetailView(generic.DetailView):
+    def get_page_cache_expiry(self):
+        """
+        Return the next time a question is published or closes.
+
+        Returns:
+            datetime or None: The earliest future pub_date or end_date of any question.
+        """
+        now = timezone.now()
+        boundaries = Question.objects.aggregate(
+            next_pub_date=Min('pub_date', filter=Q(pub_date__gt=now)),
+            next_end_date=Min('end_date', filter=Q(end_date__gt=now)),
+        )
+        return min((b for b in boundaries.values() if b is not None), default=None)
+
+
+@method_decorator(condition(etag_func=question_etag, last_modified_func=question_last_modified), name='dispatch')
+class DetailView(AnonymousPageCacheMixin, generic.DetailView):
     """
     Display details for a specific question and allow voting.
 
@@ -65,7 +158,7 @@ class DetailView(generic.DetailView):
         Returns:
             QuerySet: A QuerySet of published questions.
         """
-        return Question.objects.filter(pub_date__lte=timezone.now())
+        return Question.objects.published()
 
     def get(self, request, *args, **kwargs):
         """
@@ -94,31 +187,43 @@ class DetailView(generic.DetailView):
         """
         Add the previous choice of the user to the context data.
 
+        The id of the choice comes from the user's vote map. The Choice
+        itself, ``previous_choice``, is only loaded if something uses it.
+
         Args:
             **kwargs: Additional keyword arguments.
 
         Returns:
-            dict: The updated context data with the previous choice.
+            dict: The updated context data with ``previous_choice_id`` and ``previous_choice``.
         """
         context = super().get_context_data(**kwargs)
-        question = self.object
-        this_user = self.request.user
-
-        if this_user.is_authenticated:
-            try:
-                previous_vote = Vote.objects.get(user=this_user, choice__question=question)
-                context['previous_choice'] = previous_vote.choice
-            except Vote.DoesNotExist:
-                context['previous_choice'] = None
-        else:
-            context['previous_choice'] = None
+        choice_id = get_request_votes(self.request).get(self.object.pk)
+        context['previous_choice_id'] = choice_id
+        context['previous_choice'] = SimpleLazyObject(lambda: Choice.objects.get(pk=choice_id)) if choice_id else None
         return context
 
+    def get_page_cache_scopes(self):
+        """Return the page cache scope of the question."""
+        return [question_scope(self.kwargs['pk'])]
 
-class ResultsView(generic.DetailView):
+    def get_page_cache_expiry(self):
+        """
+        Return when the question closes, since the page redirects from then on.
+
+        Returns:
+            datetime or None: The end date of the question.
+        """
+        return self.object.end_date
+
+
+@method_decorator(reads_from_replica, name='dispatch')
+@method_decorator(condition(etag_func=question_etag, last_modified_func=question_last_modified), name='dispatch')
+class ResultsView(AnonymousPageCacheMixin, generic.DetailView):
     """
     Display the results for a specific question.
 
+    Its queries go to the read replica when one is configured.
+
     Attributes:
         model (Question): The model associated with this view.
         template_name (str): The path to the template that renders the view.
@@ -140,13 +245,122 @@ class ResultsView(generic.DetailView):
             HttpResponseRedirect: Redirects to the index page if the question is not published.
             HttpResponse: Renders the results page for the question if it is published.
         """
-        question = self.get_object()
+        self.object = self.get_object()
         # Check if the question is not published yet
-        if question.pub_date > timezone.now():
+        if not self.object.is_published():
             # Redirect to the index if the question is not yet published
             return HttpResponseRedirect(reverse('polls:index'))
-        # If the question is published, proceed with the default get method
-        return super().get(request, *args, **kwargs)
+        # If the question is published, render it without fetching it again
+        return self.render_to_response(self.get_context_data(object=self.object))
+
+    def get_context_data(self, **kwargs):
+        """
+        Add the cached results of the question and the user's choice to the context data.
+
+        Args:
+            **kwargs: Additional keyword arguments. ``results`` is looked up unless it is given.
+
+        Returns:
+            dict: The context data with the question's ``results`` and
+            ``user_choice``, the result of the choice the user voted for.
+        """
+        context = super().get_context_data(**kwargs)
+        if 'results' not in kwargs:
+            context['results'] = get_cached_results(self.object)
+        choice_id = get_request_votes(self.request).get(self.object.pk)
+        context['user_choice'] = next((choice for choice in context['results'].choices if choice.id == choice_id), None)
+        return context
+
+    def get_page_cache_scopes(self):
+        """Return the page cache scope of the question."""
+        return [question_scope(self.kwargs['pk'])]
+
+
+@method_decorator(condition(etag_func=question_etag, last_modified_func=question_last_modified), name='dispatch')
+class ResultsJsonView(View):
+    """Return the results of a specific question as JSON."""
+
+    def get(self, request, pk):
+        """
+        Return the tallies, turnout and percentages of a published question.
+
+        Args:
+            request: The HTTP request object.
+            pk: The ID of the question.
+
+        Returns:
+            JsonResponse: The results of the question.
+        """
+        question = get_object_or_404(Question.objects.published().only('id', 'question_text'), pk=pk)
+        data = get_cached_results(question).as_dict()
+        data['question_text'] = question.question_text
+        return JsonResponse(data)
+
+
+class ResultsStreamView(View):
+    """
+    Stream live changes to the results of a question as Server-Sent Events.
+
+    The stream starts with a ``snapshot`` event holding the full results,
+    followed by a ``delta`` event for every committed vote that changes
+    them. Comment lines are sent while idle to keep proxies from closing the
+    connection. Deltas come from the in-process broker in polls.events, so
+    this view is meant for a single ASGI process. Under WSGI the stream would
+    hold a worker for as long as the client stays connected, so it answers
+    501 instead.
+
+    Attributes:
+        keepalive_interval (float): Seconds of silence before a keep-alive comment is sent.
+    """
+
+    keepalive_interval = 15
+
+    async def get(self, request, pk):
+        """
+        Open the event stream of a published question.
+
+        Args:
+            request: The HTTP request object.
+            pk: The ID of the question.
+
+        Returns:
+            StreamingHttpResponse: The text/event-stream response, or 501 when not served over ASGI.
+        """
+        if not isinstance(request, ASGIRequest):
+            return HttpResponse("Live results need an ASGI server.", status=501, content_type='text/plain')
+        try:
+            question = await Question.objects.published().only('id').aget(pk=pk)
+        except Question.DoesNotExist:
+            raise Http404("No question found.")
+        response = StreamingHttpResponse(self.stream(question.pk), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def stream(self, question_id):
+        """
+        Yield the snapshot and then the deltas of a question until the client disconnects.
+
+        Args:
+            question_id: The ID of the question.
+
+        Yields:
+            str: Server-Sent Events messages.
+        """
+        # Subscribe before taking the snapshot so no vote falls between the two.
+        queue = broker.subscribe(question_id)
+        try:
+            results = await sync_to_async(get_cached_results)(question_id)
+            yield format_event('snapshot', results.as_dict())
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), self.keepalive_interval)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_event('delta', event)
+        finally:
+            broker.unsubscribe(question_id, queue)
 
 
 class VoteView(LoginRequiredMixin, View):
@@ -168,7 +382,6 @@ class VoteView(LoginRequiredMixin, View):
         Returns:
             HttpResponseRedirect: Redirects to the results page or back to the detail page with an error message.
         """
-        user = request.user
         question = get_object_or_404(Question, pk=question_id)
 
         if not question.can_vote():
@@ -186,17 +399,59 @@ class VoteView(LoginRequiredMixin, View):
             messages.error(request, "Invalid choice.")
             return HttpResponseRedirect(reverse('polls:detail', args=(question.id,)))
 
-        existing_vote = Vote.objects.filter(user=user, choice__question=question).first()
-        if existing_vote:
-            existing_vote.choice = selected_choice
-            existing_vote.save()
-        else:
-            Vote.objects.create(user=user, choice=selected_choice)
+        return self.record_vote(request, question, selected_choice)
+
+    @staticmethod
+    def record_vote(request, question, choice):
+        """
+        Record a validated vote, either directly or through the write-behind queue.
+
+        Args:
+            request: The HTTP request object of the logged-in voter.
+            question: The question being voted on.
+            choice: The selected choice of the question.
+
+        Returns:
+            HttpResponseRedirect: Redirects to the results page.
+        """
+        user = request.user
+        if settings.POLLS_VOTE_MODE == 'write_behind':
+            get_vote_queue().put(user.id, question.id, choice.id)
+            logger.info("User %s queued a vote for choice %s in question %s", user.username, choice.choice_text, question.id)
+            messages.success(request, f"Your vote for {choice.choice_text} has been received and will be counted shortly.")
+            return HttpResponseRedirect(reverse("polls:results", args=(question.id,)))
+
+        cast_vote(user, question, choice)
 
         # Log the vote
-        logger.info(f"User {user.username} voted for choice {selected_choice.choice_text} in question {question.id}")
+        logger.info("User %s voted for choice %s in question %s", user.username, choice.choice_text, question.id)
 
         # Add a success message
-        messages.success(request, f"Your vote for {selected_choice.choice_text} has been recorded.")
+        messages.success(request, f"Your vote for {choice.choice_text} has been recorded.")
 
         return HttpResponseRedirect(reverse("polls:results", args=(question.id,)))
+
+
+class MetricsView(View):
+    """
+    Serve the metrics of all worker processes in the Prometheus text format.
+
+    When POLLS_METRICS_TOKEN is set, scrapers must send it as a bearer token.
+    """
+
+    def get(self, request):
+        """
+        Render the counters and histograms of polls.metrics.
+
+        Args:
+            request: The HTTP request object.
+
+        Returns:
+            HttpResponse: The metrics, or 403 if the token is missing or wrong.
+        """
+        token = getattr(settings, 'POLLS_METRICS_TOKEN', '')
+        if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return HttpResponseForbidden("Invalid metrics token.")
+        response = HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+        response['Cache-Control'] = 'no-store'
+        return response
@@ -0,0 +1,150 @@
+"""
+polls/vote_queue.py.
+
+This module implements the write-behind vote ingestion queue.
+
+When ``POLLS_VOTE_MODE`` is ``'write_behind'``, VoteView validates a vote
+and appends it to a durable queue stored in its own SQLite file (WAL
+journal), so the request never waits on the main database. The
+``flush_votes`` management command drains the queue in batches through
+``polls.voting.cast_votes``.
+
+Classes:
+- VoteQueue: A durable, append-only queue of pending votes.
+
+Functions:
+- get_vote_queue: Return the queue configured in the settings.
+- flush_vote_queue: Write one batch of queued votes to the database.
+"""
+
+import sqlite3
+import threading
+import time
+from django.conf import settings
+from django.contrib.auth.models import User
+from .models import Choice
+from .voting import cast_votes
+
+
+class VoteQueue:
+    """
+    A durable, append-only queue of pending votes backed by a SQLite file.
+
+    Attributes:
+        path (str): The path of the SQLite file holding the queue.
+    """
+
+    def __init__(self, path):
+        """Open (and create if needed) the queue stored at ``path``."""
+        self.path = str(path)
+        self._local = threading.local()
+
+    def _connection(self):
+        """Return this thread's connection to the queue file."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS pending_vote ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "user_id INTEGER NOT NULL, "
+                "question_id INTEGER NOT NULL, "
+                "choice_id INTEGER NOT NULL, "
+                "queued_at REAL NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def put(self, user_id, question_id, choice_id):
+        """
+        Append a vote to the queue.
+
+        Args:
+            user_id: The id of the user who votes.
+            question_id: The id of the question being voted on.
+            choice_id: The id of the selected choice.
+        """
+        self._connection().execute(
+            "INSERT INTO pending_vote (user_id, question_id, choice_id, queued_at) VALUES (?, ?, ?, ?)",
+            (user_id, question_id, choice_id, time.time()),
+        )
+
+    def peek(self, limit):
+        """
+        Return the oldest queued votes without removing them.
+
+        Args:
+            limit: The maximum number of votes to return.
+
+        Returns:
+            list: (id, user_id, question_id, choice_id) tuples in queue order.
+        """
+        return self._connection().execute(
+            "SELECT id, user_id, question_id, choice_id FROM pending_vote ORDER BY id LIMIT ?",
+            (limit,),
+        ).fetchall()
+
+    def ack(self, last_id):
+        """
+        Remove every queued vote up to and including ``last_id``.
+
+        Args:
+            last_id: The id of the last vote that was written.
+        """
+        self._connection().execute("DELETE FROM pending_vote WHERE id <= ?", (last_id,))
+
+    def __len__(self):
+        """Return the number of queued votes."""
+        return self._connection().execute("SELECT COUNT(*) FROM pending_vote").fetchone()[0]
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def get_vote_queue():
+    """
+    Return the vote queue stored at ``POLLS_VOTE_QUEUE_PATH``.
+
+    Returns:
+        VoteQueue: The shared queue instance for the configured path.
+    """
+    path = str(settings.POLLS_VOTE_QUEUE_PATH)
+    with _queues_lock:
+        if path not in _queues:
+            _queues[path] = VoteQueue(path)
+        return _queues[path]
+
+
+def flush_vote_queue(queue, batch_size=500):
+    """
+    Write the oldest batch of queued votes to the database.
+
+    Votes whose user or choice has been deleted since they were queued are
+    dropped. Because votes are upserts, a batch that is written twice after
+    a crash leaves the same result.
+
+    Args:
+        queue (VoteQueue): The queue to drain.
+        batch_size (int): The maximum number of queued votes to write.
+
+    Returns:
+        int: The number of queued votes taken off the queue.
+    """
+    rows = queue.peek(batch_size)
+    if not rows:
+        return 0
+
+    choice_questions = dict(
+        Choice.objects.filter(pk__in={row[3] for row in rows}).values_list('pk', 'question_id')
+    )
+    user_ids = set(User.objects.filter(pk__in={row[1] for row in rows}).values_list('pk', flat=True))
+    cast_votes(
+        (user_id, question_id, choice_id)
+        for _, user_id, question_id, choice_id in rows
+        if user_id in user_ids and choice_questions.get(choice_id) == question_id
+    )
+    queue.ack(rows[-1][0])
+    return len(rows)
@@ -0,0 +1,278 @@
+"""
+polls/voting.py.
+
+This module records votes.
+
+Functions:
+- cast_vote: Cast or change a user's vote for a question.
+- cast_votes: Cast or change a batch of votes at once.
+- move_vote_counters: Add deltas to the vote counters of choices in one statement.
+"""
+
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from .cache import invalidate_results_on_commit, invalidate_user_votes_on_commit
+from .events import broker
+from . import metrics
+from .models import Choice, Question, Vote
+
+
+votes_total = metrics.counter(
+    'polls_votes_total', "Votes written, per question and kind (cast for first votes, changed).", ('question', 'kind'),
+)
+
+
+def _count_on_commit(kinds):
+    """Add the votes of each question and kind to the vote counter once committed."""
+    def count():
+        for labels, amount in kinds.items():
+            votes_total.inc(labels, amount)
+        metrics.maybe_flush()
+    transaction.on_commit(count)
+
+
+def _publish_on_commit(question_id, choice_deltas):
+    """Publish the change in each choice's tally to live results subscribers once committed."""
+    event = {
+        'question': question_id,
+        'deltas': {str(choice_id): delta for choice_id, delta in choice_deltas.items() if delta},
+        'total_votes': sum(choice_deltas.values()),
+    }
+    transaction.on_commit(lambda: broker.publish(question_id, event))
+
+
+@contextmanager
+def _write_transaction():
+    """
+    Open the vote transaction, taking SQLite's write lock when it begins.
+
+    A deferred SQLite transaction that reads before it writes fails with
+    "database is locked" if another writer commits in between, whatever the
+    busy timeout. Starting it with ``BEGIN IMMEDIATE`` makes it wait for the
+    lock instead. Other databases, and nested calls, get a plain atomic block.
+    """
+    connection = transaction.get_connection()
+    immediate = getattr(settings, 'POLLS_SQLITE_IMMEDIATE_WRITES', True)
+    if connection.vendor != 'sqlite' or connection.in_atomic_block or not immediate:
+        with transaction.atomic():
+            yield
+        return
+
+    # Connect first: connecting resets transaction_mode from the settings.
+    connection.ensure_connection()
+    mode = connection.transaction_mode
+    connection.transaction_mode = 'IMMEDIATE'
+    try:
+        with transaction.atomic():
+            connection.transaction_mode = mode
+            yield
+    finally:
+        connection.transaction_mode = mode
+
+
+def _lock_voters(user_ids):
+    """
+    Lock the user rows of the voters, in id order, until the transaction ends.
+
+    Row locks on the votes cannot cover a first vote, whose row does not
+    exist yet, so without this two concurrent first votes of the same user
+    would both count themselves as cast. SQLite needs no lock: its vote
+    transactions already run one at a time.
+    """
+    if transaction.get_connection().features.has_select_for_update:
+        list(User.objects.select_for_update().filter(pk__in=user_ids).order_by('pk').values_list('pk', flat=True))
+
+
+def move_vote_counters(deltas):
+    """
+    Add deltas to the vote counters of choices in one statement.
+
+    Args:
+        deltas (dict): Maps choice ids to the number of votes to add, which may be negative.
+
+    Returns:
+        int: The number of choices updated.
+    """
+    deltas = {choice_id: delta for choice_id, delta in deltas.items() if delta}
+    if not deltas:
+        return 0
+    return Choice.objects.filter(pk__in=deltas).update(
+        votes=F('votes') + Case(
+            *[When(pk=choice_id, then=Value(delta)) for choice_id, delta in deltas.items()],
+            default=Value(0),
+        )
+    )
+
+
+# Reads the votes being replaced and upserts the ballots in one statement.
+# All parts of a statement see the snapshot it started with, so ``previous``
+# holds the choices from before the upsert. It takes no row locks: a row the
+# upsert has already changed would be skipped, and the voters are locked.
+UPSERT_RETURNING_PREVIOUS = """
+    WITH ballots (user_id, question_id, choice_id) AS (VALUES {values}),
+    previous AS (
+        SELECT vote.{user}, vote.{question}, vote.{choice}
+        FROM {table} vote
+        JOIN ballots ON ballots.user_id = vote.{user} AND ballots.question_id = vote.{question}
+    ),
+    written AS (
+        INSERT INTO {table} ({user}, {question}, {choice})
+        SELECT user_id, question_id, choice_id FROM ballots
+        ON CONFLICT ({user}, {question}) DO UPDATE SET {choice} = EXCLUDED.{choice}
+        WHERE {table}.{choice} <> EXCLUDED.{choice}
+    )
+    SELECT {user}, {question}, {choice} FROM previous
+"""
+
+
+def _upsert_returning_previous(ballots):
+    """
+    Upsert votes with one PostgreSQL statement that returns the votes they replaced.
+
+    Args:
+        ballots (dict): Maps (user_id, question_id) to the selected choice_id.
+
+    Returns:
+        dict: Maps (user_id, question_id) to the previously selected choice_id for existing votes.
+    """
+    connection = transaction.get_connection()
+    quote = connection.ops.quote_name
+    fields = {name: quote(Vote._meta.get_field(name).column) for name in ('user', 'question', 'choice')}
+    sql = UPSERT_RETURNING_PREVIOUS.format(
+        values=', '.join(['(%s::bigint, %s::bigint, %s::bigint)'] * len(ballots)),
+        table=quote(Vote._meta.db_table),
+        **fields,
+    )
+    params = [value for (user_id, question_id), choice_id in ballots.items() for value in (user_id, question_id, choice_id)]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {(user_id, question_id): choice_id for user_id, question_id, choice_id in cursor.fetchall()}
+
+
+def _read_then_upsert(ballots):
+    """
+    Read the votes being replaced, then upsert the changed ones.
+
+    The two statements are safe together only while no other transaction
+    writes the same votes, which the caller ensures.
+
+    Args:
+        ballots (dict): Maps (user_id, question_id) to the selected choice_id.
+
+    Returns:
+        dict: Maps (user_id, question_id) to the previously selected choice_id for existing votes.
+    """
+    previous = {
+        (user_id, question_id): choice_id
+        for user_id, question_id, choice_id in Vote.objects.select_for_update()
+        .filter(user_id__in={user_id for user_id, _ in ballots}, question_id__in={question_id for _, question_id in ballots})
+        .values_list('user_id', 'question_id', 'choice_id')
+        if (user_id, question_id) in ballots
+    }
+    Vote.objects.bulk_create(
+        [
+            Vote(user_id=user_id, question_id=question_id, choice_id=choice_id)
+            for (user_id, question_id), choice_id in ballots.items()
+            if previous.get((user_id, question_id)) != choice_id
+        ],
+        update_conflicts=True,
+        unique_fields=['user', 'question'],
+        update_fields=['choice'],
+    )
+    return previous
+
+
+def _write_votes(ballots):
+    """
+    Upsert votes and move the choice counters in one transaction.
+
+    The vote rows are written with ``INSERT ... ON CONFLICT (user, question)
+    DO UPDATE``, so concurrent writers can never leave more than one vote per
+    user and question. On PostgreSQL the same statement returns the votes it
+    replaced (see _upsert_returning_previous); elsewhere they are read just
+    before it. Either way the voters are locked first (see _lock_voters), or
+    on SQLite the transaction takes the write lock up front, since a vote
+    written by a concurrent transaction after the statement's snapshot would
+    be replaced without its counter being moved. All counter adjustments are
+    folded into one UPDATE, and the versions of the affected questions are
+    bumped in another. Once committed, the tally deltas are published to
+    live results subscribers.
+
+    Args:
+        ballots (dict): Maps (user_id, question_id) to the selected choice_id.
+
+    Returns:
+        dict: Maps (user_id, question_id) to the previously selected choice_id for existing votes.
+    """
+    with _write_transaction():
+        _lock_voters({user_id for user_id, _ in ballots})
+        if transaction.get_connection().vendor == 'postgresql':
+            previous = _upsert_returning_previous(ballots)
+        else:
+            previous = _read_then_upsert(ballots)
+        changed = {key: choice_id for key, choice_id in ballots.items() if previous.get(key) != choice_id}
+        if not changed:
+            return previous
+
+        question_deltas = defaultdict(Counter)
+        for key, choice_id in changed.items():
+            choice_deltas = question_deltas[key[1]]
+            choice_deltas[choice_id] += 1
+            if key in previous:
+                choice_deltas[previous[key]] -= 1
+        move_vote_counters({
+            choice_id: delta
+            for choice_deltas in question_deltas.values()
+            for choice_id, delta in choice_deltas.items()
+        })
+
+        Question.objects.filter(pk__in=question_deltas).touch()
+        invalidate_user_votes_on_commit(user_id for user_id, _ in changed)
+        for question_id, choice_deltas in question_deltas.items():
+            invalidate_results_on_commit(question_id)
+            _publish_on_commit(question_id, choice_deltas)
+        _count_on_commit(Counter((question_id, 'changed' if (user_id, question_id) in previous else 'cast')
+                                 for user_id, question_id in changed))
+    return previous
+
+
+def cast_vote(user, question, choice):
+    """
+    Cast or change the vote of a user for a question.
+
+    Args:
+        user: The user who votes.
+        question: The question being voted on.
+        choice: The selected choice of the question.
+
+    Returns:
+        int or None: The id of the previously selected choice, or None if this is the user's first vote.
+    """
+    key = (user.pk, question.pk)
+    return _write_votes({key: choice.pk}).get(key)
+
+
+def cast_votes(ballots):
+    """
+    Cast or change a batch of votes at once.
+
+    When a batch holds several votes of the same user for the same question,
+    the last one wins.
+
+    Args:
+        ballots: An iterable of (user_id, question_id, choice_id) tuples.
+
+    Returns:
+        int: The number of votes that were cast or changed.
+    """
+    latest = {}
+    for user_id, question_id, choice_id in ballots:
+        latest[(user_id, question_id)] = choice_id
+    if not latest:
+        return 0
+    previous = _write_votes(latest)
+    return sum(1 for key, choice_id in latest.items() if previous.get(key) != choice_id)